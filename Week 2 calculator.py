@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Simple Arithmetic Calculator
+
+This script is a worked solution to the calculator pseudocode in 'Week 2 tasks'. Run without options, it asks for
+two integers and an operator (+, -, *, /) and prints the result, with the pseudocode's error messages for division
+by zero, an invalid operator and numbers that are not integers.
+
+Enhancements over the pseudocode:
+- Expressions: --expression evaluates a whole expression, such as "2 * (price - discount) / qty", with the usual
+  precedence (* and / before + and -), parentheses, unary minus and named variables (set with --set NAME=VALUE).
+  Expressions are split into tokens by one regular expression and parsed by a Pratt parser (precedence climbing).
+- Compilation: A parsed expression is compiled once into nested Python closures, with constant parts worked out
+  in advance, so evaluating it again only calls the closures. Compiled expressions are kept in an LRU cache keyed by
+  their text (compile_expression()), so the same text is never parsed twice while it is in use.
+- Batch Evaluation: One compiled expression can be evaluated over many sets of variable values. Given a row per set
+  (a list of dicts), it is evaluated row by row; given a column per variable (a dict of lists or arrays), it is
+  evaluated over whole NumPy arrays at once. --batch evaluates the expression for every row of a CSV file, whose
+  header names the variables, reading it a block of rows at a time into columns. Integer columns are int64 arrays
+  unless the values (or what the expression makes of them) could go past the int64 range, in which case they are
+  evaluated as Python integers instead, so a result is never wrapped around. NumPy is only imported when columns
+  are evaluated, so the calculator itself needs nothing beyond the standard library.
+- Errors: Dividing by zero raises DivisionByZeroError (naming the first row that does so in a batch, or its line
+  in a CSV file), an operator other than +, -, *, / raises InvalidOperatorError, and the messages are those of the
+  pseudocode.
+
+Usage:
+    python "Week 2 calculator.py" [--expression EXPRESSION [--set NAME=VALUE ...] [--batch values.csv]]
+"""
+
+import argparse
+import csv
+import functools
+import itertools
+import re
+import sys
+from collections import namedtuple
+from collections.abc import Mapping
+
+np = None  # NumPy, imported by load_numpy() when columns are first evaluated
+
+OPERATORS = "+-*/"
+ARITHMETIC = {'+': lambda a, b: a + b, '-': lambda a, b: a - b, '*': lambda a, b: a * b, '/': lambda a, b: a / b}
+BINDING_POWER = {'+': 10, '-': 10, '*': 20, '/': 20}  # Operators with more bind their operands first
+UNARY_POWER = 30            # Unary minus binds before any binary operator
+COMPILE_CACHE_SIZE = 1024   # Compiled expressions kept by compile_expression()
+BATCH_ROWS = 65_536         # CSV rows evaluated together by --batch
+INT64_MAX = 2**63 - 1       # Largest magnitude integer columns are evaluated in int64 arrays with
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)"
+                           r"|(?P<name>[A-Za-z_]\w*)|(?P<symbol>\S))")
+
+Token = namedtuple("Token", "kind text position")
+END = Token("end", "", -1)
+
+
+class CalculatorError(Exception):
+    """Raised when an expression cannot be evaluated."""
+
+
+class DivisionByZeroError(CalculatorError):
+    """Raised when an expression divides by zero."""
+
+    def __init__(self, row: int = None, line: int = None):
+        self.row = row  # Index of the first row dividing by zero, in batch evaluation
+        self.line = line  # Its line in the CSV file, in evaluate_csv()
+        if line is not None:
+            super().__init__(f"Division by zero is not allowed (line {line}).")
+        else:
+            super().__init__("Division by zero is not allowed." if row is None else
+                             f"Division by zero is not allowed (row {row}).")
+
+
+class InvalidOperatorError(CalculatorError):
+    """Raised when an expression uses an operator other than +, -, *, /."""
+
+    def __init__(self, operator: str, position: int):
+        super().__init__(f"Invalid operator {operator!r} at position {position}. Please enter one of +, -, *, /.")
+
+
+class ExpressionSyntaxError(CalculatorError):
+    """Raised when an expression is not well formed, such as one with unbalanced parentheses."""
+
+
+class UndefinedVariableError(CalculatorError):
+    """Raised when an expression uses a variable that has not been given a value."""
+
+
+def tokenize(text: str):
+    """Yield the tokens of an expression: numbers, names, and operators and parentheses ('symbol')."""
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'symbol' and match['symbol'] not in OPERATORS + "()":
+            raise InvalidOperatorError(match['symbol'], match.start('symbol'))
+        yield Token(kind, match[kind], match.start(kind))
+
+
+class Parser:
+    """
+    Pratt parser turning the tokens of an expression into a tree of tuples:
+    ('number', value), ('name', name), ('neg', operand) and (operator, left, right).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = list(tokenize(text))
+        self.position = 0
+
+    def parse(self) -> tuple:
+        """Return the tree of the whole expression."""
+        tree = self.expression(0)
+        token = self.peek()
+        if token is not END:
+            raise ExpressionSyntaxError(f"Unexpected {token.text!r} at position {token.position}.")
+        return tree
+
+    def peek(self) -> Token:
+        return self.tokens[self.position] if self.position < len(self.tokens) else END
+
+    def advance(self) -> Token:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expression(self, right_power: int) -> tuple:
+        """Parse operands and the operators between them that bind more tightly than `right_power`."""
+        left = self.operand()
+        while True:
+            token = self.peek()
+            power = BINDING_POWER.get(token.text, 0) if token.kind == 'symbol' else 0
+            if power <= right_power:  # Equal powers stop too, so operators of one precedence group to the left
+                return left
+            self.advance()
+            left = (token.text, left, self.expression(power))
+
+    def operand(self) -> tuple:
+        """Parse a number, a variable, a parenthesised expression or a unary minus or plus."""
+        token = self.advance()
+        if token.kind == 'number':
+            return ('number', float(token.text) if set(token.text) & set(".eE") else int(token.text))
+        if token.kind == 'name':
+            return ('name', token.text)
+        if token.text in ('-', '+'):
+            operand = self.expression(UNARY_POWER)
+            return ('neg', operand) if token.text == '-' else operand
+        if token.text == '(':
+            inner = self.expression(0)
+            if self.advance().text != ')':
+                raise ExpressionSyntaxError(f"Missing ')' for the '(' at position {token.position}.")
+            return inner
+        if token is END:
+            raise ExpressionSyntaxError("The expression ends where a number or variable was expected.")
+        raise ExpressionSyntaxError(f"Unexpected {token.text!r} at position {token.position}.")
+
+
+def fold_constants(tree: tuple) -> tuple:
+    """Return the tree with every part that uses no variables replaced by its value (except division by zero)."""
+    kind = tree[0]
+    if kind in ('number', 'name'):
+        return tree
+    if kind == 'neg':
+        operand = fold_constants(tree[1])
+        return ('number', -operand[1]) if operand[0] == 'number' else ('neg', operand)
+    left, right = fold_constants(tree[1]), fold_constants(tree[2])
+    if left[0] == right[0] == 'number' and not (kind == '/' and right[1] == 0):
+        return ('number', ARITHMETIC[kind](left[1], right[1]))
+    return (kind, left, right)
+
+
+def variables(tree: tuple) -> set:
+    """Return the names of the variables in a tree."""
+    if tree[0] == 'number':
+        return set()
+    if tree[0] == 'name':
+        return {tree[1]}
+    return set().union(*map(variables, tree[1:]))
+
+
+def load_numpy():
+    """Import NumPy into the module the first time columns are evaluated, and return it."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def integer_bound(tree: tuple, bounds: Mapping):
+    """
+    Return the largest magnitude an integer-valued tree can reach, or None if its value is a float.
+
+    `bounds` holds the largest magnitude of each integer variable; a variable not in it is a float. Raises
+    OverflowError if the tree, or any part of it, could go past INT64_MAX.
+    """
+    kind = tree[0]
+    if kind == 'number':
+        bound = abs(tree[1]) if isinstance(tree[1], int) else None
+    elif kind == 'name':
+        bound = bounds.get(tree[1])
+    elif kind == 'neg':
+        bound = integer_bound(tree[1], bounds)
+    else:
+        left, right = integer_bound(tree[1], bounds), integer_bound(tree[2], bounds)
+        if kind == '/' or left is None or right is None:
+            return None  # True division, or anything with a float in it, gives a float, which cannot wrap around
+        bound = left + right if kind in '+-' else left * right
+    if bound is not None and bound > INT64_MAX:
+        raise OverflowError(f"{bound} is out of the int64 range")
+    return bound
+
+
+def compile_tree(tree: tuple, vector: bool = False):
+    """
+    Return a function of a dict of variable values that evaluates the tree.
+
+    Each node becomes a closure calling its children's. Operands that are variables or numbers are read directly by
+    their parent's closure rather than through closures of their own. With `vector`, the variables are NumPy arrays
+    and a division checks its whole divisor array for zeros.
+    """
+    kind = tree[0]
+    if kind == 'number':
+        value = tree[1]
+        return lambda values: value
+    if kind == 'name':
+        name = tree[1]
+        return lambda values: values[name]
+    if kind == 'neg':
+        operand = compile_tree(tree[1], vector)
+        return lambda values: -operand(values)
+
+    if kind == '/':
+        left, right = compile_tree(tree[1], vector), compile_tree(tree[2], vector)
+        if vector:
+            def divide(values):
+                divisor = right(values)
+                zeros = np.flatnonzero(np.asarray(divisor) == 0)
+                if zeros.size:
+                    raise DivisionByZeroError(int(zeros[0]))
+                return left(values) / divisor
+        else:
+            def divide(values):
+                divisor = right(values)
+                if divisor == 0:
+                    raise DivisionByZeroError()
+                return left(values) / divisor
+        return divide
+
+    operate = ARITHMETIC[kind]
+    (left_kind, left_value), (right_kind, right_value) = tree[1][:2], tree[2][:2]
+    # Specialise the commonest shapes, so that reading a variable or a number costs no call of its own
+    if left_kind == 'name' and right_kind == 'name':
+        return {'+': lambda values: values[left_value] + values[right_value],
+                '-': lambda values: values[left_value] - values[right_value],
+                '*': lambda values: values[left_value] * values[right_value]}[kind]
+    if left_kind == 'name' and right_kind == 'number':
+        return {'+': lambda values: values[left_value] + right_value,
+                '-': lambda values: values[left_value] - right_value,
+                '*': lambda values: values[left_value] * right_value}[kind]
+    left, right = compile_tree(tree[1], vector), compile_tree(tree[2], vector)
+    if kind == '+':
+        return lambda values: left(values) + right(values)
+    if kind == '-':
+        return lambda values: left(values) - right(values)
+    return lambda values: operate(left(values), right(values))
+
+
+class Expression:
+    """
+    An expression parsed and compiled once, to be evaluated any number of times.
+
+    evaluate() takes one set of variable values; evaluate_batch() takes many, as rows or as columns.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tree = fold_constants(Parser(text).parse())
+        self.variables = tuple(sorted(variables(self.tree)))
+        self._scalar = compile_tree(self.tree)
+        self._vector = None  # Compiled the first time columns are evaluated
+
+    def __repr__(self):
+        return f"Expression({self.text!r})"
+
+    def evaluate(self, values: Mapping = None, **more):
+        """Return the value of the expression for the variable values given (as a dict, keywords or both)."""
+        values = {**values, **more} if values is not None and more else values or more
+        try:
+            return self._scalar(values)
+        except KeyError as error:
+            raise UndefinedVariableError(f"No value given for {error.args[0]!r}.") from None
+
+    def evaluate_batch(self, values):
+        """
+        Evaluate the expression for many sets of variable values.
+
+        Given a mapping of variable names to equally long columns (lists or NumPy arrays), returns a NumPy array of
+        results, computed a whole column at a time. Given an iterable of mappings, one per row, returns a list of
+        results computed row by row.
+        """
+        if isinstance(values, Mapping):
+            return self.evaluate_columns(values)
+        try:
+            return [self._scalar(row) for row in values]
+        except KeyError as error:
+            raise UndefinedVariableError(f"No value given for {error.args[0]!r}.") from None
+
+    def evaluate_columns(self, columns: Mapping) -> "np.ndarray":
+        """
+        Evaluate the expression over columns of variable values at once and return an array of the results.
+
+        Integer columns are evaluated in int64 only if integer_bound() shows no part of the expression can overflow
+        it; otherwise they are evaluated as arrays of Python integers, slower but exact, as evaluate() would be.
+        """
+        load_numpy()
+        missing = [name for name in self.variables if name not in columns]
+        if missing:
+            raise UndefinedVariableError(f"No value given for {missing[0]!r}.")
+        arrays = {name: np.asarray(columns[name]) for name in self.variables}
+        lengths = {array.shape for array in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"The columns differ in length: {sorted(lengths)}")
+        integers = {name: array for name, array in arrays.items() if array.dtype.kind in 'iu'}
+        try:
+            integer_bound(self.tree, {name: max(int(array.max()), -int(array.min())) if array.size else 0
+                                      for name, array in integers.items()})
+        except OverflowError:
+            arrays.update((name, array.astype(object)) for name, array in integers.items())
+        if self._vector is None:
+            self._vector = compile_tree(self.tree, vector=True)
+        result = np.asarray(self._vector(arrays))
+        if not arrays:
+            return result  # No variables: a single value
+        return np.broadcast_to(result, next(iter(lengths))) if result.ndim == 0 else result
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(text: str) -> Expression:
+    """Return the compiled Expression for a text, parsing and compiling it only if it is not in the LRU cache."""
+    return Expression(text)
+
+
+def calculate(text: str, values: Mapping = None, **more):
+    """Evaluate an expression once, through the cache of compiled expressions."""
+    return compile_expression(text).evaluate(values, **more)
+
+
+def parse_number(text: str):
+    """Return the number a text holds, as an int if it is a whole number. Raises ValueError if it holds none."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_assignment(text: str) -> tuple:
+    """Return (name, value) from 'NAME=VALUE'."""
+    name, equals, value = text.partition("=")
+    if not equals or not name.strip().isidentifier():
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, not {text!r}")
+    try:
+        return name.strip(), parse_number(value.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number") from None
+
+
+def column_array(values: list) -> "np.ndarray":
+    """
+    Return a CSV column as an integer array if every value is a whole number, otherwise as a float array.
+
+    Whole numbers too large for int64 are kept exact, as an array of Python integers.
+    """
+    load_numpy()
+    try:
+        return np.array(values, dtype=np.int64)
+    except ValueError:
+        return np.array(values, dtype=np.float64)
+    except OverflowError:
+        try:
+            return np.array([int(value) for value in values], dtype=object)
+        except ValueError:
+            return np.array(values, dtype=np.float64)  # Not all whole numbers after all
+
+
+def is_number(text: str) -> bool:
+    """Return True if a CSV field can be read into a column: an integer or a floating-point number."""
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def evaluate_csv(expression: Expression, path: str, batch_rows: int = BATCH_ROWS):
+    """
+    Yield the expression's value for each row of a CSV file, evaluating a block of `batch_rows` rows at a time.
+
+    Blank lines are skipped. A row too short to hold every variable the expression uses, or with an empty or
+    non-numeric field for one, is reported on standard error with its line number and skipped, so one bad line does
+    not stop the rest of the file being evaluated.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = [name.strip() for name in next(reader, [])]
+        wanted = [(name, header.index(name)) for name in expression.variables if name in header]
+        needed = max((index for _, index in wanted), default=-1) + 1  # Fields a row must have
+        numbered = ((reader.line_num, row) for row in reader)
+        while True:
+            lines = list(itertools.islice(numbered, batch_rows))
+            if not lines:
+                return
+            block = []
+            block_lines = []  # The line each row of the block was read from
+            skipped = []  # (line, reason) for each row left out of the block
+            for line_number, row in lines:
+                if not any(field.strip() for field in row):
+                    continue
+                if len(row) < needed:
+                    skipped.append((line_number, f"only {len(row)} of the {needed} fields needed"))
+                    continue
+                block.append(row)
+                block_lines.append(line_number)
+            try:
+                columns = {name: column_array([row[index] for row in block]) for name, index in wanted}
+            except ValueError:
+                # Only now is each row checked, so a block of numbers is read without a Python call per field
+                numeric = []
+                for line_number, row in zip(block_lines, block):
+                    bad = [(name, row[index]) for name, index in wanted if not is_number(row[index])]
+                    if bad:
+                        skipped.append((line_number, f"{bad[0][1]!r} for {bad[0][0]} is not a number"))
+                    else:
+                        numeric.append((line_number, row))
+                block_lines = [line_number for line_number, _ in numeric]
+                block = [row for _, row in numeric]
+                columns = {name: column_array([row[index] for row in block]) for name, index in wanted}
+            for line_number, reason in sorted(skipped):
+                print(f"Line {line_number}: {reason}; row skipped.", file=sys.stderr)
+            if not columns:
+                yield from [expression.evaluate()] * len(block)
+            elif block:
+                try:
+                    yield from expression.evaluate_columns(columns).tolist()
+                except DivisionByZeroError as error:
+                    raise DivisionByZeroError(line=block_lines[error.row]) from None
+
+
+def run_pseudocode() -> None:
+    """Ask for two integers and an operator and print the result, as the pseudocode does."""
+    print("Simple Arithmetic Calculator")
+    input1 = input("Enter the first number: ")
+    input2 = input("Enter the second number: ")
+    operator = input("Enter an operator (+, -, *, /): ").strip()
+
+    try:
+        num1 = int(input1)
+        num2 = int(input2)
+    except ValueError:
+        print("Error: Please enter valid integer numbers.")
+        return
+    if len(operator) != 1 or operator not in OPERATORS:
+        print("Error: Invalid operator. Please enter one of +, -, *, /.")
+        return
+    try:
+        result = calculate(f"num1 {operator} num2", num1=num1, num2=num2)
+    except DivisionByZeroError:
+        print("Error: Division by zero is not allowed.")
+        return
+    print(f"The result is: {result}")
+
+
+def main() -> int:
+    """Main function to run the calculator. Returns 1 if the expression could not be evaluated."""
+    parser = argparse.ArgumentParser(description="Simple arithmetic calculator.")
+    parser.add_argument("--expression", help="expression to evaluate instead of asking for two numbers")
+    parser.add_argument("--set", type=parse_assignment, action="append", default=[], metavar="NAME=VALUE",
+                        help="value of a variable in the expression; repeatable")
+    parser.add_argument("--batch", metavar="CSV", help="evaluate the expression for every row of a CSV file")
+    args = parser.parse_args()
+    if args.batch and not args.expression:
+        parser.error("--batch needs an --expression")
+    if args.batch:
+        try:
+            load_numpy()
+        except ImportError:
+            parser.error("--batch needs NumPy (pip install numpy)")
+
+    if not args.expression:
+        run_pseudocode()
+        return 0
+    try:
+        expression = compile_expression(args.expression)
+        if args.batch:
+            for result in evaluate_csv(expression, args.batch):
+                print(result)
+        else:
+            print(expression.evaluate(dict(args.set)))
+    except (CalculatorError, OSError) as error:
+        print(f"Error: {error}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
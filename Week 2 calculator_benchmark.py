@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Calculator Benchmark
+
+This script measures and checks the expression engine in 'Week 2 calculator.py'.
+
+Benchmarks:
+- scalar: Evaluations per second of a few expressions, one set of variable values at a time, by Python's eval() of
+  the text, eval() of a code object compiled once, a tree-walking interpreter over Python's own ast module, the
+  engine parsing the text every time, and the engine's cached compiled closures (compile_expression()). All must give
+  the same values.
+- batch: Evaluations per second over many sets of values (1M by default), as a list of row dicts and as NumPy
+  columns, checked against evaluating each row on its own.
+- errors: Division by zero (in a single evaluation, a constant and a batch, where the first bad row must be named)
+  and operators other than +, -, *, / must raise the engine's errors, and the interactive calculator must print the
+  pseudocode's messages.
+
+Usage:
+    python "Week 2 calculator_benchmark.py" [scalar] [batch] [errors] [--rows 1000000]
+"""
+
+import argparse
+import ast
+import contextlib
+import importlib.util
+import io
+import math
+import os
+import sys
+import time
+from unittest import mock
+
+import numpy as np
+
+CALCULATOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 2 calculator.py")
+BENCHMARKS = ["scalar", "batch", "errors"]
+EXPRESSIONS = [             # Expressions timed, from a single operation to one with constants to fold
+    "a + b",
+    "a * b - c / d",
+    "2 * (price - discount) / qty + 10 * 3",
+    "-(a + b * (c - d)) / (a - b / (c + d * 2)) * (1 + 2 / 4)",
+]
+VALUES = {"a": 7, "b": 3, "c": 11, "d": 4, "price": 19.5, "discount": 2.25, "qty": 3}
+
+def load_calculator():
+    """Import the calculator script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("calculator", CALCULATOR_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["calculator"] = module
+    spec.loader.exec_module(module)
+    return module
+
+AST_OPERATIONS = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+                  ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b}
+
+def walk(node, values: dict):
+    """Evaluate a Python ast expression by walking its tree, the usual safe alternative to eval()."""
+    if isinstance(node, ast.BinOp):
+        return AST_OPERATIONS[type(node.op)](walk(node.left, values), walk(node.right, values))
+    if isinstance(node, ast.UnaryOp):
+        return -walk(node.operand, values) if isinstance(node.op, ast.USub) else walk(node.operand, values)
+    if isinstance(node, ast.Name):
+        return values[node.id]
+    return node.value
+
+def evaluations_per_second(function, minimum: float = 0.3) -> float:
+    """Return how many times per second function() runs, calling it for at least `minimum` seconds."""
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < minimum:
+        for _ in range(100):
+            function()
+        calls += 100
+    return calls / elapsed
+
+def bench_scalar(calculator) -> None:
+    """Report evaluations per second of each way of evaluating each expression, and check that they agree."""
+    print("Scalar: evaluations per second, one set of values at a time")
+    methods = ["eval text", "eval code", "ast walk", "uncached", "compiled"]
+    print(f"{'expression':<58}" + "".join(f"{method:>12}" for method in methods))
+    for text in EXPRESSIONS:
+        code = compile(text, "<expression>", "eval")
+        tree = ast.parse(text, mode="eval").body
+        engine = calculator.compile_expression(text)
+        functions = {
+            "eval text": lambda: eval(text, {"__builtins__": {}}, VALUES),
+            "eval code": lambda: eval(code, {"__builtins__": {}}, VALUES),
+            "ast walk": lambda: walk(tree, VALUES),
+            "uncached": lambda: calculator.Expression(text).evaluate(VALUES),
+            "compiled": lambda: calculator.compile_expression(text).evaluate(VALUES),
+        }
+        results = [function() for function in functions.values()]
+        agree = all(math.isclose(result, results[0]) for result in results) and \
+            math.isclose(engine.evaluate(VALUES), results[0])
+        rates = "".join(f"{evaluations_per_second(function):>12,.0f}" for function in functions.values())
+        print(f"{text:<58}{rates}  {'OK' if agree else 'MISMATCH'}")
+    print()
+
+def bench_batch(calculator, rows: int) -> None:
+    """Report evaluations per second over many sets of values, as rows and as columns, and check them."""
+    text = EXPRESSIONS[2]
+    expression = calculator.compile_expression(text)
+    rng = np.random.default_rng(0)
+    columns = {"price": rng.uniform(1, 100, rows), "discount": rng.uniform(0, 1, rows),
+               "qty": rng.integers(1, 10, rows)}
+    records = [dict(zip(columns, row)) for row in zip(*(column.tolist() for column in columns.values()))]
+    print(f"Batch: {text} over {rows:,} sets of values")
+    print(f"{'method':>16} {'time':>10} {'evaluations/s':>15}")
+
+    start = time.perf_counter()
+    expected = [eval(text, {"__builtins__": {}}, record) for record in records]
+    elapsed = time.perf_counter() - start
+    print(f"{'eval per row':>16} {elapsed:>8.3f} s {rows / elapsed:>15,.0f}")
+    for method, values in (("rows", records), ("columns", columns)):
+        start = time.perf_counter()
+        results = expression.evaluate_batch(values)
+        elapsed = time.perf_counter() - start
+        agree = np.allclose(results, expected)
+        print(f"{method:>16} {elapsed:>8.3f} s {rows / elapsed:>15,.0f}  {'OK' if agree else 'MISMATCH'}")
+    print()
+
+def raises(calculator, error, function) -> bool:
+    """Return whether function() raises the calculator error given."""
+    try:
+        function()
+    except error:
+        return True
+    except calculator.CalculatorError:
+        return False
+    return False
+
+def interactive_output(calculator, answers: list) -> str:
+    """Return the last line the interactive calculator prints given these answers to its questions."""
+    output = io.StringIO()
+    with mock.patch("builtins.input", side_effect=answers), contextlib.redirect_stdout(output):
+        calculator.run_pseudocode()
+    return output.getvalue().strip().splitlines()[-1]
+
+def bench_errors(calculator) -> None:
+    """Check that division by zero and invalid operators raise the engine's errors with the pseudocode's messages."""
+    print("Errors:")
+    checks = {
+        "a / b with b = 0 raises DivisionByZeroError": raises(
+            calculator, calculator.DivisionByZeroError, lambda: calculator.calculate("a / b", a=1, b=0)),
+        "1 / (2 - 2) raises DivisionByZeroError": raises(
+            calculator, calculator.DivisionByZeroError, lambda: calculator.calculate("1 / (2 - 2)")),
+        "a % b raises InvalidOperatorError": raises(
+            calculator, calculator.InvalidOperatorError, lambda: calculator.calculate("a % b", a=1, b=2)),
+        "(a + b raises ExpressionSyntaxError": raises(
+            calculator, calculator.ExpressionSyntaxError, lambda: calculator.calculate("(a + b", a=1, b=2)),
+        "a + c without c raises UndefinedVariableError": raises(
+            calculator, calculator.UndefinedVariableError, lambda: calculator.calculate("a + c", a=1)),
+    }
+    try:
+        calculator.compile_expression("a / b").evaluate_batch({"a": np.ones(10), "b": np.arange(10) - 7})
+        checks["batch names the first row dividing by zero"] = False
+    except calculator.DivisionByZeroError as error:
+        checks["batch names the first row dividing by zero"] = error.row == 7
+    checks["interactive: 7 / 2 prints 'The result is: 3.5'"] = \
+        interactive_output(calculator, ["7", "2", "/"]).endswith("The result is: 3.5")
+    for answers, message in ((["4", "0", "/"], "Error: Division by zero is not allowed."),
+                             (["4", "2", "%"], "Error: Invalid operator. Please enter one of +, -, *, /."),
+                             (["4", "x", "+"], "Error: Please enter valid integer numbers.")):
+        checks[f"interactive: {' '.join(answers)} prints '{message}'"] = \
+            interactive_output(calculator, answers).endswith(message)
+    for check, passed in checks.items():
+        print(f"{check}: {'OK' if passed else 'MISMATCH'}")
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the calculator's expression engine.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: scalar, batch or errors (default: all)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="sets of values in the batch benchmark")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    calculator = load_calculator()
+    if "scalar" in args.benchmarks:
+        bench_scalar(calculator)
+    if "batch" in args.benchmarks:
+        bench_batch(calculator, args.rows)
+    if "errors" in args.benchmarks:
+        bench_errors(calculator)
+
+if __name__ == '__main__':
+    sys.exit(main())
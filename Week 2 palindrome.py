@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Palindrome Check
+
+This script is a worked solution to the palindrome pseudocode in 'Week 2 tasks'. Run without options, it asks for
+a string and prints whether it is a palindrome. The pseudocode builds the reversed string a character at a time,
+which copies the string built so far at every step and so takes time growing with the square of its length, and it
+checks one string typed in.
+
+Enhancements over the pseudocode:
+- Linear Check: is_palindrome() compares the first half of the string with the second half read backwards, through
+  a reversed memoryview that copies nothing and stops at the first difference. Case and everything but letters and
+  digits are ignored, so "A man, a plan, a canal: Panama" is a palindrome (--exact compares the characters as they
+  are, as the pseudocode does). ASCII text is folded and stripped in one bytes.translate() call.
+- Longest Palindrome: --longest also prints the longest palindrome inside the string, found by Manacher's algorithm,
+  which reuses the palindromes already found around earlier centres to do it in linear time.
+- Streaming Files: --file checks every line of a file, however large. The file is memory-mapped and cut into chunks
+  of about CHUNK_BYTES at line breaks, and the chunks are checked by a pool of worker processes (--workers, by
+  default one per core), each mapping the file itself, so only the chunks in progress are ever in memory. The number
+  of lines, palindromes, lines per second and peak memory are printed (--list prints the palindromic lines too).
+
+Usage:
+    python "Week 2 palindrome.py" [TEXT] [--longest] [--exact]
+    python "Week 2 palindrome.py" --file lines.txt [--list] [--exact] [--workers N]
+"""
+
+import argparse
+import collections
+import mmap
+import multiprocessing
+import os
+import string
+import sys
+import time
+
+CHUNK_BYTES = 2**23         # Bytes of a file checked together by one worker: 8 MiB, about 100k lines of text
+WORKERS = os.cpu_count() or 1
+ASCII_LOWER = bytes.maketrans(string.ascii_uppercase.encode(), string.ascii_lowercase.encode())
+ASCII_IGNORED = bytes(set(range(128)) - set((string.ascii_letters + string.digits).encode()))
+LINE_IGNORED = ASCII_IGNORED.replace(b'\n', b'')  # As ASCII_IGNORED, but keeping line breaks
+EMPTY, NOT_PALINDROME, PALINDROME = 2, 0, 1  # Flags check_lines() gives each line
+
+
+def normalise(text):
+    """
+    Return the text folded to lower case with everything but letters and digits removed, as bytes.
+
+    ASCII text (str or bytes) is folded and stripped by one bytes.translate() call and gives a byte a character.
+    Other text is case-folded and filtered a character at a time and encoded as UTF-32, four bytes a character.
+    """
+    if text.isascii():
+        data = text if isinstance(text, bytes) else text.encode('ascii')
+        return data.translate(ASCII_LOWER, ASCII_IGNORED)
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', errors='replace')
+    return ''.join(filter(str.isalnum, text.casefold())).encode('utf-32-le')
+
+
+def mirrored(data, width: int = 1) -> bool:
+    """
+    Return True if a bytes-like sequence of `width`-byte characters reads the same backwards.
+
+    The first half is compared with a reversed view of the second half, which copies nothing and stops at the first
+    difference.
+    """
+    view = memoryview(data)
+    if width > 1:
+        view = view.cast('I' if width == 4 else 'H')
+    half = len(view) // 2
+    return view[:half] == view[::-1][:half]
+
+
+def is_palindrome(text, exact: bool = False) -> bool:
+    """
+    Return True if the text (str or bytes) reads the same backwards, in time proportional to its length.
+
+    Case and everything but letters and digits are ignored, unless `exact` is set.
+    """
+    if exact:
+        if isinstance(text, bytes) or text.isascii():
+            return mirrored(text if isinstance(text, bytes) else text.encode('ascii'))
+        return mirrored(text.encode('utf-32-le'), 4)
+    data = normalise(text)
+    return mirrored(data, 1 if text.isascii() else 4)
+
+
+def manacher(text) -> tuple:
+    """
+    Return (start, length) of the longest palindromic run of a sequence (the first, if several are as long).
+
+    Manacher's algorithm, in linear time. Odd and even lengths are found by two passes. Each keeps the rightmost
+    palindrome found so far, [left, right]; a centre inside it starts from the radius of its mirror image around that
+    palindrome's centre, as far as that stays inside it, so no character is compared twice inside it.
+    """
+    size = len(text)
+    best_start, best_length = 0, min(size, 1)
+    for even in (0, 1):
+        radii = [0] * size
+        left, right = 0, -1
+        for i in range(size):
+            radius = (1 - even) if i > right else min(radii[left + right - i + even], right - i + 1)
+            while i - radius - even >= 0 and i + radius < size and text[i - radius - even] == text[i + radius]:
+                radius += 1
+            radii[i] = radius
+            length = 2 * radius - 1 + even
+            if length > best_length:
+                best_start, best_length = i - radius + 1 - even, length
+            if i + radius - 1 > right:
+                left, right = i - radius + 1 - even, i + radius - 1
+    return best_start, best_length
+
+
+def longest_palindrome(text: str, exact: bool = False) -> str:
+    """
+    Return the longest palindrome inside the text.
+
+    Unless `exact` is set, case and everything but letters and digits are ignored in finding it, and it is returned
+    as it appears in the text, from its first letter or digit to its last.
+    """
+    if exact:
+        start, length = manacher(text)
+        return text[start:start + length]
+    positions = [i for i, character in enumerate(text) if character.isalnum()]
+    start, length = manacher([text[i].casefold() for i in positions])
+    if not length:
+        return ""
+    return text[positions[start]:positions[start + length - 1] + 1]
+
+
+def check_lines(data: bytes, exact: bool = False) -> bytes:
+    """
+    Return a flag for each line of the data: PALINDROME, NOT_PALINDROME, or EMPTY for a line with nothing to compare
+    (no letters or digits, or with `exact`, only whitespace).
+
+    The whole chunk is folded and stripped by one bytes.translate() call that keeps line breaks, and then split into
+    lines, so each ASCII line costs only a comparison with its reverse. Bytes outside ASCII are kept, and lines
+    holding them are decoded and folded on their own.
+    """
+    if exact:
+        lines = data.replace(b'\r\n', b'\n').split(b'\n')
+    else:
+        lines = data.translate(ASCII_LOWER, LINE_IGNORED).split(b'\n')
+    if data.endswith(b'\n'):
+        lines.pop()  # Nothing follows the last line break
+    if exact:
+        return bytes([EMPTY if not line or line.isspace() else
+                      line == line[::-1] if line.isascii() else
+                      is_palindrome(line.decode('utf-8', errors='replace'), exact=True) for line in lines])
+    return bytes([EMPTY if not line else line == line[::-1] if line.isascii() else _unicode_flag(line)
+                  for line in lines])
+
+
+def _unicode_flag(line: bytes) -> int:
+    """Return the flag of a folded and stripped line that still holds characters outside ASCII."""
+    text = line.decode('utf-8', errors='replace').casefold()
+    if not text.isalnum():  # Punctuation and spaces outside ASCII are still there
+        text = ''.join(filter(str.isalnum, text))
+        if not text:
+            return EMPTY
+    return text == text[::-1]
+
+
+_map = None  # The memory map of the file in a worker process
+
+
+def _start_worker(path: str) -> None:
+    global _map
+    with open(path, 'rb') as file:
+        _map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _check_chunk(chunk: tuple) -> bytes:
+    start, end, exact = chunk
+    data = _map[start:end]
+    if hasattr(mmap, 'MADV_DONTNEED'):  # Not on Windows
+        aligned = start - start % mmap.PAGESIZE
+        _map.madvise(mmap.MADV_DONTNEED, aligned, end - aligned)  # Unmap the pages read, so they leave the RSS
+    return check_lines(data, exact)
+
+
+def chunks(file, size: int, chunk_bytes: int = CHUNK_BYTES):
+    """Yield (start, end) of chunks of about `chunk_bytes` bytes covering a file, each ending after a line break."""
+    start = 0
+    while start < size:
+        file.seek(start + chunk_bytes - 1)
+        end = min(size, start + chunk_bytes - 1 + len(file.readline()))  # Read on to the next line break
+        yield start, end
+        start = end
+
+
+def check_file(path: str, exact: bool = False, workers: int = WORKERS, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Check every line of a file and yield (start, end, flags) for each chunk of it in file order, with a flag for each
+    line of the chunk (see check_lines()).
+
+    The chunks are checked by `workers` processes, which memory-map the file and release the pages of each chunk once
+    they have copied it, so only the chunks being checked are in memory, and no more than two per worker are in
+    progress at once. This process only reads the ends of the chunks.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, 'rb') as file:
+        if workers <= 1:
+            _start_worker(path)
+            for start, end in chunks(file, size, chunk_bytes):
+                yield start, end, _check_chunk((start, end, exact))
+            return
+        with multiprocessing.Pool(workers, _start_worker, (path,)) as pool:
+            pending = collections.deque()
+            for start, end in chunks(file, size, chunk_bytes):
+                pending.append((start, end, pool.apply_async(_check_chunk, ((start, end, exact),))))
+                if len(pending) >= 2 * workers:
+                    start, end, result = pending.popleft()
+                    yield start, end, result.get()
+            while pending:
+                start, end, result = pending.popleft()
+                yield start, end, result.get()
+
+
+def peak_memory():
+    """
+    Return the peak resident memory, in MB, of this process and of the largest of its finished child processes, or
+    None where the operating system does not report it.
+    """
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    unit = 1024**2 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS, in KB on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / unit
+
+
+def report_file(path: str, exact: bool, workers: int, show: bool) -> None:
+    """Check every line of a file and print the totals, lines per second and peak memory (and the palindromes)."""
+    lines = palindromes = empty = 0
+    started = time.perf_counter()
+    with open(path, 'rb') as file:
+        for start, end, flags in check_file(path, exact, workers):
+            if show:
+                file.seek(start)
+                chunk_lines = file.read(end - start).split(b'\n')
+                for offset, flag in enumerate(flags):
+                    if flag == PALINDROME:
+                        line = chunk_lines[offset].rstrip(b'\r').decode('utf-8', errors='replace')
+                        print(f"{lines + offset + 1}: {line}")
+            lines += len(flags)
+            palindromes += flags.count(PALINDROME)
+            empty += flags.count(EMPTY)
+    elapsed = time.perf_counter() - started
+    peak = peak_memory()
+    memory = "" if peak is None else f", peak memory {peak:.1f} MB"
+    print(f"{lines:,} lines, {palindromes:,} palindromes, {empty:,} empty; {elapsed:.2f} s, "
+          f"{lines / elapsed if elapsed else 0:,.0f} lines/s{memory}")
+
+
+def main() -> None:
+    """Main function to run the palindrome check program."""
+    parser = argparse.ArgumentParser(description="Palindrome check.")
+    parser.add_argument("text", nargs="?", help="string to check (asked for if not given)")
+    parser.add_argument("--exact", action="store_true",
+                        help="compare the characters as they are, rather than ignoring case and punctuation")
+    parser.add_argument("--longest", action="store_true", help="also print the longest palindrome inside the string")
+    parser.add_argument("--file", help="check every line of a file")
+    parser.add_argument("--list", action="store_true", help="with --file, print each palindromic line")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="processes to use (default: one per core)")
+    args = parser.parse_args()
+
+    if args.file:
+        if args.text:
+            parser.error("give either TEXT or --file")
+        report_file(args.file, args.exact, args.workers, args.list)
+        return
+
+    if args.text is None:
+        print("Palindrome Check Program")
+        input_string = input("Enter a string: ")
+    else:
+        input_string = args.text
+    if is_palindrome(input_string, args.exact):
+        print(f"{input_string} is a palindrome.")
+    else:
+        print(f"{input_string} is not a palindrome.")
+    if args.longest:
+        print(f"The longest palindrome in it is: {longest_palindrome(input_string, args.exact)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Palindrome Benchmark
+
+This script measures and checks the palindrome tool in 'Week 2 palindrome.py'.
+
+Benchmarks:
+- check: Time to check palindromes of growing length (the slowest case, since every character is compared) by the
+  pseudocode's character-at-a-time reversal, by comparing with a reversed copy, and by is_palindrome(), exactly and
+  ignoring case and punctuation. Every method must agree, on palindromes and on strings that differ only in the
+  middle. The pseudocode is skipped where it would take too long.
+- longest: Time to find the longest palindrome in text of growing length by expanding around every centre and by
+  Manacher's algorithm, which must find one as long: random text, where palindromes are short, and one letter
+  repeated, where every centre expands to the end of the text. Expanding is skipped where it would take too long,
+  and Manacher's answers are checked against brute force on many short strings.
+- file: A file of lines (1 GB by default; sentences, palindromes, empty and non-ASCII lines) is checked by
+  check_file() with one worker and with one per core, each run in a fresh process so that its peak memory (RSS, of
+  it and its workers) belongs to the run alone. The counts must match those the file was written with, and are
+  compared with reading the file a line at a time with a plain loop.
+
+Usage:
+    python "Week 2 palindrome_benchmark.py" [check] [longest] [file] [--megabytes 1024] [--workers N]
+"""
+
+import argparse
+import concurrent.futures
+import importlib.util
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+PALINDROME_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 2 palindrome.py")
+BENCHMARKS = ["check", "longest", "file"]
+LENGTHS = [10, 1_000, 100_000, 10_000_000]
+PSEUDOCODE_LIMIT = 100_000  # Longest string the benchmark reverses a character at a time
+EXPAND_LIMIT = 10_000       # Longest text the benchmark expands around every centre
+LINES = [                   # Lines the benchmark file is written from, with whether each is a palindrome
+    ("A man, a plan, a canal: Panama", True),
+    ("Was it a car or a cat I saw?", True),
+    ("No lemon, no melon", True),
+    ("Ésope reste ici et se repose", False),
+    ("Never odd or even.", True),
+    ("The quick brown fox jumps over the lazy dog", False),
+    ("Palindromes read the same backwards as forwards, once case and punctuation are ignored.", False),
+    ("Ressasser", True),
+    ("racecar", True),
+    ("", None),
+    ("   ", None),
+    ("Step on no pets", True),
+    ("This sentence is not a palindrome, though it is about as long as the others are.", False),
+]
+
+def load_palindrome():
+    """Import the palindrome script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("palindrome", PALINDROME_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["palindrome"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def pseudocode_check(input_string: str) -> bool:
+    """Check a string as the pseudocode does, building its reverse a character at a time."""
+    reversed_string = ""
+    for i in range(len(input_string) - 1, -1, -1):
+        reversed_string = reversed_string + input_string[i]
+    return input_string == reversed_string
+
+def time_call(function, argument, minimum: float = 0.2) -> tuple:
+    """Return (seconds per call of function(argument), its result), repeating it for at least `minimum` seconds."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        result = function(argument)
+        calls += 1
+        if (elapsed := time.perf_counter() - start) >= minimum:
+            return elapsed / calls, result
+
+def bench_check(palindrome) -> None:
+    """Report the time to check palindromes of growing length by each method, and check that they agree."""
+    print("Whole-string check: palindromes of growing length")
+    methods = {
+        "pseudocode": pseudocode_check,
+        "reversed copy": lambda text: text == text[::-1],
+        "exact": lambda text: palindrome.is_palindrome(text, exact=True),
+        "normalised": palindrome.is_palindrome,
+    }
+    print(f"{'length':>12}" + "".join(f"{method:>16}" for method in methods))
+    rng = random.Random(0)
+    for length in LENGTHS:
+        half = "".join(rng.choice("abcdefghij") for _ in range(length // 2))
+        text = half + half[::-1]
+        near_miss = half[:-1] + "x" + half[::-1]  # Differs only next to the middle
+        cells, agree = [], True
+        for method, function in methods.items():
+            if method == "pseudocode" and length > PSEUDOCODE_LIMIT:
+                cells.append(f"{'(too slow)':>16}")
+                continue
+            seconds, result = time_call(function, text)
+            agree = agree and result is True and function(near_miss) is False
+            cells.append(f"{seconds * 1e6:>13,.1f} us")
+        print(f"{length:>12,}" + "".join(cells) + f"  {'OK' if agree else 'MISMATCH'}")
+    print()
+
+def expand_longest(text: str) -> int:
+    """Return the length of the longest palindrome in a text by expanding around each of its 2n - 1 centres."""
+    best = min(len(text), 1)
+    for centre in range(2 * len(text) - 1):
+        left, right = centre // 2, (centre + 1) // 2
+        while left >= 0 and right < len(text) and text[left] == text[right]:
+            left -= 1
+            right += 1
+        best = max(best, right - left - 1)
+    return best
+
+def brute_longest(text: str) -> int:
+    """Return the length of the longest palindrome in a text by checking every substring."""
+    return max((j - i for i in range(len(text)) for j in range(i + 1, len(text) + 1)
+                if text[i:j] == text[i:j][::-1]), default=0)
+
+def bench_longest(palindrome) -> None:
+    """Report the time to find the longest palindrome by expanding around centres and by Manacher's algorithm."""
+    print("Longest palindrome:")
+    print(f"{'text':>12} {'length':>12} {'expanding':>14} {'Manacher':>14} {'longest':>11}")
+    rng = random.Random(0)
+    for kind in ("random 'ab'", "all 'a'"):
+        for length in [10, 1_000, 10_000, 100_000, 1_000_000]:
+            text = "a" * length if kind == "all 'a'" else "".join(rng.choice("ab") for _ in range(length))
+            seconds, (_, found) = time_call(palindrome.manacher, text, minimum=0)
+            expanding, check = f"{'(too slow)':>14}", ""
+            if length <= EXPAND_LIMIT:
+                expand_seconds, expected = time_call(expand_longest, text, minimum=0)
+                expanding = f"{expand_seconds * 1e3:>11,.2f} ms"
+                check = "OK" if found == expected else f"MISMATCH (expected {expected})"
+            print(f"{kind:>12} {length:>12,} {expanding} {seconds * 1e3:>11,.2f} ms {found:>11,}  {check}")
+    strings = ["".join(rng.choice("abc") for _ in range(rng.randrange(12))) for _ in range(5_000)]
+    wrong = [text for text in strings if palindrome.manacher(text)[1] != brute_longest(text)]
+    print(f"Manacher agrees with brute force on {len(strings):,} short strings: "
+          f"{'OK' if not wrong else f'MISMATCH {wrong[:3]}'}")
+    print()
+
+def write_lines(path: str, megabytes: int, rng) -> tuple:
+    """Write a file of about `megabytes` MB of lines drawn from LINES; return its line and palindrome counts."""
+    block = [rng.choice(LINES) for _ in range(100_000)]
+    data = ("\n".join(line for line, _ in block) + "\n").encode('utf-8')
+    repeats = max(1, megabytes * 2**20 // len(data))
+    with open(path, 'wb') as file:
+        for _ in range(repeats):
+            file.write(data)
+    return repeats * len(block), repeats * sum(flag is True for _, flag in block)
+
+def run_check(path: str, workers: int) -> tuple:
+    """
+    Check every line of a file with check_file() and return (lines, palindromes, seconds, peak RSS in MB).
+
+    Run in a fresh process, so the peak belongs to this check alone: that of this process and of its largest worker.
+    """
+    multiprocessing.set_start_method("fork", force=True)  # Spawned workers could not import the loaded script
+    palindrome = load_palindrome()
+    lines = palindromes = 0
+    start = time.perf_counter()
+    for _, _, flags in palindrome.check_file(path, workers=workers):
+        lines += len(flags)
+        palindromes += flags.count(palindrome.PALINDROME)
+    return lines, palindromes, time.perf_counter() - start, palindrome.peak_memory()
+
+def run_loop(path: str) -> tuple:
+    """Check every line of a file with a plain loop, exactly, and return the same as run_check()."""
+    lines = palindromes = 0
+    start = time.perf_counter()
+    with open(path, 'rb') as file:
+        for line in file:
+            line = line.rstrip(b'\n')
+            lines += 1
+            palindromes += line == line[::-1] and not line.isspace() and line != b""
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) / 1024
+    return lines, palindromes, time.perf_counter() - start, peak
+
+def bench_file(megabytes: int, workers: int) -> None:
+    """Report the lines per second and peak memory of checking a large file, and check the counts."""
+    context = multiprocessing.get_context("spawn")  # A fresh interpreter, not a copy of this one
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "lines.txt")
+        expected_lines, expected_palindromes = write_lines(path, megabytes, random.Random(0))
+        size = os.path.getsize(path)
+        print(f"File: {size / 2**20:,.0f} MB, {expected_lines:,} lines")
+        print(f"{'method':>22} {'time':>10} {'lines/s':>12} {'MB/s':>8} {'peak RSS':>11} {'palindromes':>13}")
+        runs = [("plain loop (exact)", run_loop, (path,))]
+        runs += [(f"check_file, {count} worker{'s' if count > 1 else ''}", run_check, (path, count))
+                 for count in sorted({1, workers})]
+        for label, function, arguments in runs:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                lines, palindromes, elapsed, peak = executor.submit(function, *arguments).result()
+            check = ""
+            if function is run_check:
+                check = "OK" if (lines, palindromes) == (expected_lines, expected_palindromes) else "MISMATCH"
+            print(f"{label:>22} {elapsed:>8.2f} s {lines / elapsed:>12,.0f} {size / 2**20 / elapsed:>8,.0f} "
+                  f"{peak:>8.1f} MB {palindromes:>13,}  {check}")
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the palindrome tool.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: check, longest or file (default: all)")
+    parser.add_argument("--megabytes", type=int, default=1024, help="size of the file the file benchmark checks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for the parallel run")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    palindrome = load_palindrome()
+    if "check" in args.benchmarks:
+        bench_check(palindrome)
+    if "longest" in args.benchmarks:
+        bench_longest(palindrome)
+    if "file" in args.benchmarks:
+        bench_file(args.megabytes, args.workers)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Prime Number Benchmark
+
+This script measures and checks the prime number engine in 'Week 2 prime_numbers.py'.
+
+Benchmarks:
+- single: Microseconds per number for the pseudocode's trial division and for Miller-Rabin, on primes (the slowest
+  case for both) of growing size, up to the largest 64-bit prime. Trial division is skipped where it would take
+  too long.
+- accuracy: Miller-Rabin is compared with the sieve for every number below 10**6, and must reject strong
+  pseudoprimes and Carmichael numbers that fool weaker tests, and accept known large primes.
+- sieve: The primes below 10**k are counted for k up to --limit (10**9 by default) with one worker and with one per
+  core, and checked against the known values of pi(10**k). A window of 10**8 numbers at 10**12 is counted too.
+- batch: A file of random numbers (1M by default; 64-bit numbers, small numbers and a few lines that are not numbers)
+  is tested by check_file(), and the small numbers' answers checked against the sieve.
+
+Usage:
+    python "Week 2 prime_benchmark.py" [single] [accuracy] [sieve] [batch] [--limit 1000000000] [--numbers 1000000]
+        [--workers N]
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+
+PRIMES_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 2 prime_numbers.py")
+BENCHMARKS = ["single", "accuracy", "sieve", "batch"]
+PI = {10**k: count for k, count in enumerate(  # The number of primes below 10**k
+    [0, 4, 25, 168, 1229, 9592, 78498, 664579, 5761455, 50847534, 455052511, 4118054813, 37607912018])}
+TEST_PRIMES = [1_000_003, 1_000_000_007, 1_000_000_000_039, 1_000_000_000_000_037, 18_446_744_073_709_551_557]
+TRIAL_LIMIT = 10**13        # Largest prime the benchmark runs trial division on
+PSEUDOPRIMES = [            # Composites that pass the Fermat or a weak Miller-Rabin test
+    561, 1105, 1729, 2047, 3215031751, 2152302898747, 3474749660383, 341550071728321, 3825123056546413051,
+    318665857834031151167461]
+SMALL_LIMIT = 10**7         # Small numbers in the batch file are below this
+
+def load_primes():
+    """Import the prime number script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("prime_numbers", PRIMES_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["prime_numbers"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def time_per_call(function, number: int, minimum: float = 0.2) -> float:
+    """Return the seconds one call of function(number) takes, repeating it for at least `minimum` seconds."""
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < minimum:
+        function(number)
+        calls += 1
+    return elapsed / calls
+
+def bench_single(primes) -> None:
+    """Report the time to test primes of growing size by trial division and by Miller-Rabin."""
+    print("Single numbers (primes, the slowest case):")
+    print(f"{'number':>22} {'trial division':>16} {'Miller-Rabin':>14}")
+    for number in TEST_PRIMES:
+        trial = f"{time_per_call(primes.is_prime_trial, number) * 1e6:>13,.1f} us" if number <= TRIAL_LIMIT \
+            else f"{'(too slow)':>16}"
+        print(f"{number:>22} {trial} {time_per_call(primes.is_prime, number) * 1e6:>11,.1f} us")
+    print()
+
+def bench_accuracy(primes) -> None:
+    """Check Miller-Rabin against the sieve and against known pseudoprimes and primes."""
+    print("Accuracy:")
+    limit = 10**6
+    sieved = set(primes.primes_up_to(limit))
+    agree = all(primes.is_prime(number) == (number in sieved) for number in range(-10, limit))
+    print(f"Miller-Rabin agrees with the sieve below {limit:,}: {'OK' if agree else 'MISMATCH'}")
+    fooled = [number for number in PSEUDOPRIMES if primes.is_prime(number)]
+    print(f"{len(PSEUDOPRIMES)} pseudoprimes rejected: {'OK' if not fooled else f'MISMATCH {fooled}'}")
+    missed = [number for number in TEST_PRIMES + [2**61 - 1, 2**64 + 13, 2**89 - 1] if not primes.is_prime(number)]
+    print(f"known primes accepted: {'OK' if not missed else f'MISMATCH {missed}'}")
+    print()
+
+def bench_sieve(primes, limit: int, workers: int) -> None:
+    """Count the primes below powers of ten with the segmented sieve and check the counts."""
+    print(f"Sieve: primes below 10**k, segments of {primes.SEGMENT_SIZE:,} odd numbers")
+    print(f"{'range':>32} {'workers':>8} {'time':>10} {'numbers/s':>16} {'primes':>15}")
+    ranges = [(0, high) for high in sorted(PI) if 10**7 <= high <= limit] + [(10**12, 10**12 + 10**8)]
+    for low, high in ranges:
+        for count in sorted({1, workers}):
+            start = time.perf_counter()
+            found = primes.count_primes(low, high, workers=count)
+            elapsed = time.perf_counter() - start
+            check = ""
+            if low == 0:
+                check = "OK" if found == PI[high] else f"MISMATCH (expected {PI[high]:,})"
+            label = f"below {high:,}" if low == 0 else f"{low:,} + {high - low:,}"
+            print(f"{label:>32} {count:>8} {elapsed:>8.2f} s {(high - low) / elapsed:>16,.0f} "
+                  f"{found:>15,}  {check}")
+    print()
+
+def write_numbers(path: str, count: int, rng) -> list:
+    """Write a file of random numbers, one per line, and return its lines."""
+    lines = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.001:
+            lines.append("not a number")
+        elif roll < 0.5:
+            lines.append(str(rng.randrange(1, SMALL_LIMIT)))
+        else:
+            lines.append(str(rng.randrange(2**63, 2**64)))
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("\n".join(lines) + "\n")
+    return lines
+
+def bench_batch(primes, numbers: int, workers: int) -> None:
+    """Test a file of numbers with check_file() and check the small numbers against the sieve."""
+    print(f"Batch: {numbers:,} numbers in a file, half 64-bit, half below {SMALL_LIMIT:,}, 0.1% invalid")
+    print(f"{'workers':>8} {'time':>10} {'numbers/s':>12} {'primes':>10} {'invalid':>8}")
+    sieved = set(primes.primes_up_to(SMALL_LIMIT))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "numbers.txt")
+        lines = write_numbers(path, numbers, random.Random(0))
+        for count in sorted({1, workers}):
+            start = time.perf_counter()
+            results = list(primes.check_file(path, workers=count))
+            elapsed = time.perf_counter() - start
+            correct = [line for line, _ in results] == lines and all(
+                flag == (int(line) in sieved) for line, flag in results
+                if flag is not None and int(line) < SMALL_LIMIT)
+            invalid = sum(flag is None for _, flag in results)
+            found = sum(flag is True for _, flag in results)
+            print(f"{count:>8} {elapsed:>8.2f} s {numbers / elapsed:>12,.0f} {found:>10,} {invalid:>8}  "
+                  f"{'OK' if correct else 'MISMATCH'}")
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the prime number engine.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: single, accuracy, sieve or batch (default: all)")
+    parser.add_argument("--limit", type=int, default=10**9, help="largest power of ten to count the primes below")
+    parser.add_argument("--numbers", type=int, default=1_000_000, help="numbers in the batch file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for the parallel runs")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    primes = load_primes()
+    if "single" in args.benchmarks:
+        bench_single(primes)
+    if "accuracy" in args.benchmarks:
+        bench_accuracy(primes)
+    if "sieve" in args.benchmarks:
+        bench_sieve(primes, args.limit, args.workers)
+    if "batch" in args.benchmarks:
+        bench_batch(primes, args.numbers, args.workers)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,179 @@
 #!/usr/bin/env python3
 # coding: utf-8
 
+"""
+Guess the Number
+
+The computer picks a secret number between 1 and a maximum set by the difficulty level (10, 100 or 1000), and the
+player guesses until they find it, being told after each guess whether it was too high or too low.
+
+With --simulate GAMES the game is played headlessly by guessing strategies instead of a person, to see how many
+guesses each difficulty takes: 'binary' halves the remaining range every time, 'random' guesses anywhere in it, and
+'human' is a model of a person, who aims near the middle but not exactly at it and likes round numbers. Games are
+played in NumPy batches, a round of guessing at a time for every game in the batch, rather than one game at a time
+in Python. A strategy whose guesses depend only on the range left (such as 'binary') plays every secret once, and
+each simulated game looks up its secret's result. The guess-count distribution of each strategy and maximum is
+printed as a table. NumPy is only imported for --simulate, so the game itself needs nothing beyond the standard
+library.
+
+Usage:
+    python "Week 3 Task - NGG.py" [--simulate 1000000 [--strategy binary random human] [--n-max 10 100 1000]
+        [--seed N]]
+"""
+
+import argparse
 import random  # Import random module for generating random numbers
+import sys
+import time
+
+np = None  # NumPy, imported by load_numpy() when a simulation first needs it
+
+DIFFICULTIES = {1: 10, 2: 100, 3: 1000}  # Difficulty level -> largest secret number
+BATCH_SIZE = 2**20          # Games simulated together
+TABLE_LIMIT = 2**22         # Largest n_max whose secrets are all played once by deterministic strategies
+HUMAN_SPREAD = 4.0          # Shape of the Beta(a, a) the human model aims with; higher aims nearer the middle
+HUMAN_ROUNDING = 0.6        # Chance that the human model rounds its guess to a multiple of 10 (or 5)
+
+
+class BinarySearch:
+    """Guess the middle of the numbers still possible, which finds any secret in at most log2(n_max) + 1 guesses."""
+
+    name = "binary"
+    deterministic = True  # Each guess depends only on the range left, so each secret always takes as many guesses
+
+    def guess(self, low, high, rng):
+        return (low + high) // 2
+
+
+class RandomGuess:
+    """Guess any of the numbers still possible, all equally likely."""
+
+    name = "random"
+    deterministic = False
+
+    def guess(self, low, high, rng):
+        return low + (rng.random(low.size) * (high - low + 1)).astype(np.int64)
+
+
+class HumanGuess:
+    """
+    A model of a person playing: they aim near the middle of the numbers still possible, but not exactly at it, and
+    they like round numbers.
+
+    Where in the range they aim is drawn from a Beta(`spread`, `spread`) distribution, which centres on the middle and
+    narrows as `spread` grows. With chance `rounding` the guess is then moved to the nearest multiple of 10 (or of 5,
+    when the range is narrower than 50) still in the range.
+    """
+
+    name = "human"
+    deterministic = False
+
+    def __init__(self, spread: float = HUMAN_SPREAD, rounding: float = HUMAN_ROUNDING):
+        self.spread = spread
+        self.rounding = rounding
+
+    def guess(self, low, high, rng):
+        width = high - low
+        guesses = low + np.rint(rng.beta(self.spread, self.spread, low.size) * width).astype(np.int64)
+        step = np.where(width >= 50, 10, 5)
+        rounded = np.rint(guesses / step).astype(np.int64) * step
+        use = (rng.random(low.size) < self.rounding) & (width >= 10) & (rounded >= low) & (rounded <= high)
+        return np.where(use, rounded, guesses)
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (BinarySearch, RandomGuess, HumanGuess)}
+
+
+def load_numpy():
+    """Import NumPy into the module the first time a simulation runs, and return it."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def play_games(strategy, secrets, n_max: int, rng) -> "np.ndarray":
+    """
+    Play one game for each secret, every game a guess at a time together. Returns the guesses each game took.
+
+    Games that are won drop out of the arrays, so each round costs time in proportion to the games still going.
+    """
+    load_numpy()
+    secrets = np.asarray(secrets, dtype=np.int64)
+    taken = np.zeros(secrets.size, dtype=np.int64)
+    low = np.ones(secrets.size, dtype=np.int64)
+    high = np.full(secrets.size, n_max, dtype=np.int64)
+    going = np.arange(secrets.size)
+    round_number = 0
+    while going.size:
+        round_number += 1
+        guesses = strategy.guess(low, high, rng)
+        playing = secrets[going]
+        found = guesses == playing
+        taken[going[found]] = round_number
+        keep = ~found
+        low = np.where(guesses < playing, guesses + 1, low)[keep]
+        high = np.where(guesses > playing, guesses - 1, high)[keep]
+        going = going[keep]
+    return taken
+
+
+def simulate(strategy, n_max: int, games: int, seed: int = None, batch_size: int = BATCH_SIZE) -> "np.ndarray":
+    """
+    Simulate `games` games with secrets drawn uniformly from 1 to n_max, in batches of `batch_size`.
+
+    Returns the number of games won with each number of guesses (element k for k guesses). A deterministic strategy
+    plays each possible secret once (for n_max up to TABLE_LIMIT), and each game then looks up its secret's result,
+    which gives the same distribution as playing every game out.
+    """
+    load_numpy()
+    rng = np.random.default_rng(seed)
+    table = None
+    if strategy.deterministic and n_max <= TABLE_LIMIT:
+        table = play_games(strategy, np.arange(1, n_max + 1), n_max, rng)
+    counts = np.zeros(1, dtype=np.int64)
+    for start in range(0, games, batch_size):
+        secrets = rng.integers(1, n_max + 1, size=min(batch_size, games - start))
+        if table is not None:
+            batch_counts = np.bincount(table[secrets - 1])
+        else:
+            batch_counts = np.bincount(play_games(strategy, secrets, n_max, rng))
+        if batch_counts.size > counts.size:
+            counts = np.pad(counts, (0, batch_counts.size - counts.size))
+        counts[:batch_counts.size] += batch_counts
+    return counts
+
+
+def percentile_guesses(counts: "np.ndarray", fraction: float) -> int:
+    """Return the fewest guesses within which at least `fraction` of the games were won."""
+    return int(np.searchsorted(np.cumsum(counts), fraction * counts.sum()))
+
+
+def print_distribution(counts: "np.ndarray") -> None:
+    """Print the share of games won with each number of guesses, and the running total."""
+    games = counts.sum()
+    print(f"{'guesses':>9} {'games':>14} {'share':>8} {'cumulative':>11}")
+    total = 0
+    for guesses in range(1, counts.size):
+        if counts[guesses]:
+            total += counts[guesses]
+            print(f"{guesses:>9} {counts[guesses]:>14,} {counts[guesses] / games:>8.2%} {total / games:>11.2%}")
+
+
+def run_simulations(strategies, maximums, games: int, seed: int = None) -> None:
+    """Simulate every strategy at every maximum and print the guess-count distributions."""
+    for n_max in maximums:
+        for name in strategies:
+            start = time.perf_counter()
+            counts = simulate(STRATEGIES[name](), n_max, games, seed)
+            elapsed = time.perf_counter() - start
+            mean = (np.arange(counts.size) * counts).sum() / counts.sum()
+            print(f"\n{name} guessing, 1-{n_max}: {games:,} games in {elapsed:.2f} s ({games / elapsed:,.0f} games/s)")
+            print(f"mean {mean:.2f} guesses, median {percentile_guesses(counts, 0.5)}, "
+                  f"90% within {percentile_guesses(counts, 0.9)}, 99% within {percentile_guesses(counts, 0.99)}, "
+                  f"most {counts.size - 1}")
+            print_distribution(counts)
 
 
 def play_game(n_max: int):
@@ -25,41 +197,65 @@ def play_game(n_max: int):
             print("Please enter a valid integer.")
 
 
-# The game starts here
-print("Let's play Guess the Number.")
+def main() -> None:
+    """Play the game interactively, or simulate it with --simulate."""
+    parser = argparse.ArgumentParser(description="Guess the Number.")
+    parser.add_argument("--simulate", type=int, metavar="GAMES",
+                        help="simulate this many games per strategy and maximum instead of playing")
+    parser.add_argument("--strategy", nargs="+", choices=sorted(STRATEGIES), default=list(STRATEGIES),
+                        help="strategies to simulate (default: all)")
+    parser.add_argument("--n-max", type=int, nargs="+", default=list(DIFFICULTIES.values()),
+                        help="largest secret numbers to simulate (default: those of the difficulty levels)")
+    parser.add_argument("--seed", type=int, help="seed for the simulated games, to repeat them exactly")
+    args = parser.parse_args()
+    if any(n_max < 1 for n_max in args.n_max):
+        parser.error("--n-max must be at least 1")
+    if args.simulate is not None and args.simulate < 1:
+        parser.error("--simulate must be at least 1")
+
+    if args.simulate is not None:
+        try:
+            load_numpy()
+        except ImportError:
+            parser.error("--simulate needs NumPy (pip install numpy)")
+        run_simulations(args.strategy, args.n_max, args.simulate, args.seed)
+        return
 
-# The main game loop
-while True:
-    # Set the initial difficulty level to 0
-    difficulty = 0
+    # The game starts here
+    print("Let's play Guess the Number.")
 
-    # Loop to ensure a valid difficulty level is chosen
+    # The main game loop
     while True:
-        # Prompt user to pick a difficulty level
-        difficulty = input("Pick a difficulty level (1, 2, or 3): ")
+        # Set the initial difficulty level to 0
+        difficulty = 0
 
-        # Check if input is a digit and within the valid range
-        if difficulty.isdigit() and 1 <= int(difficulty) <= 3:
-            difficulty = int(difficulty)  # Convert string input to integer
-            break  # Exit loop if valid input is provided
-        else:
-            print("Please enter 1, 2, or 3.")  # Prompt for valid input
+        # Loop to ensure a valid difficulty level is chosen
+        while True:
+            # Prompt user to pick a difficulty level
+            difficulty = input("Pick a difficulty level (1, 2, or 3): ")
+
+            # Check if input is a digit and within the valid range
+            if difficulty.isdigit() and 1 <= int(difficulty) <= 3:
+                difficulty = int(difficulty)  # Convert string input to integer
+                break  # Exit loop if valid input is provided
+            else:
+                print("Please enter 1, 2, or 3.")  # Prompt for valid input
+
+        # Assign a maximum number for guessing based on the chosen difficulty
+        n_max = DIFFICULTIES[difficulty]
+
+        play_game(n_max)  # Call the play_game function
 
-    # Assign a maximum number for guessing based on the chosen difficulty
-    n_max = 10
-    if difficulty == 2:
-        n_max = 100
-    elif difficulty == 3:
-        n_max = 1000
+        # Ask user if they want to play again
+        play_again = input("Do you want to play again (y/N)? ")
 
-    play_game(n_max)  # Call the play_game function
+        # Convert input to lowercase and remove leading/trailing spaces
+        play_again = play_again.lower().strip()
 
-    # Ask user if they want to play again
-    play_again = input("Do you want to play again (y/N)? ")
+        # Check if the response starts with 'n' ('no', 'nope', 'nah', 'negative', 'never again')
+        if play_again.startswith("n"):
+            break  # Exit the main game loop if user chooses not to play again
 
-    # Convert input to lowercase and remove leading/trailing spaces
-    play_again = play_again.lower().strip()
 
-    # Check if the response starts with 'n' ('no', 'nope', 'nah', 'negative', 'never again')
-    if play_again.startswith("n"):
-        break  # Exit the main game loop if user chooses not to play again
+if __name__ == '__main__':
+    sys.exit(main())
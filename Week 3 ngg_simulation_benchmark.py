@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Guess the Number Simulation Benchmark
+
+This script measures and checks the headless simulation engine in 'Week 3 Task - NGG.py' (--simulate).
+
+Benchmarks:
+- throughput: Games simulated per second by each strategy at each maximum (10M games by default), next to a plain
+  Python loop that plays the binary search strategy one game at a time.
+- accuracy: The engine's results are checked against results known exactly. Binary search over 1 to n_max must find
+  2**(k-1) of the secrets with its k-th guess, until the last guess, which finds the rest. Looking up each game's
+  secret in the binary search table must give exactly the distribution that playing every game out does. And the
+  mean guesses of random guessing must match 2(1 + 1/n)H(n) - 3, the mean depth plus one of a node in a random
+  binary search tree of n nodes, to within a few standard errors.
+
+Usage:
+    python "Week 3 ngg_simulation_benchmark.py" [throughput] [accuracy] [--games 10000000] [--n-max 10 100 1000]
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+NGG_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 3 Task - NGG.py")
+LOOP_GAMES = 200_000  # Games played by the plain Python loop
+BENCHMARKS = ["throughput", "accuracy"]
+
+def load_ngg():
+    """Import the game script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("ngg", NGG_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["ngg"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def binary_search_loop(n_max: int, games: int, rng) -> list:
+    """Play binary search one game at a time in Python and return how many games took each number of guesses."""
+    counts = [0] * (n_max.bit_length() + 2)
+    for _ in range(games):
+        secret = rng.randint(1, n_max)
+        low, high, guesses = 1, n_max, 1
+        while (guess := (low + high) // 2) != secret:
+            if guess < secret:
+                low = guess + 1
+            else:
+                high = guess - 1
+            guesses += 1
+        counts[guesses] += 1
+    return counts
+
+def bench_throughput(ngg, maximums, games: int) -> None:
+    """Report the games per second of each strategy at each maximum, and of a plain Python loop."""
+    print(f"Throughput: {games:,} games per strategy and maximum")
+    print(f"{'strategy':>12} {'n_max':>7} {'time':>9} {'games/s':>14} {'mean guesses':>13}")
+    for n_max in maximums:
+        start = time.perf_counter()
+        counts = binary_search_loop(n_max, LOOP_GAMES, random.Random(0))
+        elapsed = time.perf_counter() - start
+        mean = sum(guesses * count for guesses, count in enumerate(counts)) / LOOP_GAMES
+        print(f"{'Python loop':>12} {n_max:>7} {elapsed:>7.2f} s {LOOP_GAMES / elapsed:>14,.0f} {mean:>13.3f}")
+        for name, strategy in ngg.STRATEGIES.items():
+            start = time.perf_counter()
+            counts = ngg.simulate(strategy(), n_max, games, seed=0)
+            elapsed = time.perf_counter() - start
+            mean = (np.arange(counts.size) * counts).sum() / counts.sum()
+            print(f"{name:>12} {n_max:>7} {elapsed:>7.2f} s {games / elapsed:>14,.0f} {mean:>13.3f}")
+    print()
+
+def bench_accuracy(ngg, maximums, games: int) -> None:
+    """Check the simulated distributions against exactly known results."""
+    print("Accuracy:")
+    rng = np.random.default_rng(0)
+    for n_max in maximums:
+        table = ngg.play_games(ngg.BinarySearch(), np.arange(1, n_max + 1), n_max, rng)
+        found = np.bincount(table)[1:]
+        rounds = n_max.bit_length()
+        exact = [2 ** k for k in range(rounds - 1)] + [n_max - 2 ** (rounds - 1) + 1]
+        print(f"binary search finds 1-{n_max} as 2**(k-1) per guess: "
+              f"{'OK' if found.tolist() == exact else 'MISMATCH'}")
+
+        secrets = rng.integers(1, n_max + 1, size=min(games, 2**20))
+        played = np.bincount(ngg.play_games(ngg.BinarySearch(), secrets, n_max, rng))
+        looked_up = np.bincount(table[secrets - 1])
+        print(f"binary search table equals playing every game, 1-{n_max}: "
+              f"{'OK' if np.array_equal(played, looked_up) else 'MISMATCH'}")
+
+        counts = ngg.simulate(ngg.RandomGuess(), n_max, games, seed=0)
+        guesses = np.arange(counts.size)
+        mean = (guesses * counts).sum() / games
+        error = math.sqrt(((guesses - mean) ** 2 * counts).sum() / games / games)
+        harmonic = sum(1 / k for k in range(1, n_max + 1))
+        expected = 2 * (1 + 1 / n_max) * harmonic - 3
+        print(f"random guessing mean, 1-{n_max}: {mean:.4f} simulated, {expected:.4f} exact, "
+              f"{abs(mean - expected) / error:.1f} standard errors apart  "
+              f"{'OK' if abs(mean - expected) < 4 * error else 'MISMATCH'}")
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the Guess the Number simulation engine.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: throughput or accuracy (default: all)")
+    parser.add_argument("--games", type=int, default=10_000_000, help="games per strategy and maximum")
+    parser.add_argument("--n-max", type=int, nargs="+", default=[10, 100, 1000], help="largest secret numbers")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    ngg = load_ngg()
+    if "throughput" in args.benchmarks:
+        bench_throughput(ngg, args.n_max, args.games)
+    if "accuracy" in args.benchmarks:
+        bench_accuracy(ngg, args.n_max, args.games)
+
+if __name__ == '__main__':
+    sys.exit(main())
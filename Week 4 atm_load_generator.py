@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+ATM Ledger Load Generator
+
+This script checks that the ledger in 'Week 4 simulated_atm.py' stays correct under concurrent use. It opens a set of
+accounts, then starts thousands of sessions, each in its own thread. Every session makes random deposits and
+withdrawals against random accounts, through make_deposit() and make_withdrawal() as the ATM's own menu and server
+do, and keeps a tally of what it changed. The sessions start together behind a
+barrier so they really do contend for the same accounts.
+
+When every session has finished, each account's balance must equal its opening balance plus the tallied deposits
+minus the tallied withdrawals (no lost updates), and no withdrawal may ever have left a balance below zero. The
+script reports whether both checks passed, along with the transactions per second achieved.
+
+Usage:
+    python "Week 4 atm_load_generator.py" [--sessions 2000] [--accounts 50] [--transactions 50]
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import threading
+import time
+from decimal import Decimal
+
+ATM_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 4 simulated_atm.py")
+
+def load_atm():
+    """Import the ATM script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("simulated_atm", ATM_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["simulated_atm"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def discard(message: str) -> None:
+    """Stand in for print() as the sessions' output, which nobody reads."""
+
+def run_session(atm, accounts: list, transactions: int, seed: int, barrier, results: list) -> None:
+    """Make random deposits and withdrawals, recording the net change per account and any negative balance."""
+    rng = random.Random(seed)
+    net = {}
+    negative = 0
+    barrier.wait()  # Start with every other session
+    for _ in range(transactions):
+        account = rng.choice(accounts)
+        amount = atm.to_amount(Decimal(rng.randint(1, 10_000)) / 100)
+        if rng.random() < 0.5:
+            atm.make_deposit(amount, account, out=discard)
+            net[account] = net.get(account, 0) + amount
+        else:
+            balance = atm.make_withdrawal(amount, account, out=discard)
+            if balance is None:
+                continue  # Insufficient funds
+            net[account] = net.get(account, 0) - amount
+            if balance < 0:
+                negative += 1
+    results.append((net, negative))
+
+def main() -> int:
+    """Run the concurrent sessions and check the ledger afterwards."""
+    parser = argparse.ArgumentParser(description="Load test the ATM ledger with concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=2000, help="concurrent sessions (threads)")
+    parser.add_argument("--accounts", type=int, default=50, help="accounts shared by the sessions")
+    parser.add_argument("--transactions", type=int, default=50, help="transactions per session")
+    parser.add_argument("--opening-balance", type=Decimal, default=Decimal("500.00"))
+    args = parser.parse_args()
+
+    atm = load_atm()
+    ledger = atm.ledger = atm.Ledger()  # The ledger make_deposit() and make_withdrawal() work on
+    accounts = list(range(1, args.accounts + 1))
+    for number in accounts:
+        ledger.open_account(number, f"Customer {number}", f"{number % 10_000:04d}", args.opening_balance)
+
+    threading.stack_size(256 * 1024)  # Thousands of threads need far less than the default stack
+    barrier = threading.Barrier(args.sessions + 1)
+    results = []
+    threads = [threading.Thread(target=run_session,
+                                args=(atm, accounts, args.transactions, seed, barrier, results))
+               for seed in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    expected = {number: args.opening_balance for number in accounts}
+    negative = 0
+    for net, session_negative in results:
+        negative += session_negative
+        for number, change in net.items():
+            expected[number] += change
+    lost = [number for number in accounts if ledger.balance(number) != expected[number]]
+    below_zero = [number for number in accounts if ledger.balance(number) < 0]
+    total = args.sessions * args.transactions
+
+    print(f"{args.sessions:,} sessions x {args.transactions} transactions on {args.accounts} accounts")
+    print(f"{total:,} transactions in {elapsed:.2f}s ({total / elapsed:,.0f} transactions/second)")
+    print(f"Lost updates: {len(lost)} accounts" + (f" {lost[:10]}" if lost else ""))
+    print(f"Negative balances: {negative + len(below_zero)}")
+    if lost or negative or below_zero:
+        print("FAILED")
+        return 1
+    print("PASSED")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+ATM Transaction Log Benchmark
+
+This script measures the write-ahead transaction log in 'Week 4 simulated_atm.py'. It works on log files in a
+temporary directory, so the real 'atm_ledger.log' is never touched.
+
+Benchmarks:
+- commit: Committed transactions per second when many threads make deposits and withdrawals at once, each waiting
+  for its transaction to be durable. This compares an fsync() per transaction with group commit at several
+  maximum commit delays, and shows how many transactions shared each fsync().
+- recovery: A child process logs a long history of transactions (10M by default) and is killed without closing the
+  log, as if it had crashed. The ledger is then recovered from the snapshot and the log tail and checked against
+  the balances the child reported. With --full-replay, the same is done without snapshots for comparison.
+
+Usage:
+    python "Week 4 atm_log_benchmark.py" [commit] [recovery] [--threads 64] [--transactions 20000]
+        [--delays 0 1 5] [--history 10000000] [--full-replay]
+"""
+
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+ATM_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 4 simulated_atm.py")
+ACCOUNTS = 1000
+BENCHMARKS = ["commit", "recovery"]
+
+def load_atm():
+    """Import the ATM script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("simulated_atm", ATM_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["simulated_atm"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def open_accounts(ledger) -> None:
+    """Open the benchmark accounts, each with enough money that most withdrawals succeed."""
+    for number in range(1, ACCOUNTS + 1):
+        ledger.open_account(number, f"Customer {number}", f"{number % 10_000:04d}", Decimal("1000.00"))
+
+def transact(atm, ledger, rng) -> None:
+    """Make one random deposit or withdrawal."""
+    number = rng.randint(1, ACCOUNTS)
+    amount = Decimal(rng.randint(1, 10_000)) / 100
+    if rng.random() < 0.5:
+        ledger.deposit(number, amount)
+    else:
+        try:
+            ledger.withdraw(number, amount)
+        except atm.InsufficientFundsError:
+            ledger.deposit(number, amount)
+
+def bench_commit(atm, threads: int, transactions: int, delays) -> None:
+    """Report committed transactions per second for an fsync() per transaction and for group commit."""
+    per_thread = max(1, transactions // threads)
+    total = per_thread * threads
+    runs = [("fsync per transaction", 0, 1)] + [(f"group, {delay:g} ms delay", delay, atm.GROUP_COMMIT_MAX)
+                                                 for delay in delays]
+    print(f"Commit: {threads} threads, {total:,} transactions")
+    print(f"{'log':>24} {'transactions/s':>15} {'fsyncs':>8} {'per fsync':>10}")
+    for label, delay, max_group in runs:
+        with tempfile.TemporaryDirectory() as folder:
+            ledger = atm.Ledger.recover(os.path.join(folder, "atm_ledger.log"), max_delay=delay / 1000,
+                                        max_group=max_group)
+            open_accounts(ledger)
+            ledger.log.fsyncs = 0
+
+            def session(seed):
+                rng = random.Random(seed)
+                barrier.wait()
+                for _ in range(per_thread):
+                    transact(atm, ledger, rng)
+
+            barrier = threading.Barrier(threads + 1)
+            workers = [threading.Thread(target=session, args=(seed,)) for seed in range(threads)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            fsyncs = ledger.log.fsyncs
+            ledger.close()
+        print(f"{label:>24} {total / elapsed:>15,.0f} {fsyncs:>8,} {total / max(fsyncs, 1):>10.1f}")
+    print()
+
+def write_history(path: str, history: int, snapshot_every: int, results) -> None:
+    """Log `history` transactions, report the balances, then die without closing the log (run in a child process)."""
+    atm = load_atm()
+    ledger = atm.Ledger.recover(path, snapshot_every=snapshot_every, synchronous=False)
+    open_accounts(ledger)
+    rng = random.Random(0)
+    for _ in range(history):
+        transact(atm, ledger, rng)
+    ledger.log.sync()  # Crash straight after the last transaction was committed
+    results.put({account.number: str(account.balance) for account in ledger.accounts()})
+    results.close()
+    results.join_thread()
+    os._exit(0)
+
+def bench_recovery(atm, history: int, snapshot_every: int, label: str) -> None:
+    """Crash a process after logging `history` transactions and time recovering its balances."""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "atm_ledger.log")
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        writer = multiprocessing.Process(target=write_history, args=(path, history, snapshot_every, results))
+        writer.start()
+        expected = results.get()
+        writer.join()
+        logged = time.perf_counter() - start
+
+        size = sum(os.path.getsize(filename) for _, filename in atm.log_segments(path))
+        start = time.perf_counter()
+        ledger = atm.Ledger.recover(path)
+        recovered = time.perf_counter() - start
+        ledger.close()
+        matches = all(str(ledger.balance(number)) == balance for number, balance in expected.items())
+
+    print(f"{label:>16} {history:>12,} {logged:>9.1f} s {size / 2**20:>9.1f} MB {ledger.replayed:>12,} "
+          f"{recovered:>10.3f} s  {'OK' if matches else 'MISMATCH'}")
+
+def main() -> None:
+    """Run the selected transaction log benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the ATM transaction log.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: commit or recovery (default: all)")
+    parser.add_argument("--threads", type=int, default=64, help="concurrent sessions for the commit benchmark")
+    parser.add_argument("--transactions", type=int, default=20_000, help="transactions per commit run")
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 1, 5],
+                        help="maximum commit delays to try, in milliseconds")
+    parser.add_argument("--history", type=int, default=10_000_000, help="transactions logged before the crash")
+    parser.add_argument("--snapshot-every", type=int, help="log records between snapshots (default: the ATM's)")
+    parser.add_argument("--full-replay", action="store_true", help="also time recovery with snapshots disabled")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    atm = load_atm()
+    if "commit" in args.benchmarks:
+        bench_commit(atm, args.threads, args.transactions, args.delays)
+    if "recovery" in args.benchmarks:
+        snapshot_every = args.snapshot_every or atm.SNAPSHOT_EVERY
+        print(f"Recovery after a crash, snapshot every {snapshot_every:,} records")
+        print(f"{'recovery':>16} {'transactions':>12} {'logging':>11} {'log size':>12} {'replayed':>12} "
+              f"{'recovery':>12}")
+        bench_recovery(atm, args.history, snapshot_every, "snapshot + tail")
+        if args.full_replay:
+            bench_recovery(atm, args.history, 0, "full replay")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+ATM Server Load Generator
+
+This script measures the TCP server mode of 'Week 4 simulated_atm.py' ('--serve'). It opens thousands of client
+connections with asyncio, all held open at the same time. Each client reads the greeting and logs in, then waits
+until every other client has connected too. Then all of them make a series of balance checks, deposits and
+withdrawals together, and finally quit.
+
+The script reports how long connecting and logging in took, and the latency percentiles of the requests made while
+every connection was open, along with the requests per second achieved.
+
+Unless --connect is given, the server is started in a child process on a free port, keeping its balances in memory
+(or, with --durable, in a transaction log in a temporary directory).
+
+Usage:
+    python "Week 4 atm_server_load_generator.py" [--connections 10000] [--requests 10] [--connect HOST:PORT]
+        [--durable]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ATM_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 4 simulated_atm.py")
+PIN = "1337"  # PIN of the ATM's default account
+
+def raise_file_limit() -> None:
+    """Raise this process's limit on open files as far as allowed, so it can hold many connections."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Return the value below which `fraction` of the sorted values fall."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class Gate:
+    """Holds clients back until a given number of them have arrived (asyncio.Barrier needs Python 3.11)."""
+
+    def __init__(self, parties: int):
+        self.waiting = parties
+        self.open = asyncio.Event()
+
+    async def wait(self) -> None:
+        self.waiting -= 1
+        if self.waiting == 0:
+            self.open.set()
+        await self.open.wait()
+
+async def request(reader, writer, line: str, latencies: list) -> str:
+    """Send one request, wait for its reply and record how long it took."""
+    start = time.perf_counter()
+    writer.write(line.encode() + b"\n")
+    reply = await reader.readline()
+    latencies.append(time.perf_counter() - start)
+    if not reply.startswith((b"OK", b"ERR")):
+        raise ConnectionError(f"unexpected reply to {line!r}: {reply!r}")
+    return reply.decode()
+
+async def run_client(host: str, port: int, requests: int, seed: int, connecting, gate: Gate, stats: dict) -> None:
+    """Connect and log in, wait for every other client, then make `requests` random requests and quit."""
+    rng = random.Random(seed)
+    reader = writer = None
+    try:
+        async with connecting:  # Limit connections in progress, so the server's accept queue does not overflow
+            start = time.perf_counter()
+            reader, writer = await asyncio.open_connection(host, port)
+            await reader.readline()  # Greeting
+            if not (await request(reader, writer, f"LOGIN {PIN}", stats["login"])).startswith("OK"):
+                raise ConnectionError("login refused")
+            stats["connect"].append(time.perf_counter() - start)
+    except OSError as error:
+        stats["errors"].append(error)
+    await gate.wait()
+    if writer is None:
+        return
+    try:
+        for _ in range(requests):
+            roll = rng.random()
+            if roll < 0.4:
+                line = "BALANCE"
+            else:
+                amount = f"{rng.randint(1, 10_000) / 100:.2f}"
+                line = f"DEPOSIT {amount}" if roll < 0.7 else f"WITHDRAW {amount}"
+            await request(reader, writer, line, stats["request"])
+        await request(reader, writer, "QUIT", stats["request"])
+    except OSError as error:
+        stats["errors"].append(error)
+    finally:
+        writer.close()
+
+async def run_load(host: str, port: int, connections: int, requests: int, concurrent_connects: int) -> None:
+    """Run every client together and report connection and request latencies."""
+    stats = {"connect": [], "login": [], "request": [], "errors": []}
+    gate = Gate(connections + 1)
+    connecting = asyncio.Semaphore(concurrent_connects)
+    clients = [asyncio.create_task(run_client(host, port, requests, seed, connecting, gate, stats))
+               for seed in range(connections)]
+
+    start = time.perf_counter()
+    while gate.waiting > 1:
+        await asyncio.sleep(0.01)
+    connected = time.perf_counter() - start
+    start = time.perf_counter()
+    await gate.wait()
+    await asyncio.gather(*clients)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(stats['connect']):,} of {connections:,} clients connected and logged in within {connected:.2f} s")
+    print(f"{len(stats['request']):,} requests in {elapsed:.2f} s with every connection open: "
+          f"{len(stats['request']) / elapsed:,.0f} requests/s")
+    print(f"{'latency':>10} {'count':>9} {'p50':>10} {'p90':>10} {'p99':>10} {'p99.9':>10} {'max':>10}")
+    for name in ("connect", "login", "request"):
+        times = sorted(stats[name])
+        print(f"{name:>10} {len(times):>9,} " + " ".join(
+            f"{percentile(times, fraction) * 1000:>7.2f} ms" for fraction in (0.5, 0.9, 0.99, 0.999, 1.0)))
+    if stats["errors"]:
+        print(f"{len(stats['errors']):,} clients failed, e.g. {stats['errors'][0]!r}")
+
+def start_server(folder: str, durable: bool) -> tuple:
+    """Start the ATM server in a child process on a free port. Returns the process, host and port."""
+    command = [sys.executable, ATM_SCRIPT, "--serve", "127.0.0.1:0"]
+    if durable:
+        command += ["--log", os.path.join(folder, "atm_ledger.log")]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()  # "Serving the Python ATM on HOST:PORT"
+    if not line.startswith("Serving"):
+        server.kill()
+        raise RuntimeError(f"the ATM server did not start: {line!r}")
+    host, _, port = line.split()[-1].rpartition(":")
+    return server, host, int(port)
+
+def main() -> None:
+    """Run the load against a server, starting one if none was given."""
+    parser = argparse.ArgumentParser(description="Load test the ATM server with many concurrent connections.")
+    parser.add_argument("--connections", type=int, default=10_000, help="clients connected at the same time")
+    parser.add_argument("--requests", type=int, default=10, help="requests each client makes once all are connected")
+    parser.add_argument("--concurrent-connects", type=int, default=500, help="connections opened at once")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="use a running server instead of starting one")
+    parser.add_argument("--durable", action="store_true", help="start the server with a transaction log")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    with tempfile.TemporaryDirectory() as folder:
+        if args.connect:
+            server = None
+            host, _, port = args.connect.rpartition(":")
+            host, port = host or "127.0.0.1", int(port)
+        else:
+            server, host, port = start_server(folder, args.durable)
+        try:
+            asyncio.run(run_load(host, port, args.connections, args.requests, args.concurrent_connects))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+if __name__ == '__main__':
+    sys.exit(main())
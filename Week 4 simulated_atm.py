@@ -7,43 +7,488 @@ Python ATM Simulator
 This script simulates basic operations of an Automated Teller Machine (ATM). It allows a user to log in using a PIN,
 check their balance, make deposits, and withdraw money. The script demonstrates the use of functions, loops,
 conditionals, and exception handling in Python.
+
+Accounts are kept in a Ledger rather than in global variables. Each account has its own lock, and balances are
+Decimal amounts rounded to the cent, so many sessions can use the ledger at once without losing updates or
+rounding errors.
+
+With --log [PATH], balances are kept between runs in a write-ahead transaction log ('atm_ledger.log' in the current
+folder if no PATH is given). Every deposit and withdrawal is written to the log and fsync()ed before it is confirmed,
+and transactions arriving together share one fsync() (group commit). Snapshots of all balances are taken
+periodically, so starting up replays only the end of the log. Without --log, balances are kept in memory only and
+the ATM leaves no files behind, as the original script did.
+
+With --serve [HOST:]PORT the ATM serves many terminals at once over TCP instead of running interactively. Each
+request is one line, and each reply is one line starting with OK or ERR:
+    LOGIN [account] <pin>, BALANCE, DEPOSIT <amount>, WITHDRAW <amount>, QUIT
+Wrong PINs are answered more and more slowly, and an account is locked for a while after too many of them.
+
+With INSTRUMENT=1 in the environment, the latency of every login, deposit and withdrawal is recorded and summarised
+on exit (see instrumentation.py, which can also write the figures as JSON or profile the whole run).
 """
 
+import argparse
+import asyncio
+import functools
 import getpass  # Import getpass module for hiding PIN input
+import glob
+import os
 import sys
+import threading
+import time
+import zlib
+from decimal import Decimal, InvalidOperation
+
+import instrumentation
+
+CENT = Decimal("0.01")
+MAX_AMOUNT_DIGITS = 15      # Digits before the decimal point allowed in one amount, well inside Decimal's precision
 
-# Define global variables for account name, balance, and pin. Note that we are
-# using global variables here for simplicity, but this is generally not a good
-# practice.
+LEDGER_LOG = "atm_ledger.log"
+SNAPSHOT_SUFFIX = ".snapshot"
+COMMIT_DELAY = 0.002        # Seconds the log waits for more transactions to share an fsync()
+GROUP_COMMIT_MAX = 1024     # Most records committed by one fsync()
+SNAPSHOT_EVERY = 1_000_000  # Log records between balance snapshots
 
+MAX_PIN_ATTEMPTS = 3        # Wrong PINs before the server locks an account or drops a connection
+PIN_LOCKOUT = 30.0          # Seconds an account refuses logins after too many wrong PINs
+PIN_DELAY = 0.5             # Seconds before answering a wrong PIN, doubled for each further one in a row
+MAX_LINE = 1024             # Longest request line the server accepts
+WRITE_HIGH_WATER = 64 * 1024  # Bytes of replies buffered for a client before the server waits for it
+IDLE_TIMEOUT = 300.0        # Seconds a connection may stay silent before it is closed
+SERVER_BACKLOG = 4096       # Connections the kernel queues before the server accepts them
+
+# The account used by the interactive ATM. More accounts can be opened in the ledger, each with its own number.
+DEFAULT_ACCOUNT = 1
 account_name = "Alan Turing"
-balance = 0.0
 pin = "1337"
 
-def make_deposit(amount: float) -> None:
-    """Function to handle deposit transactions."""
-    global balance  # Declare global variable 'balance' to modify it
-    balance += amount  # Update balance
-    print(f"\nBalance for {account_name}: ${balance}\n")  # Display updated balance
-
-def make_withdrawal(amount: float) -> None:
-    """Function to handle withdrawal transactions."""
-    global balance  # Declare global variable 'balance' to modify it
-    if amount > balance:
-        print("Insufficient funds.")  # Check for sufficient balance
-    else:
-        balance -= amount  # Update balance
-        print(f"\nBalance for {account_name}: ${balance}\n")  # Display updated balance
+class InsufficientFundsError(Exception):
+    """Raised when a withdrawal is larger than the account balance."""
+
+class LogClosedError(Exception):
+    """Raised when a transaction is logged after the transaction log has been closed."""
+
+class Account:
+    """A single bank account. Its balance must only be read or changed while holding its lock."""
+
+    def __init__(self, number: int, name: str, pin: str, balance: Decimal = Decimal("0.00")):
+        self.number = number
+        self.name = name
+        self.pin = pin
+        self.balance = balance
+        self.lock = threading.Lock()
+
+class TransactionLog:
+    """
+    Write-ahead log of ledger changes, made durable with group commit.
+
+    Each change is appended as one line of tab-separated fields, prefixed with a CRC-32 so that a record torn by a
+    crash is recognised. A background thread writes the waiting records and fsync()s them, first giving other
+    sessions up to `max_delay` seconds to add theirs, so that one fsync() commits a whole group of up to `max_group`
+    transactions.
+    commit() blocks until a record is on disk, unless the log is asynchronous (synchronous=False), in which case
+    a crash can lose the last `max_delay` seconds of transactions.
+
+    The log is split into segments named '<path>.<sequence number of their first record>', each starting with a
+    'segment' record. Starting a new segment lets the segments before a snapshot be deleted.
+    """
+
+    def __init__(self, path, next_seq=0, max_delay=COMMIT_DELAY, synchronous=True, max_group=GROUP_COMMIT_MAX):
+        self.path = path
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self.max_group = max_group
+        self.fsyncs = 0              # Groups committed, for reporting
+        self._next_seq = next_seq    # Sequence number of the next record appended
+        self._durable = next_seq - 1  # Highest sequence number known to be on disk
+        self._pending = [None]       # Records waiting to be written; None starts a new segment
+        self._oldest = time.monotonic()
+        self._next_seq += 1
+        self._closing = False
+        self._file = None
+        self._lock = threading.Lock()
+        self._has_pending = threading.Condition(self._lock)
+        self._committed = threading.Condition(self._lock)
+        self._writer = threading.Thread(target=self._run, name="transaction-log", daemon=True)
+        self._writer.start()
+
+    @property
+    def records(self) -> int:
+        """Sequence number the next record will be given."""
+        return self._next_seq
+
+    def append(self, *fields) -> int:
+        """Queue a record for writing and return its sequence number. Call commit() to wait until it is durable."""
+        payload = "\t".join(map(str, fields)).encode()
+        line = b"%08x\t%s\n" % (zlib.crc32(payload), payload)
+        with self._lock:
+            if self._closing:
+                raise LogClosedError("The transaction log is closed.")
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending.append(line)
+            if len(self._pending) == 1:
+                self._oldest = time.monotonic()
+                self._has_pending.notify()
+            elif len(self._pending) == self.max_group:
+                self._has_pending.notify()  # The group is full, so there is no point waiting out the delay
+            return seq
+
+    def rotate(self) -> int:
+        """Start a new segment and return the sequence number of its first record."""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending.append(None)
+            if len(self._pending) == 1:
+                self._oldest = time.monotonic()
+                self._has_pending.notify()
+            return seq
+
+    def commit(self, seq: int) -> None:
+        """Wait until the record with sequence number `seq` is on disk (returns at once if the log is asynchronous)."""
+        if self.synchronous:
+            self._wait(seq)
+
+    def sync(self) -> None:
+        """Wait until every record appended so far is on disk."""
+        self._wait(self._next_seq - 1)
+
+    def remove_segments_before(self, seq: int) -> None:
+        """Delete the segments that end before sequence number `seq`, which a snapshot has made redundant."""
+        for start, filename in log_segments(self.path):
+            if start < seq:
+                os.remove(filename)
+
+    def close(self) -> None:
+        """Write everything still waiting, then stop the writer thread and close the current segment."""
+        with self._lock:
+            self._closing = True
+            self._has_pending.notify()
+        self._writer.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _wait(self, seq):
+        with self._lock:
+            while self._durable < seq:
+                if not self._writer.is_alive():
+                    raise LogClosedError("The transaction log stopped before the record was written.")
+                self._committed.wait()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._has_pending.wait()
+                if not self._pending:
+                    self._committed.notify_all()
+                    return
+                # Give other sessions a chance to join this group before paying for the fsync()
+                while not self._closing and len(self._pending) < self.max_group:
+                    remaining = self._oldest + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._has_pending.wait(remaining)
+                batch = self._pending[:self.max_group]
+                del self._pending[:self.max_group]
+                if self._pending:
+                    self._oldest = time.monotonic()  # The rest start the next group
+                first = self._durable + 1
+            self._write(batch, first)
+            with self._lock:
+                self._durable = first + len(batch) - 1
+                self.fsyncs += 1
+                self._committed.notify_all()
+
+    def _write(self, batch, seq):
+        """Write a group of records, starting new segments where asked, and fsync() them."""
+        lines = []
+        for line in batch:
+            if line is None:
+                if self._file is not None:
+                    self._file.write(b"".join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._file.close()
+                self._file = open(f"{self.path}.{seq:012d}", 'wb')
+                sync_directory(self.path)  # Make the new segment's directory entry durable as well
+                lines = [b"%08x\tsegment\n" % zlib.crc32(b"segment")]
+            else:
+                lines.append(line)
+            seq += 1
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+class Ledger:
+    """
+    Thread-safe store of accounts.
+
+    Every deposit or withdrawal takes the lock of the account it touches, so the read-modify-write of the balance
+    cannot interleave with another session's, and sessions on different accounts never wait for each other. The
+    ledger's own lock is only taken to open an account.
+
+    With a TransactionLog, each change is logged together with the balance it leaves while the account's lock is
+    held, so the log holds each account's changes in the order they were made. The lock is released before waiting
+    for the commit, which lets the next transaction on the account join the same group.
+    """
+
+    def __init__(self, log=None, snapshot_every=SNAPSHOT_EVERY):
+        self._accounts = {}
+        self._lock = threading.Lock()
+        self.log = log
+        self.snapshot_every = snapshot_every
+        self.replayed = 0  # Log records applied by recover()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_at = (log.records if log is not None else 0) + snapshot_every
+
+    @classmethod
+    def recover(cls, path: str, snapshot_every=SNAPSHOT_EVERY, **log_options) -> "Ledger":
+        """
+        Rebuild a ledger from the latest snapshot and the log records written after it, then reopen the log.
+
+        Each record carries the balance it left, so only the last balance of each account is kept while replaying.
+        A torn record at the end of the log was never confirmed, so it and anything after it is cut off.
+        """
+        ledger = cls(snapshot_every=snapshot_every)
+        after = ledger._load_snapshot(path + SNAPSHOT_SUFFIX)
+        latest = {}
+        seq = after + 1
+        segments = log_segments(path)
+        for i, (start, filename) in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1][0] <= after:
+                continue  # Left behind by a crash before it could be deleted; the snapshot covers all of it
+            seq = start
+            intact = 0  # Bytes of the segment holding whole records
+            with open(filename, 'rb') as file:
+                for line in file:
+                    checksum, _, payload = line.rstrip(b"\n").partition(b"\t")
+                    try:
+                        if not line.endswith(b"\n") or int(checksum, 16) != zlib.crc32(payload):
+                            break
+                    except ValueError:
+                        break
+                    if seq > after:
+                        ledger._replay(payload, latest)
+                        ledger.replayed += 1
+                    intact += len(line)
+                    seq += 1
+            if intact < os.path.getsize(filename):
+                with open(filename, 'r+b') as file:
+                    file.truncate(intact)  # Keep later records from being appended after the torn one
+                break
+
+        for number, balance in latest.items():
+            ledger._accounts[number].balance = Decimal(balance.decode())
+        ledger.log = TransactionLog(path, max(seq, after + 1), **log_options)
+        ledger._snapshot_at = ledger.log.records + snapshot_every
+        return ledger
+
+    def open_account(self, number: int, name: str, pin: str, balance=Decimal("0.00")) -> Account:
+        """Create an account with the given number. Raises ValueError if the number is taken."""
+        with self._lock:
+            if number in self._accounts:
+                raise ValueError(f"Account {number} already exists.")
+            account = Account(number, name, pin, to_amount(balance, allow_zero=True))
+            self._accounts[number] = account
+            if self.log is not None:
+                seq = self.log.append('open', number, account.balance, pin, name)
+        if self.log is not None:
+            self._commit(seq)
+        return account
+
+    def __contains__(self, number: int) -> bool:
+        return number in self._accounts
+
+    def account(self, number: int) -> Account:
+        """Return an account by number. Raises KeyError if there is no such account."""
+        return self._accounts[number]
+
+    def accounts(self) -> list:
+        """Return all accounts."""
+        return list(self._accounts.values())
+
+    @instrumentation.timed(name="atm.login")  # The PIN check of a login, not the typing
+    def authenticate(self, number: int, entry: str) -> bool:
+        """Return True if the PIN matches the account's."""
+        account = self._accounts.get(number)
+        return account is not None and entry == account.pin
+
+    def deposit(self, number: int, amount) -> Decimal:
+        """Add a positive amount to an account and return the new balance."""
+        amount = to_amount(amount)
+        account = self._accounts[number]
+        with account.lock:
+            account.balance += amount
+            balance = account.balance
+            if self.log is not None:
+                seq = self.log.append('deposit', number, amount, balance)
+        if self.log is not None:
+            self._commit(seq)
+        return balance
+
+    def withdraw(self, number: int, amount) -> Decimal:
+        """Take a positive amount from an account and return the new balance. Raises InsufficientFundsError."""
+        amount = to_amount(amount)
+        account = self._accounts[number]
+        with account.lock:
+            if amount > account.balance:
+                raise InsufficientFundsError(f"Insufficient funds in account {number}.")
+            account.balance -= amount
+            balance = account.balance
+            if self.log is not None:
+                seq = self.log.append('withdraw', number, amount, balance)
+        if self.log is not None:
+            self._commit(seq)
+        return balance
+
+    def balance(self, number: int) -> Decimal:
+        """Return the current balance of an account."""
+        account = self._accounts[number]
+        with account.lock:
+            return account.balance
+
+    def snapshot(self) -> None:
+        """Write every balance to the snapshot file and delete the log segments it replaces."""
+        with self._snapshot_lock:
+            self._write_snapshot()
+
+    def close(self) -> None:
+        """Commit any outstanding transactions and close the log."""
+        if self.log is not None:
+            self.log.close()
+
+    def _commit(self, seq):
+        self.log.commit(seq)
+        if self.snapshot_every and seq >= self._snapshot_at and self._snapshot_lock.acquire(blocking=False):
+            try:
+                if seq >= self._snapshot_at:
+                    self._write_snapshot()
+            finally:
+                self._snapshot_lock.release()
 
-def show_balance() -> None:
+    def _write_snapshot(self):
+        """
+        Snapshot the balances as of a new log segment.
+
+        Every record before the new segment was applied before it was logged, so the balances read afterwards
+        include it. They may also include later records, which is harmless because replaying a record sets the
+        balance it left. The snapshot only replaces the old segments once the records it reflects are durable.
+        """
+        start = self.log.rotate()
+        self._snapshot_at = start + self.snapshot_every
+        with self._lock:
+            accounts = list(self._accounts.values())
+        rows = []
+        for account in accounts:
+            with account.lock:
+                rows.append(f"{account.number}\t{account.balance}\t{account.pin}\t{account.name}\n")
+        self.log.sync()
+
+        path = self.log.path + SNAPSHOT_SUFFIX
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            file.write(f"{start}\n")
+            file.writelines(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)  # Swap the new snapshot in so a crash never leaves a half-written file
+        sync_directory(path)
+        self.log.remove_segments_before(start)
+
+    def _load_snapshot(self, path):
+        """Load the accounts in a snapshot file. Returns the sequence number it was taken at, or -1 if none."""
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                after = int(file.readline())
+                for row in file:
+                    number, balance, pin, name = row.rstrip("\n").split("\t", 3)
+                    self._accounts[int(number)] = Account(int(number), name, pin, Decimal(balance))
+        except FileNotFoundError:
+            return -1
+        return after
+
+    def _replay(self, payload, latest):
+        """Apply one log record during recovery, noting the latest balance of the account it changed."""
+        op, _, fields = payload.partition(b"\t")
+        if op == b'deposit' or op == b'withdraw':
+            number, _, balance = fields.split(b"\t")
+            latest[int(number)] = balance
+        elif op == b'open':
+            number, balance, pin, name = fields.split(b"\t", 3)
+            number = int(number)
+            self._accounts[number] = Account(number, name.decode(), pin.decode(), Decimal(balance.decode()))
+            latest.pop(number, None)
+
+def to_amount(value, allow_zero: bool = False) -> Decimal:
+    """Convert a number or string to a Decimal amount of whole cents. Raises ValueError if it is not valid."""
+    try:
+        amount = Decimal(str(value)) if not isinstance(value, Decimal) else value
+    except InvalidOperation:
+        raise ValueError(f"{value!r} is not a valid amount.") from None
+    if not amount.is_finite() or amount.adjusted() >= MAX_AMOUNT_DIGITS:
+        raise ValueError(f"{value!r} is not a valid amount.")
+    try:
+        cents = amount.quantize(CENT)  # Decimal raises InvalidOperation, not ValueError, past its precision
+    except InvalidOperation:
+        raise ValueError(f"{value!r} is not a valid amount.") from None
+    if cents != amount:
+        raise ValueError(f"{value!r} is not a whole number of cents.")
+    if amount < 0 or (amount == 0 and not allow_zero):
+        raise ValueError("Amounts must be greater than zero.")
+    return cents
+
+def log_segments(path: str) -> list:
+    """Return the (first sequence number, file name) of each segment of a transaction log, oldest first."""
+    segments = []
+    for filename in glob.glob(glob.escape(path) + ".*"):
+        suffix = filename[len(path) + 1:]
+        if suffix.isdigit():
+            segments.append((int(suffix), filename))
+    return sorted(segments)
+
+def sync_directory(path: str) -> None:
+    """fsync() the directory holding `path`, so that files created or renamed in it survive a crash."""
+    folder = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(folder)
+    finally:
+        os.close(folder)
+
+ledger = Ledger()
+ledger.open_account(DEFAULT_ACCOUNT, account_name, pin)
+
+@instrumentation.timed(name="atm.make_deposit")
+def make_deposit(amount, account: int = DEFAULT_ACCOUNT, out=print) -> Decimal:
+    """Function to handle deposit transactions. Messages go to `out`, which prints them by default."""
+    balance = ledger.deposit(account, amount)  # Update balance under the account's lock
+    out(f"\nBalance for {ledger.account(account).name}: ${balance}\n")  # Display updated balance
+    return balance
+
+@instrumentation.timed(name="atm.make_withdrawal")
+def make_withdrawal(amount, account: int = DEFAULT_ACCOUNT, out=print):
+    """Function to handle withdrawal transactions. Returns the new balance, or None if the funds are insufficient."""
+    try:
+        balance = ledger.withdraw(account, amount)  # Check for sufficient balance and update it in one step
+    except InsufficientFundsError:
+        out("Insufficient funds.")
+        return None
+    out(f"\nBalance for {ledger.account(account).name}: ${balance}\n")  # Display updated balance
+    return balance
+
+def show_balance(account: int = DEFAULT_ACCOUNT, out=print) -> Decimal:
     """Function to display the current balance."""
-    print(f"\nBalance for {account_name}: ${balance}\n")
+    balance = ledger.balance(account)
+    out(f"\nBalance for {ledger.account(account).name}: ${balance}\n")
+    return balance
 
-def login() -> bool:
+def login(account: int = DEFAULT_ACCOUNT) -> bool:
     """Function to handle user login. Returns True if login is successful, False otherwise."""
     entry = get_pin()  # Get user-entered PIN
-    if entry.strip() == pin:
-        print(f"\nWelcome, {account_name}!\n")  # Check if PIN matches and welcome user
+    if ledger.authenticate(account, entry.strip()):
+        print(f"\nWelcome, {ledger.account(account).name}!\n")  # Check if PIN matches and welcome user
         return True
     else:
         return False  # Return False if PIN does not match
@@ -71,8 +516,229 @@ def show_menu() -> int:
         else:
             print("Please enter 1, 2, 3, or 4.")  # Prompt for valid choice
 
+class PinThrottle:
+    """
+    Counts wrong PINs per account, across every connection to the server.
+
+    Each wrong PIN is answered only after a delay that doubles with every failure in a row, and after `max_attempts`
+    failures the account refuses logins for `lockout` seconds. A correct PIN resets the count. The server runs on one
+    event loop, so no lock is needed.
+    """
+
+    def __init__(self, max_attempts=MAX_PIN_ATTEMPTS, lockout=PIN_LOCKOUT, delay=PIN_DELAY):
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+        self.delay = delay
+        self._failures = {}
+        self._locked_until = {}
+
+    def locked(self, number: int) -> float:
+        """Return the seconds left before the account accepts logins again, or 0 if it is not locked."""
+        remaining = self._locked_until.get(number, 0) - time.monotonic()
+        if remaining <= 0:
+            self._locked_until.pop(number, None)
+            return 0
+        return remaining
+
+    def failed(self, number: int) -> float:
+        """Record a wrong PIN for the account and return how many seconds to wait before answering."""
+        failures = self._failures.get(number, 0) + 1
+        if failures >= self.max_attempts:
+            self._locked_until[number] = time.monotonic() + self.lockout
+            self._failures.pop(number, None)  # Absent when the lockout comes on the first failure
+        else:
+            self._failures[number] = failures
+        return self.delay * 2 ** (failures - 1)
+
+    def succeeded(self, number: int) -> None:
+        """Forget the wrong PINs entered for the account."""
+        self._failures.pop(number, None)
+
+class ATMSession:
+    """
+    One client connection to the ATM server and the account it is logged in to.
+
+    Requests are read a line at a time and each is answered before the next is read, with the reply drained to the
+    socket first. A client that stops reading its replies therefore stops being served, instead of making the server
+    buffer replies for it without limit.
+    """
+
+    def __init__(self, reader, writer, throttle: PinThrottle):
+        self.reader = reader
+        self.writer = writer
+        self.throttle = throttle
+        self.account = None  # Account number once logged in
+        self.failures = 0    # Wrong PINs entered on this connection
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        self._loop = asyncio.get_running_loop()
+        self._last_request = self._loop.time()
+        # One timer per connection, rather than a timeout on every read, which would cost a task per request
+        self._idle_timer = self._loop.call_later(IDLE_TIMEOUT, self._check_idle)
+
+    async def run(self) -> None:
+        """Serve requests until the client quits, disconnects or goes idle."""
+        try:
+            await self.reply("OK", "Welcome to the Python ATM!")
+            while True:
+                try:
+                    line = await self.reader.readline()
+                except ValueError:  # The line was longer than the reader's limit
+                    await self.reply("ERR", "Request too long.")
+                    break
+                if not line:
+                    break
+                self._last_request = self._loop.time()
+                if not await self.handle(line.decode(errors='replace').split()):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._idle_timer.cancel()
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _check_idle(self):
+        """Close the connection if no request has arrived for IDLE_TIMEOUT seconds, or check again later."""
+        idle = self._loop.time() - self._last_request
+        if idle < IDLE_TIMEOUT:
+            self._idle_timer = self._loop.call_later(IDLE_TIMEOUT - idle, self._check_idle)
+        else:
+            self.writer.write(b"ERR Idle for too long.\n")
+            self.writer.close()  # The pending readline() then sees the end of the stream
+
+    async def reply(self, status: str, message: str) -> None:
+        """Send one reply line and wait until the transport is below its high-water mark."""
+        self.writer.write(f"{status} {message}\n".encode())
+        await self.writer.drain()
+
+    async def handle(self, words: list) -> bool:
+        """Carry out one request. Returns False when the connection should be closed."""
+        if not words:
+            return True
+        command, args = words[0].upper(), words[1:]
+        if command == "QUIT":
+            await self.reply("OK", "Thank you for using the Python ATM!")
+            return False
+        if command == "LOGIN":
+            return await self.login(args)
+        if command not in ("BALANCE", "DEPOSIT", "WITHDRAW"):
+            await self.reply("ERR", "Unknown command. Use LOGIN, BALANCE, DEPOSIT, WITHDRAW or QUIT.")
+        elif self.account is None:
+            await self.reply("ERR", "Please log in first.")
+        elif command == "BALANCE":
+            _, message = await self.call(show_balance, self.account)
+            await self.reply("OK", message)
+        elif len(args) != 1:
+            await self.reply("ERR", f"Usage: {command} <amount>")
+        else:
+            try:
+                amount = to_amount(args[0])
+            except ValueError:
+                await self.reply("ERR", "Please enter a valid amount.")
+                return True
+            operation = make_deposit if command == "DEPOSIT" else make_withdrawal
+            balance, message = await self.call(operation, amount, self.account)
+            await self.reply("OK" if balance is not None else "ERR", message)
+        return True
+
+    async def login(self, args: list) -> bool:
+        """Check a 'LOGIN [account] <pin>' request, throttling wrong PINs. Returns False after too many of them."""
+        if len(args) not in (1, 2) or not all(arg.isdigit() for arg in args):
+            await self.reply("ERR", "Usage: LOGIN [account] <pin>")
+            return True
+        number = int(args[0]) if len(args) == 2 else DEFAULT_ACCOUNT
+        if self.throttle.locked(number):
+            await self.reply("ERR", "Too many wrong PINs. Please try again later.")
+            return True
+        if ledger.authenticate(number, args[-1]):
+            self.throttle.succeeded(number)
+            self.account = number
+            await self.reply("OK", f"Welcome, {ledger.account(number).name}!")
+            return True
+        # Unknown accounts are delayed like wrong PINs, but not tracked, so they cannot fill up the throttle
+        delay = self.throttle.failed(number) if number in ledger else self.throttle.delay
+        await asyncio.sleep(delay)
+        self.failures += 1
+        if self.failures >= self.throttle.max_attempts:
+            await self.reply("ERR", "Too many wrong PINs.")
+            return False
+        await self.reply("ERR", "Invalid PIN. Please try again.")
+        return True
+
+    async def call(self, operation, *args) -> tuple:
+        """
+        Run one of the ATM operations and return its result along with the message it would have printed.
+
+        Operations on a logged ledger wait for an fsync(), so they run in a worker thread. That leaves the event loop
+        free to serve other connections, and lets the commits of many connections share a group.
+        """
+        messages = []
+        if ledger.log is None:
+            result = operation(*args, out=messages.append)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(operation, *args, out=messages.append))
+        return result, " ".join(message.strip() for message in messages)
+
+def raise_file_limit() -> None:
+    """Raise this process's limit on open files as far as allowed, so the server can hold many connections."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+async def serve(host: str, port: int) -> None:
+    """Serve the ATM's line protocol over TCP until cancelled."""
+    raise_file_limit()
+    throttle = PinThrottle()
+    server = await asyncio.start_server(lambda reader, writer: ATMSession(reader, writer, throttle).run(),
+                                        host, port, limit=MAX_LINE, backlog=SERVER_BACKLOG)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Serving the Python ATM on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def parse_address(text: str) -> tuple:
+    """Split '[HOST:]PORT' into a host and a port number."""
+    host, _, port = text.rpartition(":")
+    if not port.isdigit():
+        raise argparse.ArgumentTypeError(f"{text!r} is not [HOST:]PORT")
+    return host or "127.0.0.1", int(port)
+
 def main() -> None:
     """Main function to run the ATM program."""
+    global ledger
+
+    parser = argparse.ArgumentParser(description="Python ATM simulator.")
+    parser.add_argument("--log", nargs="?", const=LEDGER_LOG, metavar="PATH",
+                        help=f"keep balances between runs in a transaction log at PATH (default PATH: {LEDGER_LOG}); "
+                             "without --log, balances are kept in memory only")
+    parser.add_argument("--commit-delay", type=float, default=COMMIT_DELAY * 1000,
+                        help="milliseconds to wait for other transactions to share an fsync()")
+    parser.add_argument("--serve", type=parse_address, metavar="[HOST:]PORT",
+                        help="serve many terminals over TCP instead of running interactively")
+    args = parser.parse_args()
+
+    if args.log:
+        ledger = Ledger.recover(args.log, max_delay=args.commit_delay / 1000)
+        if DEFAULT_ACCOUNT not in ledger:
+            ledger.open_account(DEFAULT_ACCOUNT, account_name, pin)
+
+    if args.serve:
+        try:
+            asyncio.run(serve(*args.serve))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ledger.close()
+        return
+
     print("Welcome to the Python ATM!\n")
 
     # Login loop
@@ -89,20 +755,22 @@ def main() -> None:
             show_balance()  # Display balance
         elif choice == 2:
             try:
-                amount = float(input("How much would you like to deposit? "))  # Get deposit amount
+                amount = to_amount(input("How much would you like to deposit? "))  # Get deposit amount
                 make_deposit(amount)  # Handle deposit
             except ValueError:
-                print("Please enter a valid number.")
+                print("Please enter a valid amount.")
         elif choice == 3:
             try:
-                amount = float(input("How much would you like to withdraw? "))  # Get withdrawal amount
+                amount = to_amount(input("How much would you like to withdraw? "))  # Get withdrawal amount
                 make_withdrawal(amount)  # Handle withdrawal
             except ValueError:
-                print("Please enter a valid number.")
+                print("Please enter a valid amount.")
         else:
             print("Thank you for using the Python ATM!")  # Exit message
             break  # Break loop to exit
 
+    ledger.close()
+
 # Run the main function if the script is executed directly
 if __name__ == "__main__":
     sys.exit(main())
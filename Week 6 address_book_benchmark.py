@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Address Book Benchmarks
+
+This script measures how the address books scale with the number of contacts. It loads
+'Week 6 extending_address_book.py' (and, for the throughput benchmark, 'Week 5 address_book.py') as modules, fills them
+with synthetic contacts and times the operations against files in a temporary directory, so the real
+'address_book.csv' is never touched. Run it before and after a change to compare.
+
+Benchmarks:
+- persistence: The cost of making one change durable. This compares rewriting the whole CSV (what happens on EXIT
+  without --journal) against appending a journal record, both with the default batched fsync and with an fsync
+  after every record.
+- memory: Memory used per contact, measured with tracemalloc, by a plain list of {'name', 'phone', 'email'}
+  dictionaries (the original layout) against the columnar AddressBook, scaled to 1M contacts, and the time taken to
+  build each, since the compact layout costs more to fill than a list.
+- throughput: Operations per second and p50/p99 latency of a mixed stream of add, remove, show, search and list
+  operations, run through the Week 6 batch mode against both the Week 5 and the Week 6 address book.
+
+Usage:
+    python "Week 6 address_book_benchmark.py" [persistence] [memory] [throughput] [--sizes 10000 100000 1000000]
+        [--ops 2000]
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SCRIPT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+ADDRESS_BOOK_SCRIPT = os.path.join(SCRIPT_FOLDER, "Week 6 extending_address_book.py")
+WEEK_5_SCRIPT = os.path.join(SCRIPT_FOLDER, "Week 5 address_book.py")
+BENCHMARKS = ["persistence", "memory", "throughput"]
+
+def load_address_book(path: str = ADDRESS_BOOK_SCRIPT, name: str = "extending_address_book"):
+    """Import an address book script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_entry(i: int) -> dict:
+    """Return a valid, unique contact for index i."""
+    return {'name': f"Person {i}", 'phone': f"02{i % 10**8:08d}", 'email': f"person{i}@example.com"}
+
+def fill(book, size: int) -> None:
+    """Replace the contents of the module's address book with `size` synthetic contacts."""
+    book.address_book.clear()
+    book.address_book.extend(synthetic_entry(i) for i in range(size))
+
+def bench_rewrite(book, filename: str, repeats: int) -> float:
+    """Return the seconds taken by one full CSV rewrite."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        book.save_to_csv(filename)
+    return (time.perf_counter() - start) / repeats
+
+def bench_journal(book, filename: str, size: int, ops: int, sync_every: int) -> float:
+    """Return the seconds taken to journal one add, averaged over `ops` adds."""
+    book.save_to_csv(filename)
+    book.journal = book.Journal(filename, sync_every=sync_every)
+    book.journal.open()
+    # Keep the run below the compaction threshold so only the append path is measured
+    ops = min(ops, max(book.JOURNAL_COMPACT_MIN, size) - 1)
+    entries = [synthetic_entry(size + i) for i in range(ops)]
+
+    start = time.perf_counter()
+    for entry in entries:
+        entry_id = book.address_book.append(entry)
+        book.journal.log('add', entry_id, entry['name'], entry['phone'], entry['email'])
+    book.journal.sync()
+    elapsed = (time.perf_counter() - start) / ops
+
+    book.journal.close()
+    book.journal = None
+    return elapsed
+
+def bench_persistence(book, sizes, ops: int) -> None:
+    """Compare the per-change cost of a full CSV rewrite with journal appends."""
+    print("Persistence: cost to make one change durable")
+    print(f"{'entries':>10} {'full rewrite':>14} {'journal':>12} {'journal+fsync':>14} {'speed-up':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "address_book.csv")
+        for size in sizes:
+            fill(book, size)
+            rewrite = bench_rewrite(book, filename, repeats=3 if size <= 100_000 else 1)
+            batched = bench_journal(book, filename, size, ops, book.JOURNAL_SYNC_EVERY)
+            fill(book, size)
+            synced = bench_journal(book, filename, size, min(ops, 200), 1)
+            print(f"{size:>10,} {rewrite * 1e3:>11.2f} ms {batched * 1e6:>9.1f} us {synced * 1e6:>11.1f} us "
+                  f"{rewrite / batched:>9,.0f}x")
+    print()
+
+def measure_memory(build) -> int:
+    """Return the bytes still allocated by the object build() returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def measure_time(build) -> float:
+    """Return the seconds build() takes, outside tracemalloc so the timing is not inflated."""
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    del result
+    return elapsed
+
+def bench_memory(book, size: int) -> None:
+    """Compare the memory used and build time of the dictionary-per-contact layout and the columnar AddressBook."""
+    def build_dicts():
+        return [synthetic_entry(i) for i in range(size)]
+
+    def build_columnar():
+        address_book = book.AddressBook()
+        address_book.extend(synthetic_entry(i) for i in range(size))
+        return address_book
+
+    print(f"Memory: {size:,} contacts, measured with tracemalloc")
+    print(f"{'layout':>20} {'bytes/contact':>14} {'per 1M contacts':>16} {'build time':>12}")
+    results = [("list of dicts", measure_memory(build_dicts), measure_time(build_dicts)),
+               ("AddressBook", measure_memory(build_columnar), measure_time(build_columnar))]
+    for layout, used, elapsed in results:
+        print(f"{layout:>20} {used / size:>14.1f} {used / size * 1e6 / 2**20:>13.1f} MB {elapsed:>10.2f} s")
+    print(f"{'saving':>20} {results[0][1] / results[1][1]:>13.1f}x")
+    print()
+
+def synthetic_batch(size: int, ops: int, with_search: bool, seed: int = 0) -> list:
+    """
+    Return a mixed stream of batch operation lines for a book that starts with `size` synthetic contacts.
+
+    The mix is 40% show, 25% add, 20% remove and 15% search (or more shows where search is unavailable). One list
+    operation is included for books of up to 10,000 entries, where printing every name is still a sensible request.
+    """
+    rng = random.Random(seed)
+    lines = []
+    count, next_index = size, size
+    for _ in range(ops):
+        roll = rng.random()
+        if roll < 0.25 or count == 0:
+            entry = synthetic_entry(next_index)
+            next_index += 1
+            count += 1
+            lines.append(f"add,{entry['name']},{entry['phone']},{entry['email']}")
+        elif roll < 0.45:
+            lines.append(f"remove,{rng.randint(1, count)}")
+            count -= 1
+        elif roll < 0.6 and with_search:
+            lines.append(f"search,Person {rng.randrange(next_index)}")
+        else:
+            lines.append(f"show,{rng.randint(1, count)}")
+    if size <= 10_000:
+        lines.append("list")
+    return lines
+
+def bench_throughput(book, sizes, ops: int) -> None:
+    """Run the same operation streams through the Week 5 and Week 6 address books and report their latency."""
+    week_5 = load_address_book(WEEK_5_SCRIPT, "address_book")
+    print(f"Throughput: {ops:,} mixed operations per run")
+    for size in sizes:
+        for label, module in (("Week 5", week_5), ("Week 6", book)):
+            module.address_book.clear()
+            module.address_book.extend(synthetic_entry(i) for i in range(size))
+            handlers = book.batch_handlers(module)
+            lines = synthetic_batch(size, ops, with_search='search' in handlers)
+            print(f"{label}, {size:,} entries:")
+            book.print_batch_report(book.run_batch(lines, handlers, quiet=True))
+            print()
+        week_5.address_book.clear()  # Free the larger books before the next size is built
+
+def main() -> None:
+    """Run the selected address book benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the Week 6 address book.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: persistence, memory or throughput (default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="address book sizes to benchmark")
+    parser.add_argument("--ops", type=int, default=2000, help="operations to time per measurement")
+    parser.add_argument("--memory-size", type=int, default=1_000_000, help="contacts used by the memory benchmark")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    book = load_address_book()
+    if "persistence" in args.benchmarks:
+        bench_persistence(book, args.sizes, args.ops)
+    if "memory" in args.benchmarks:
+        bench_memory(book, args.memory_size)
+    if "throughput" in args.benchmarks:
+        bench_throughput(book, args.sizes, args.ops)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,12 +12,52 @@ entries are correctly formatted.
 Enhancements over the previous version:
 - Data Persistence: Entries are saved to 'address_book.csv', allowing them to persist between program runs.
 - Input Validation: Email addresses and phone numbers are validated using regular expressions.
+- Indexed Lookup: Entries are kept in an AddressBook that indexes email and phone (hash lookup) and name (prefix
+  search), so searching stays fast and duplicate emails or phones are rejected.
+- Compact Storage: The AddressBook stores each field as one UTF-8 string table with integer offsets rather than a
+  dictionary per contact, which takes a fraction of the memory for large books.
+- Journal Mode: With --journal, every change is appended to 'address_book.csv.journal' as it happens, so a crash
+  loses at most the last few changes. The journal is replayed on load and folded back into the CSV once it grows.
+- Lazy Loading: With --lazy, the CSV is memory-mapped instead of read up front. A row-offset index is built once and
+  kept in 'address_book.csv.idx', so listing streams names from disk and showing an entry parses only that row.
+- Bulk Import: Entries can be imported from another CSV file. Rows are validated in chunks across worker processes
+  with the same rules as interactive entry, and rejected rows are written to a report with the reason.
+- SQLite Storage: With --sqlite, entries live in an indexed SQLite database instead of memory, and listing pages
+  through them. The CSV file becomes a migration format: it is imported into an empty database, and --export writes
+  the database back out to CSV.
+- Stable IDs: Every entry has an ID, shown as '#ID' when listing, that stays the same when other entries are removed.
+  Entries can be shown or removed by ID as well as by number, and removal leaves a tombstone instead of shifting.
+  IDs are saved in an 'id' column of the CSV and in journal records, so they also stay the same between runs.
+- Duplicate Detection: Likely duplicates are grouped into clusters by matching normalised phone numbers and emails
+  exactly, and similar names by MinHash signatures of their character n-grams, without comparing every pair.
+- Batch Mode: With --batch, operations are read one per line from a file (or '-' for standard input) and run through
+  the same functions as the menu, followed by a report of operations per second and latency for each operation.
+  The address book is then saved as it is on EXIT.
+- Instrumentation: With INSTRUMENT=1 in the environment, every add, load and save (with the bytes read or written)
+  is timed into a latency histogram and summarised on exit, however the program was run (see instrumentation.py).
 """
 
+import argparse
+import bisect
+import concurrent.futures
+import contextlib
 import csv
+import functools
+import hashlib
+import io
+import itertools
+import locale
+import math
+import mmap
 import os
+import random
 import re
+import sqlite3
 import sys
+import time
+from array import array
+
+import instrumentation
 
 # Constants for menu options
 ADD_ENTRY = 1
@@ -25,9 +65,800 @@ REMOVE_ENTRY = 2
 LIST_ENTRIES = 3
 SHOW_ENTRY = 4
 CLEAR_ENTRIES = 5
-EXIT = 6
+SEARCH_ENTRIES = 6
+IMPORT_ENTRIES = 7
+FIND_DUPLICATES = 8
+EXIT = 9
+
+ADDRESS_BOOK_FILE = "address_book.csv"
+FIELDNAMES = ['name', 'phone', 'email']
+ID_FIELD = 'id'              # Extra CSV column holding each entry's stable ID
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_SYNC_EVERY = 64      # Records written between fsync() calls
+JOURNAL_COMPACT_MIN = 1000   # Never compact a journal shorter than this
+INDEX_SUFFIX = ".idx"
+IMPORT_CHUNK_SIZE = 20000    # Rows validated per worker task
+REJECTED_SUFFIX = ".rejected.csv"
+LIST_PAGE_SIZE = 20          # Entries shown per page by list_entries()
+SQLITE_BATCH_SIZE = 1000     # Changes grouped into one SQLite transaction
+NAME_BUFFER_MIN = 256        # Added entries a name search scans directly before re-sorting the name index
+DUPLICATES_FILE = "address_book.duplicates.csv"
+NGRAM = 3                    # Characters per n-gram when comparing names, phones and emails
+MINHASH_BANDS = 4            # LSH bands; names agreeing on every value in any one band become candidates
+MINHASH_ROWS = 3             # MinHash values per band
+NAME_SIMILARITY = 0.8        # Jaccard similarity of n-grams needed to call two names alike
+TYPO_SIMILARITY = 0.6        # ...and two phone numbers or emails, which are short enough that one typo costs a lot
+CLUSTER_VERIFY_MIN = 10      # Clusters this large are re-checked so members only linked through a chain are split off
+
+# Patterns are compiled once here rather than on every validation call
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+PHONE_PATTERN = re.compile(r"^(?:0[2-8])(\d{8})$")
+NON_DIGITS = re.compile(r"\D")
+EMAIL_WORD_SEPARATORS = re.compile(r"[._-]")
+NON_NAME_CHARACTERS = re.compile(r"[^\w\s]")
+
+class StringTable:
+    """
+    Compact storage for one field of the address book.
+
+    Every value is appended as UTF-8 to a single bytearray, and an array of integer offsets records where each value
+    starts. A stored value is identified by its position in the table, so the whole column costs one offset plus the
+    encoded bytes per value instead of a separate str object for every contact.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])  # Value i spans _offsets[i]:_offsets[i + 1]
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def append(self, value):
+        """Store a value and return its position in the table."""
+        self._data += value.encode('utf-8')
+        self._offsets.append(len(self._data))
+        return len(self._offsets) - 2
+
+    def extend(self, values):
+        """Store a sequence of values, encoding them together rather than growing the table once per value."""
+        encoded = [value.encode('utf-8') for value in values]
+        self._offsets.extend(itertools.accumulate(map(len, encoded), initial=len(self._data)))
+        self._offsets.pop(-len(encoded) - 1)  # accumulate() repeats the end offset the table already holds
+        self._data += b"".join(encoded)
+
+class HashIndex:
+    """
+    Open-addressing hash table from the values of a StringTable to their positions.
+
+    The table is a flat array of positions probed linearly, so an index over a million contacts is a few megabytes of
+    integers rather than a dict of a million string keys. Keys are compared by reading them back from the column.
+
+    Every position is indexed, even when its value repeats an earlier one (a CSV written before duplicates were
+    rejected can hold the same email twice), so removing one copy leaves the others findable.
+    """
+
+    EMPTY = -1
+    DELETED = -2
+
+    def __init__(self, column):
+        self._column = column
+        self._table = array('q', [self.EMPTY]) * 8
+        self._filled = 0  # Cells that are not EMPTY, including DELETED markers
+        self._live = 0
+
+    def find(self, key):
+        """Return a position holding key, or None."""
+        table, column = self._table, self._column
+        mask = len(table) - 1
+        cell = hash(key) & mask
+        while True:
+            position = table[cell]
+            if position == self.EMPTY:
+                return None
+            if position >= 0 and column[position] == key:
+                return position
+            cell = (cell + 1) & mask
+
+    def add(self, position):
+        """Index the value at position."""
+        if (self._filled + 1) * 3 > len(self._table) * 2:
+            self._resize()
+        table = self._table
+        mask = len(table) - 1
+        cell = hash(self._column[position]) & mask
+        while table[cell] >= 0:  # Take the first EMPTY or DELETED cell on the probe path
+            cell = (cell + 1) & mask
+        if table[cell] == self.EMPTY:
+            self._filled += 1
+        table[cell] = position
+        self._live += 1
+
+    def extend(self, hashes, start):
+        """
+        Index positions start, start + 1, ... given the hashes of their values.
+
+        The table is resized at most once for all of them, and taking the hashes rather than reading each value back
+        out of the column means a bulk load never decodes a string to index it.
+        """
+        if (self._filled + len(hashes)) * 3 > len(self._table) * 2:
+            self._resize(len(hashes))
+        table, empty = self._table, self.EMPTY
+        mask = len(table) - 1
+        filled = 0
+        for position, key_hash in enumerate(hashes, start):
+            cell = key_hash & mask
+            while table[cell] >= 0:
+                cell = (cell + 1) & mask
+            if table[cell] == empty:
+                filled += 1
+            table[cell] = position
+        self._filled += filled
+        self._live += len(hashes)
+
+    def remove(self, position):
+        """Stop indexing position. Other positions holding the same value stay indexed."""
+        table = self._table
+        mask = len(table) - 1
+        cell = hash(self._column[position]) & mask
+        while table[cell] != self.EMPTY:
+            if table[cell] == position:
+                table[cell] = self.DELETED
+                self._live -= 1
+                return
+            cell = (cell + 1) & mask
+
+    def _resize(self, extra=1):
+        """Rehash into a table sized for the live entries plus `extra` more, dropping DELETED markers."""
+        positions = [position for position in self._table if position >= 0]
+        size = 8
+        while size < (len(positions) + extra) * 2:
+            size *= 2
+        self._table = array('q', [self.EMPTY]) * size
+        self._filled = self._live = 0
+        for position in positions:
+            self.add(position)
+
+class StorageBackend:
+    """
+    Interface shared by the address book storage backends.
+
+    A backend behaves like a list of {'name', 'phone', 'email'} dictionaries in display order: len(), iteration,
+    indexing, append(), extend(), pop() and clear(). On top of that it offers exact lookup by email or phone, a name
+    prefix search, keyset paging for list_entries() and flush() to make pending changes durable.
+
+    Every entry also has a stable ID, a positive integer that does not change when other entries are removed.
+    IDs increase in display order. The list-like methods take display positions; get_id() and pop_id() take IDs.
+    append() returns the ID it gave the entry. An entry passed to append() or extend() may carry the ID it was saved
+    with under ID_FIELD, which is kept as long as it is higher than every ID already given out.
+    """
+
+    def items(self):
+        """Iterate over (ID, entry) pairs in display order."""
+        after = 0
+        while page := self.page(after, SQLITE_BATCH_SIZE):
+            yield from page
+            after = page[-1][0]
+
+    def page(self, after=0, limit=LIST_PAGE_SIZE):
+        """Return up to `limit` (ID, entry) pairs for the entries following ID `after` (0 for the first page)."""
+        start = 0 if after == 0 else self.position_of(after) + 1
+        stop = min(start + limit, len(self))
+        return [(self.id_at(index), self[index]) for index in range(start, stop)]
+
+    def id_at(self, index):
+        """Return the ID of the entry at a display position. IDs default to the position counted from 1."""
+        if not 0 <= index < len(self):
+            raise IndexError("address book index out of range")
+        return index + 1
+
+    def position_of(self, entry_id):
+        """Return the display position of the entry with an ID, or None if there is no such entry."""
+        return entry_id - 1 if 1 <= entry_id <= len(self) else None
+
+    def get_id(self, entry_id):
+        """Return the entry with an ID, or None."""
+        index = self.position_of(entry_id)
+        return None if index is None else self[index]
+
+    def pop_id(self, entry_id):
+        """Remove and return the entry with an ID. Raises KeyError if there is no such entry."""
+        index = self.position_of(entry_id)
+        if index is None:
+            raise KeyError(entry_id)
+        return self.pop(index)
+
+    def flush(self):
+        """Make pending changes durable. In-memory backends have nothing to do."""
+
+class AddressBook(StorageBackend):
+    """
+    Ordered collection of address book entries with lookup indexes.
+
+    Entries are stored column by column: each field has its own StringTable, and an entry is a slot number that
+    picks the same position out of every table. Reading an entry still returns a {'name', 'phone', 'email'}
+    dictionary, built on demand. Slots are only ever added at the end, so slot order is display order, and the ID of
+    the entry in each slot is kept in an ascending array that can be bisected.
+
+    Removing an entry only marks its slot dead (a tombstone), which is O(1) whether it is found by ID or position.
+    The array of live slots used to find an entry by display position is rebuilt lazily after removals by ID, and the
+    tables are compacted once more than half of the slots are dead.
+
+    Email and phone are indexed with a HashIndex for O(1) exact lookup, and the slots are kept in an array sorted by
+    lowercase name so a prefix search is a bisect followed by a short scan (plus a scan of the few entries added since
+    the array was last sorted).
+    """
+
+    def __init__(self):
+        self._next_id = 1
+        self._reset()
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        return map(self._entry, self._live_slots())
+
+    def __getitem__(self, index):
+        return self._entry(self._positions()[index])
+
+    def append(self, entry):
+        """Add an entry to the end of the book and index it. Returns its ID."""
+        for field, column in self._columns.items():
+            slot = column.append(entry[field])
+        entry_id = self._claim_id(entry.get(ID_FIELD))
+        self._ids.append(entry_id)
+        self._alive.append(1)
+        self._live += 1
+        if self._order_fresh:
+            self._order.append(slot)
+        self._by_email.add(slot)
+        self._by_phone.add(slot)
+        self._new_names.append(slot)  # Sorted into _names by a later name search
+        return entry_id
+
+    def extend(self, entries, chunk_size=65536):
+        """
+        Add several entries to the end of the book.
+
+        Entries are taken `chunk_size` at a time and each chunk is added column by column with StringTable.extend(),
+        so only a chunk of dictionaries is held at once. The email and phone hashes are collected on the way and the
+        indexes are built from them once at the end, sized for the final count instead of regrowing chunk by chunk.
+        Loading a large CSV this way costs a fraction of appending the entries one by one.
+        """
+        first = len(self._alive)
+        email_hashes, phone_hashes = array('q'), array('q')
+        entries = iter(entries)
+        while chunk := list(itertools.islice(entries, chunk_size)):
+            for field, column in self._columns.items():
+                column.extend([entry[field] for entry in chunk])
+            email_hashes.extend([hash(entry['email']) for entry in chunk])
+            phone_hashes.extend([hash(entry['phone']) for entry in chunk])
+            requested = [entry.get(ID_FIELD) for entry in chunk]
+            if any(requested):
+                self._ids.extend(map(self._claim_id, requested))
+            else:  # No saved IDs, so the chunk simply takes the next ones
+                self._ids.extend(range(self._next_id, self._next_id + len(chunk)))
+                self._next_id += len(chunk)
+        added = len(email_hashes)
+        slots = range(first, first + added)
+        self._alive.extend(bytes([1]) * added)
+        self._live += added
+        if self._order_fresh:
+            self._order.extend(slots)
+        self._by_email.extend(email_hashes, first)
+        self._by_phone.extend(phone_hashes, first)
+        self._new_names.extend(slots)  # Sorted into _names by a later name search
+
+    def pop(self, index):
+        """Remove and return the entry at the given position."""
+        slot = self._positions().pop(index)  # Keeps the position array current at the cost of a memmove
+        return self._remove(slot)
+
+    def pop_id(self, entry_id):
+        """Remove and return the entry with an ID. Raises KeyError if there is no such entry."""
+        slot = self._slot_of(entry_id)
+        if slot is None:
+            raise KeyError(entry_id)
+        self._order_fresh = False  # Rebuilt on the next positional access instead of shifted now
+        return self._remove(slot)
+
+    def clear(self):
+        """Remove every entry and reset the indexes. IDs are not reused."""
+        self._reset()
+
+    def items(self):
+        slots = list(self._live_slots())
+        return zip(map(self._ids.__getitem__, slots), map(self._entry, slots))
+
+    def get_id(self, entry_id):
+        slot = self._slot_of(entry_id)
+        return None if slot is None else self._entry(slot)
+
+    def id_at(self, index):
+        return self._ids[self._positions()[index]]
+
+    def position_of(self, entry_id):
+        slot = self._slot_of(entry_id)
+        return None if slot is None else self._alive.count(1, 0, slot)  # Live slots before it, counted in C
+
+    def page(self, after=0, limit=LIST_PAGE_SIZE):
+        entries = []
+        slot = bisect.bisect_right(self._ids, after)
+        while slot < len(self._alive) and len(entries) < limit:
+            if self._alive[slot]:
+                entries.append((self._ids[slot], self._entry(slot)))
+            slot += 1
+        return entries
+
+    def find_email(self, email):
+        """Return the entry with the given email, or None."""
+        slot = self._by_email.find(email)
+        return None if slot is None else self._entry(slot)
+
+    def find_phone(self, phone):
+        """Return the entry with the given phone number, or None."""
+        slot = self._by_phone.find(phone)
+        return None if slot is None else self._entry(slot)
+
+    def search_name(self, prefix):
+        """Yield entries whose name starts with prefix (case-insensitive), in name order."""
+        names = self._columns['name']
+        name_key = lambda slot: names[slot].lower()
+        # Re-sorting on every search after an add is O(n log n), so recent additions are scanned directly until
+        # there are about sqrt(n) of them, which balances the scan against the amortised cost of sorting
+        if len(self._new_names) > max(NAME_BUFFER_MIN, math.isqrt(len(self._names))):
+            self._names = array('Q', sorted(itertools.chain(self._names, self._new_names), key=name_key))
+            self._new_names = array('Q')
+
+        prefix = prefix.lower()
+        matches = []
+        position = bisect.bisect_left(self._names, prefix, key=name_key)
+        while position < len(self._names) and name_key(self._names[position]).startswith(prefix):
+            matches.append(self._names[position])
+            position += 1
+        matches.extend(slot for slot in self._new_names if name_key(slot).startswith(prefix))
+        matches.sort(key=name_key)
+        for slot in matches:
+            if self._alive[slot]:  # Skip slots left behind by removed entries
+                yield self._entry(slot)
+
+    def _reset(self):
+        """Empty the tables and indexes."""
+        self._columns = {field: StringTable() for field in FIELDNAMES}
+        self._ids = array('Q')         # ID of the entry in each slot, ascending
+        self._alive = bytearray()      # 1 for each slot still in the book, 0 for a tombstone
+        self._live = 0
+        self._order = array('Q')       # Live slots in display order, valid while _order_fresh is set
+        self._order_fresh = True
+        self._by_email = HashIndex(self._columns['email'])
+        self._by_phone = HashIndex(self._columns['phone'])
+        self._names = array('Q')       # Slots sorted by lowercase name, including some removed slots
+        self._new_names = array('Q')   # Slots added since _names was last sorted
+
+    def _entry(self, slot):
+        """Build the dictionary for the entry stored in a slot."""
+        return {field: column[slot] for field, column in self._columns.items()}
+
+    def _live_slots(self):
+        """Iterate over the live slots in display order."""
+        return itertools.compress(range(len(self._alive)), self._alive)
+
+    def _positions(self):
+        """Return the array of live slots, rebuilding it if entries were removed by ID since it was last used."""
+        if not self._order_fresh:
+            self._order = array('Q', self._live_slots())
+            self._order_fresh = True
+        return self._order
+
+    def _claim_id(self, requested):
+        """Return the ID for a new entry: `requested` if it is a number above every ID so far, else the next one."""
+        entry_id = int(requested) if requested and str(requested).isdigit() else 0
+        entry_id = max(entry_id, self._next_id)
+        self._next_id = entry_id + 1
+        return entry_id
+
+    def _slot_of(self, entry_id):
+        """Return the slot holding a live entry with an ID, or None."""
+        slot = bisect.bisect_left(self._ids, entry_id)
+        if slot < len(self._ids) and self._ids[slot] == entry_id and self._alive[slot]:
+            return slot
+        return None
+
+    def _remove(self, slot):
+        """Turn a slot into a tombstone and return the entry it held."""
+        entry = self._entry(slot)
+        self._alive[slot] = 0
+        self._live -= 1
+        self._by_email.remove(slot)
+        self._by_phone.remove(slot)
+        # Tombstones stay in the tables until most of the storage is dead, then the live entries are copied out
+        if len(self._alive) > 2 * self._live + 64:
+            self._compact()
+        return entry
+
+    def _compact(self):
+        """Copy the live entries into fresh tables, keeping their IDs, to release the space held by tombstones."""
+        columns, ids, slots = self._columns, self._ids, list(self._live_slots())
+        next_id = self._next_id
+        self._reset()
+        self.extend({field: column[slot] for field, column in columns.items()} for slot in slots)
+        self._ids = array('Q', (ids[slot] for slot in slots))
+        self._next_id = next_id
+
+class LazyAddressBook(StorageBackend):
+    """
+    Read-only view of an address book CSV that parses rows only when they are needed.
+
+    The file is memory-mapped and described by a row-offset index (one integer per row), so opening a book with
+    millions of rows costs one pass over the bytes the first time and a single read of the index after that. Listing
+    streams rows straight from the file, and indexing parses just the one row asked for.
+
+    Anything that needs the whole book in memory (changes, searches) first loads it into an AddressBook and hands
+    every later call on to that. `changed` records whether any entry was added or removed, so a book that was only
+    read does not have to be written back (which would also invalidate the saved index).
+
+    IDs are read from the file's ID_FIELD column. As they ascend through the file, the row holding an ID is found by
+    bisecting the rows. A file written before IDs were saved has no such column, and its rows are numbered from 1.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.changed = False
+        self._book = None  # AddressBook holding the entries once they have been loaded
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = load_row_offsets(filename, self._map)
+        self._encoding = locale.getpreferredencoding(False)  # Same encoding open() uses for the eager path
+        self.fieldnames = self._parse(0)
+        self._id_column = self.fieldnames.index(ID_FIELD) if ID_FIELD in self.fieldnames else None
+
+    def __len__(self):
+        if self._book is not None:
+            return len(self._book)
+        return len(self._offsets) - 2  # Header row and end-of-file sentinel
+
+    def __iter__(self):
+        if self._book is not None:
+            return iter(self._book)
+        return (entry for _, entry in self.items())
+
+    def __getitem__(self, index):
+        if self._book is not None:
+            return self._book[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("address book index out of range")
+        entry = dict(zip(self.fieldnames, self._parse(index + 1)))
+        entry.pop(ID_FIELD, None)
+        return entry
+
+    def append(self, entry):
+        entry_id = self._load().append(entry)
+        self.changed = True
+        return entry_id
+
+    def extend(self, entries):
+        self._load().extend(entries)
+        self.changed = True
+
+    def pop(self, index):
+        entry = self._load().pop(index)
+        self.changed = True
+        return entry
+
+    def clear(self):
+        self._book = AddressBook()  # Nothing to load when everything is being thrown away
+        self.changed = True
+
+    def find_email(self, email):
+        return self._load().find_email(email)
+
+    def find_phone(self, phone):
+        return self._load().find_phone(phone)
+
+    def search_name(self, prefix):
+        return self._load().search_name(prefix)
+
+    def items(self):
+        if self._book is not None:
+            return self._book.items()
+        return self._stream_items()
+
+    def page(self, after=0, limit=LIST_PAGE_SIZE):
+        if self._book is not None:
+            return self._book.page(after, limit)
+        return super().page(after, limit)
+
+    def id_at(self, index):
+        if self._book is not None:
+            return self._book.id_at(index)
+        if self._id_column is None:
+            return super().id_at(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("address book index out of range")
+        return int(self._parse(index + 1)[self._id_column])
+
+    def position_of(self, entry_id):
+        if self._book is not None:
+            return self._book.position_of(entry_id)
+        if self._id_column is None:
+            return super().position_of(entry_id)
+        index = bisect.bisect_left(range(len(self)), entry_id, key=self.id_at)
+        return index if index < len(self) and self.id_at(index) == entry_id else None
+
+    def get_id(self, entry_id):
+        if self._book is not None:
+            return self._book.get_id(entry_id)
+        return super().get_id(entry_id)
+
+    def pop_id(self, entry_id):
+        entry = self._load().pop_id(entry_id)  # The loaded book keeps the IDs saved in the file
+        self.changed = True
+        return entry
+
+    def _parse(self, row):
+        """Parse one row of the file, counting the header as row 0."""
+        text = self._map[self._offsets[row]:self._offsets[row + 1]].decode(self._encoding)
+        for fields in csv.reader(text.splitlines(keepends=True)):
+            if fields:  # Skip blank lines trailing the row
+                return fields
+        return []
+
+    def _stream(self):
+        """Yield entries, with their saved IDs if the file has them, by reading the file from the first data row."""
+        with open(self.filename, 'rb') as raw:
+            raw.seek(self._offsets[1] if len(self._offsets) > 1 else 0)
+            text = io.TextIOWrapper(raw, encoding=self._encoding, newline='')
+            yield from csv.DictReader(text, fieldnames=self.fieldnames)
+
+    def _stream_items(self):
+        """Yield (ID, entry) pairs by streaming the file."""
+        for number, entry in enumerate(self._stream(), start=1):
+            entry_id = entry.pop(ID_FIELD, None)
+            yield (number if self._id_column is None else int(entry_id)), entry
+
+    def _load(self):
+        """Read every entry into an AddressBook and use it from now on."""
+        if self._book is None:
+            book = AddressBook()
+            book.extend(self._stream())
+            self._book = book
+            self._map.close()
+            self._file.close()
+        return self._book
+
+class SQLiteAddressBook(StorageBackend):
+    """
+    Address book stored in a SQLite database.
+
+    Entries are rows of an `entries` table whose integer primary key is the entry's ID and gives the display order
+    (AUTOINCREMENT, so the ID of a removed entry is never handed out again). Email, phone and a lowercase copy of the
+    name are indexed columns, so lookups and prefix searches are index seeks, and list_entries() pages with
+    `WHERE id > ?` rather than an OFFSET. One connection is kept open for the life of the book, and changes
+    are grouped into transactions of up to SQLITE_BATCH_SIZE, committed by flush().
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                name_key TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                email TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_name_key ON entries (name_key);
+            CREATE INDEX IF NOT EXISTS entries_phone ON entries (phone);
+            CREATE INDEX IF NOT EXISTS entries_email ON entries (email);
+        """)
+        self._count = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self._pending = 0  # Changes made since the last commit
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        after = 0
+        while True:
+            rows = self.page(after, SQLITE_BATCH_SIZE)
+            if not rows:
+                return
+            for _, entry in rows:
+                yield entry
+            after = rows[-1][0]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        row = self._connection.execute(
+            "SELECT name, phone, email FROM entries ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        if index < 0 or row is None:
+            raise IndexError("address book index out of range")
+        return dict(zip(FIELDNAMES, row))
+
+    def append(self, entry):
+        cursor = self._connection.execute(
+            "INSERT INTO entries (id, name, name_key, phone, email) VALUES (?, ?, ?, ?, ?)", self._row(entry))
+        self._count += 1
+        self._changed()
+        return cursor.lastrowid
+
+    def extend(self, entries):
+        before = self._connection.total_changes
+        self._connection.executemany(
+            "INSERT INTO entries (id, name, name_key, phone, email) VALUES (?, ?, ?, ?, ?)", map(self._row, entries))
+        self._count += self._connection.total_changes - before
+        self._changed()
+
+    def pop(self, index):
+        if index < 0:
+            index += self._count
+        row = self._connection.execute(
+            "SELECT id, name, phone, email FROM entries ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        if index < 0 or row is None:
+            raise IndexError("pop index out of range")
+        self._connection.execute("DELETE FROM entries WHERE id = ?", (row[0],))
+        self._count -= 1
+        self._changed()
+        return dict(zip(FIELDNAMES, row[1:]))
+
+    def clear(self):
+        self._connection.execute("DELETE FROM entries")
+        self._count = 0
+        self._changed()
+
+    def id_at(self, index):
+        if index < 0:
+            index += self._count
+        row = self._connection.execute("SELECT id FROM entries ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        if index < 0 or row is None:
+            raise IndexError("address book index out of range")
+        return row[0]
+
+    def position_of(self, entry_id):
+        if self.get_id(entry_id) is None:
+            return None
+        return self._connection.execute("SELECT COUNT(*) FROM entries WHERE id < ?", (entry_id,)).fetchone()[0]
+
+    def get_id(self, entry_id):
+        return self._find("id", entry_id)
+
+    def pop_id(self, entry_id):
+        entry = self.get_id(entry_id)
+        if entry is None:
+            raise KeyError(entry_id)
+        self._connection.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        self._count -= 1
+        self._changed()
+        return entry
+
+    def find_email(self, email):
+        return self._find("email", email)
+
+    def find_phone(self, phone):
+        return self._find("phone", phone)
+
+    def search_name(self, prefix):
+        prefix = prefix.lower()
+        cursor = self._connection.execute(
+            "SELECT name, phone, email FROM entries WHERE name_key >= ? AND name_key < ? ORDER BY name_key, id",
+            (prefix, prefix + "\U0010ffff"))
+        return (dict(zip(FIELDNAMES, row)) for row in cursor.fetchall())
+
+    def page(self, after=0, limit=LIST_PAGE_SIZE):
+        rows = self._connection.execute(
+            "SELECT id, name, phone, email FROM entries WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+        return [(row[0], dict(zip(FIELDNAMES, row[1:]))) for row in rows]
+
+    def flush(self):
+        if self._pending:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self):
+        """Commit pending changes and close the connection."""
+        self.flush()
+        self._connection.close()
+
+    @staticmethod
+    def _row(entry):
+        """Return the column values for an entry. A saved ID is kept; otherwise SQLite assigns the next one."""
+        entry_id = entry.get(ID_FIELD)
+        entry_id = int(entry_id) if entry_id and str(entry_id).isdigit() else None
+        return entry_id, entry['name'], entry['name'].lower(), entry['phone'], entry['email']
+
+    def _find(self, column, value):
+        row = self._connection.execute(
+            f"SELECT name, phone, email FROM entries WHERE {column} = ? ORDER BY id LIMIT 1", (value,)).fetchone()
+        return None if row is None else dict(zip(FIELDNAMES, row))
+
+    def _changed(self):
+        """Count a change, committing once a full batch has built up."""
+        self._pending += 1
+        if self._pending >= SQLITE_BATCH_SIZE:
+            self.flush()
+
+class Journal:
+    """
+    Append-only log of the changes made since the last CSV snapshot.
+
+    Each add, remove or clear is written as one CSV row to '<snapshot>.journal' and flushed to the operating system
+    straight away, so it survives the program crashing. The file is fsync()ed every `sync_every` records, which bounds
+    what a power failure can lose without paying for a disk flush on every change.
+
+    The first row records the size and modification time of the snapshot the journal applies to. A journal whose
+    snapshot has since been rewritten is stale and is ignored on replay.
+    """
+
+    def __init__(self, filename, sync_every=JOURNAL_SYNC_EVERY):
+        self.filename = filename
+        self.path = filename + JOURNAL_SUFFIX
+        self.sync_every = sync_every
+        self.records = 0    # Records in the journal since the last snapshot
+        self._unsynced = 0  # Records written since the last fsync()
+        self._file = None
+        self._writer = None
+
+    def open(self, records=0):
+        """Open the journal for appending, starting a new one if none matches the snapshot."""
+        self.records = records
+        if records:
+            self._file = open(self.path, 'a', newline='')
+            self._writer = csv.writer(self._file)
+        else:
+            self._start()
 
-address_book = []  # List to store address book entries
+    def log(self, op, *fields):
+        """Append one change record to the journal."""
+        self._writer.writerow([op, *fields])
+        self._file.flush()  # Hand the record to the OS so a crash of this process does not lose it
+        self.records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        if self.records >= max(JOURNAL_COMPACT_MIN, len(address_book)):
+            save_to_csv(self.filename)  # Fold the journal into a fresh snapshot
+
+    def sync(self):
+        """Force journal records written so far onto disk."""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def reset(self):
+        """Start an empty journal after the snapshot has been rewritten."""
+        self.close()
+        self._start()
+
+    def close(self):
+        """Sync and close the journal file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _start(self):
+        self._file = open(self.path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['snapshot', snapshot_stamp(self.filename)])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records = 0
+        self._unsynced = 0
+
+address_book = AddressBook()  # Address book entries, in display order
+journal = None  # Active Journal when running in journal mode
 
 def num_input(prompt: str) -> int:
     """Prompt the user for a numeric input."""
@@ -37,69 +868,652 @@ def num_input(prompt: str) -> int:
         except ValueError:
             print("Please enter a valid number.")
 
+@instrumentation.timed(name="address_book.add_entry")
 def add_entry(name, phone, email):
     """Add a new entry to the address book."""
-    if not validate_email(email):
-        print("Invalid email format. Entry not added.")
-        return
-    if not validate_phone(phone):
-        print("Invalid phone format. Entry not added.")
+    problem = check_format(phone, email) or check_duplicate(phone, email)
+    if problem is not None:
+        print(f"{problem}. Entry not added.")
         return
     entry = {'name': name, 'phone': phone, 'email': email}
-    address_book.append(entry)  # Append the new entry to the address book
+    entry_id = address_book.append(entry)  # Append the new entry to the address book
+    if journal is not None:
+        journal.log('add', entry_id, name, phone, email)
     print("Entry successfully added.")
 
-def remove_entry(number):
-    """Remove an entry from the address book by its number."""
-    if not (1 <= number <= len(address_book)):
-        print("Invalid entry number.")
-        return
-    item = address_book.pop(number - 1)  # Remove and return the entry at the specified index
+def entry_input(prompt: str):
+    """
+    Prompt the user for an entry, given either as its number in the list or as '#' followed by its ID.
+
+    Returns a (number, entry_id) pair with one of the two set, ready to pass to remove_entry() or show_entry().
+    """
+    while True:
+        reply = input(prompt).strip()
+        if reply.startswith("#") and reply[1:].isdigit():
+            return None, int(reply[1:])
+        try:
+            return int(reply), None
+        except ValueError:
+            print("Please enter a valid number, or # followed by an entry ID.")
+
+def remove_entry(number=None, entry_id=None):
+    """Remove an entry from the address book by its number, or by its stable ID."""
+    if entry_id is not None:
+        try:
+            item = address_book.pop_id(entry_id)  # Leaves a tombstone, so later IDs and numbers are untouched
+        except KeyError:
+            print("Invalid entry ID.")
+            return
+    else:
+        if not (1 <= number <= len(address_book)):
+            print("Invalid entry number.")
+            return
+        if journal is not None:
+            entry_id = address_book.id_at(number - 1)
+        item = address_book.pop(number - 1)  # Remove and return the entry at the specified index
+    if journal is not None:
+        journal.log('remove', f"#{entry_id}")  # Logged by ID, which replays to the same entry however it was chosen
     print(f"{item['name']} successfully removed.")
 
-def list_entries():
-    """List all entries in the address book."""
-    for index, entry in enumerate(address_book, start=1):
-        print(f"{index} - {entry['name']}")  # Print each entry's index and name
+def list_entries(page_size: int = LIST_PAGE_SIZE, pause: bool = True):
+    """List the entries in the address book, one page at a time, asking before each new page if `pause` is set."""
+    index = 0
+    after = 0
+    while True:
+        page = address_book.page(after, page_size)
+        for after, entry in page:
+            index += 1
+            print(f"{index} - {entry['name']} (#{after})")  # Print each entry's index, name and ID
+        if len(page) < page_size or index >= len(address_book):
+            break
+        if pause and input("Press Enter for more, or q to stop: ").strip().lower().startswith("q"):
+            break
 
-def show_entry(number):
-    """Show details of a specific entry in the address book."""
-    if not (1 <= number <= len(address_book)):
-        print("Invalid entry number.")
-        return
-    entry = address_book[number - 1]  # Access the entry at the specified index
+def show_entry(number=None, entry_id=None):
+    """Show details of a specific entry in the address book, by its number or by its stable ID."""
+    if entry_id is not None:
+        entry = address_book.get_id(entry_id)
+        if entry is None:
+            print("Invalid entry ID.")
+            return
+    else:
+        if not (1 <= number <= len(address_book)):
+            print("Invalid entry number.")
+            return
+        entry = address_book[number - 1]  # Access the entry at the specified index
     print(f"Name: {entry['name']}\nPhone: {entry['phone']}\nEmail: {entry['email']}")
 
+def search_entries(query):
+    """Search the address book by email, phone number or the start of a name."""
+    query = query.strip()
+    if validate_email(query):
+        entry = address_book.find_email(query)
+        matches = [entry] if entry is not None else []
+    elif validate_phone(query):
+        entry = address_book.find_phone(query)
+        matches = [entry] if entry is not None else []
+    else:
+        matches = list(address_book.search_name(query))
+
+    if not matches:
+        print("No matching entries found.")
+        return
+    for entry in matches:
+        print(f"{entry['name']} - {entry['phone']} - {entry['email']}")
+
 def clear_entries():
     """Clear all entries in the address book."""
     address_book.clear()  # Clear the address book list
+    if journal is not None:
+        journal.log('clear')
     print("All entries successfully cleared.")
 
 def validate_email(email) -> bool:
     """Validate the format of an email address using regular expressions."""
-    pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 def validate_phone(phone) -> bool:
     """Validate the format of a phone number using regular expressions."""
-    pattern = r"^(?:0[2-8])(\d{8})$"
-    return re.match(pattern, phone) is not None
+    return PHONE_PATTERN.match(phone) is not None
 
+def check_format(phone, email):
+    """Return why an entry's email or phone number is badly formatted, or None if both are valid."""
+    if not validate_email(email):
+        return "Invalid email format"
+    if not validate_phone(phone):
+        return "Invalid phone format"
+    return None
+
+def check_duplicate(phone, email):
+    """Return why an entry clashes with one already in the address book, or None if it does not."""
+    if address_book.find_email(email) is not None:
+        return "An entry with that email already exists"
+    if address_book.find_phone(phone) is not None:
+        return "An entry with that phone number already exists"
+    return None
+
+@instrumentation.timed(name="address_book.save_to_csv", bytes_of=instrumentation.path_size)
 def save_to_csv(filename: str):
-    """Save the address book entries to a CSV file."""
-    with open(filename, 'w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'phone', 'email'])
-        writer.writeheader()  # Write the header to the CSV file
-        for entry in address_book:
-            writer.writerow(entry)  # Write each entry as a row in the CSV file
-
-def load_from_csv(filename: str):
-    """Load address book entries from a CSV file."""
-    if os.path.exists(filename):
-        with open(filename, 'r') as file:
-            reader = csv.DictReader(file)
-            address_book.clear()  # Clear existing entries before loading
-            address_book.extend(reader)  # Load entries from the CSV file
+    """Save the address book entries, with their IDs, to a CSV file."""
+    temp_name = filename + ".tmp"
+    with open(temp_name, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([*FIELDNAMES, ID_FIELD])  # Write the header to the CSV file
+        rows = ([*(entry[field] for field in FIELDNAMES), entry_id] for entry_id, entry in address_book.items())
+        writer.writerows(rows)  # Write each entry as a row in the CSV file
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_name, filename)  # Swap the new snapshot in so a crash never leaves a half-written file
+
+    # The snapshot now contains every journalled change
+    if journal is not None and journal.filename == filename:
+        journal.reset()
+    elif os.path.exists(filename + JOURNAL_SUFFIX):
+        os.remove(filename + JOURNAL_SUFFIX)
+
+@instrumentation.timed(name="address_book.load_from_csv", bytes_of=instrumentation.path_size)
+def load_from_csv(filename: str, lazy: bool = False) -> int:
+    """
+    Load address book entries from a CSV file, then replay any journal on top. Returns the records replayed.
+
+    With lazy=True the file is memory-mapped rather than read, and rows are parsed as they are used. A SQLite book is
+    kept and has its contents replaced by the file, which is how a CSV address book is migrated into a database.
+    """
+    global address_book
+    if isinstance(address_book, SQLiteAddressBook):
+        address_book.clear()
+        if os.path.exists(filename):
+            with open(filename, 'r', newline='') as file:
+                address_book.extend(csv.DictReader(file))
+        address_book.flush()
+        return 0
+    if lazy and os.path.exists(filename) and os.path.getsize(filename):
+        address_book = LazyAddressBook(filename)
+    else:
+        address_book = AddressBook()  # Start from an empty book before loading
+        if os.path.exists(filename):
+            with open(filename, 'r', newline='') as file:
+                reader = csv.DictReader(file)
+                address_book.extend(reader)  # Load entries from the CSV file
+    return replay_journal(filename)
+
+def build_row_offsets(data) -> array:
+    """
+    Return the byte offset where each CSV row starts, followed by the file size.
+
+    Row 0 is the header. A newline only ends a row when it is outside quotes, which is tracked by the parity of the
+    quote characters seen (an escaped quote is written as two quotes, so it does not change the parity).
+    """
+    size = len(data)
+    offsets = array('Q' if size >= 2**32 else 'I')  # Half the memory for files under 4 GB
+    has_quotes = data.find(b'"') != -1
+    row_start = pos = 0
+    in_quotes = False
+    while pos < size:
+        end = data.find(b'\n', pos)
+        end = size if end == -1 else end + 1
+        if has_quotes and data[pos:end].count(b'"') % 2:
+            in_quotes = not in_quotes
+        pos = end
+        if not in_quotes:
+            if data[row_start:pos].strip():  # csv.DictReader skips blank lines, so the index does too
+                offsets.append(row_start)
+            row_start = pos
+    offsets.append(size)  # End-of-file sentinel so row i always spans offsets[i]:offsets[i + 1]
+    return offsets
+
+def load_row_offsets(filename: str, data) -> array:
+    """Return the row offsets for a CSV file, reusing the saved index if it matches the file."""
+    index_path = filename + INDEX_SUFFIX
+    stamp = snapshot_stamp(filename)
+    try:
+        with open(index_path, 'rb') as file:
+            header = file.readline().decode('ascii').split()
+            if header[:1] == [stamp]:
+                offsets = array(header[1])
+                offsets.frombytes(file.read())
+                return offsets
+    except (OSError, ValueError, IndexError, UnicodeDecodeError):
+        pass  # Missing or unreadable index, so rebuild it
+
+    offsets = build_row_offsets(data)
+    try:
+        with open(index_path + ".tmp", 'wb') as file:
+            file.write(f"{stamp} {offsets.typecode}\n".encode('ascii'))
+            offsets.tofile(file)
+        os.replace(index_path + ".tmp", index_path)
+    except OSError:
+        pass  # The index is only a cache; carry on without saving it
+    return offsets
+
+def snapshot_stamp(filename: str) -> str:
+    """Identify the current version of a snapshot file by its size and modification time."""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return "none"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def replay_journal(filename: str) -> int:
+    """Apply the journal for a snapshot to the address book. Returns the number of records replayed."""
+    path = filename + JOURNAL_SUFFIX
+    if not os.path.exists(path):
+        return 0
+
+    replayed = 0
+    with open(path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header != ['snapshot', snapshot_stamp(filename)]:
+            return 0  # The journal belongs to an older snapshot, which already contains its changes
+
+        for record in reader:
+            op = record[0] if record else None
+            if op == 'add' and len(record) in (4, 5):
+                # Records carry the entry's ID before its fields; journals written before IDs were saved do not
+                address_book.append(dict(zip([ID_FIELD, *FIELDNAMES][5 - len(record):], record[1:])))
+            elif op == 'remove' and len(record) == 2 and record[1].startswith("#") and record[1][1:].isdigit():
+                address_book.pop_id(int(record[1][1:]))
+            elif op == 'remove' and len(record) == 2 and record[1].isdigit():
+                address_book.pop(int(record[1]) - 1)  # Removal by position, from before IDs were saved
+            elif op == 'clear' and len(record) == 1:
+                address_book.clear()
+            else:
+                break  # A torn record can only be the last one written before a crash
+            replayed += 1
+    return replayed
+
+def validate_rows(rows):
+    """
+    Check the format of a chunk of (line, name, phone, email) rows.
+
+    Returns the rows that passed and a list of (row, reason) pairs for the rows that did not. This runs in the import
+    worker processes, so it only uses the validators and never touches the address book.
+    """
+    accepted = []
+    rejected = []
+    for row in rows:
+        problem = check_format(row[2], row[3])
+        if problem is None:
+            accepted.append(row)
+        else:
+            rejected.append((row, problem))
+    return accepted, rejected
+
+def read_import_chunks(file, chunk_size):
+    """Yield lists of (line, name, phone, email) rows from an open CSV file. Missing fields are read as ''."""
+    reader = csv.DictReader(file)
+    chunk = []
+    for row in reader:
+        name, phone, email = row.get('name'), row.get('phone'), row.get('email')
+        chunk.append((reader.line_num, name or "", phone or "", email or ""))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def validated_chunks(chunks, workers):
+    """Yield validate_rows() results for each chunk in order, spreading the work over `workers` processes."""
+    if workers <= 1:
+        yield from map(validate_rows, chunks)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(validate_rows, chunk))
+            if len(pending) >= workers * 2:  # Bound the rows held in memory while workers catch up
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+def bulk_import(filename: str, report: str = None, workers: int = None, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Import entries from a CSV file with 'name', 'phone' and 'email' columns.
+
+    Rows are streamed from the file and validated in chunks across a pool of worker processes. Valid rows that do not
+    duplicate an existing email or phone number are added in file order; every other row is written to the report
+    file (by default '<filename>.rejected.csv') together with the reason it was rejected.
+
+    Returns the number of entries imported and the number rejected.
+    """
+    if not os.path.exists(filename):
+        print(f"File {filename} not found.")
+        return 0, 0
+    report = report or filename + REJECTED_SUFFIX
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    imported = rejected = 0
+    with open(filename, 'r', newline='') as source, open(report, 'w', newline='') as report_file:
+        report_writer = csv.writer(report_file)
+        report_writer.writerow(['line', *FIELDNAMES, 'reason'])
+        for accepted, failed in validated_chunks(read_import_chunks(source, chunk_size), workers):
+            # Duplicates depend on the book (and earlier rows), so they are checked here in file order
+            for row in accepted:
+                problem = check_duplicate(row[2], row[3])
+                if problem is None:
+                    address_book.append({'name': row[1], 'phone': row[2], 'email': row[3]})
+                    imported += 1
+                else:
+                    failed.append((row, problem))
+            failed.sort(key=lambda rejection: rejection[0][0])  # Format and duplicate rejects back in line order
+            for row, problem in failed:
+                report_writer.writerow([*row, problem])
+            rejected += len(failed)
+
+    if journal is not None and imported:
+        save_to_csv(journal.filename)  # One snapshot instead of a journal record per imported entry
+    address_book.flush()
+
+    elapsed = time.perf_counter() - start
+    rate = (imported + rejected) / elapsed * 60 if elapsed else 0
+    print(f"Imported {imported} entries, rejected {rejected} in {elapsed:.1f}s ({rate:,.0f} rows/minute).")
+    if rejected:
+        print(f"Rejected rows written to {report}.")
+    return imported, rejected
+
+def normalise_phone(phone: str) -> str:
+    """Reduce a phone number to the digits validate_phone() expects, so '+61 2 1234 5678' becomes '0212345678'."""
+    digits = NON_DIGITS.sub("", phone)
+    if digits.startswith("61") and len(digits) == 11:
+        digits = "0" + digits[2:]  # International prefix in place of the leading 0
+    return digits
+
+def normalise_email(email: str) -> str:
+    """
+    Reduce an email address to a comparable form.
+
+    The address is lowercased, any '+tag' is dropped, and the words of the local part (the characters
+    validate_email() allows, split on '.', '_' and '-') are sorted, so 'Jane.Doe+news@x.com' and 'doe_jane@x.com'
+    have the same form.
+    """
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    return ".".join(sorted(filter(None, EMAIL_WORD_SEPARATORS.split(local)))) + "@" + domain
+
+def normalise_name(name: str) -> str:
+    """Lowercase a name and drop punctuation and word order, so 'Smith, JANE' becomes 'jane smith'."""
+    return " ".join(sorted(NON_NAME_CHARACTERS.sub("", name.lower()).split()))
+
+@functools.lru_cache(maxsize=65536)
+def ngrams(text: str) -> frozenset:
+    """
+    Return the set of character n-grams of a string, padded so its ends get n-grams of their own.
+
+    Candidate pairs share names, phones and emails heavily (a block is built from equal keys), so recent results
+    are cached rather than rebuilt for every comparison.
+    """
+    text = f" {text} "
+    return frozenset(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)) if text.strip() else frozenset()
+
+def alike(first: str, second: str, similarity: float) -> bool:
+    """Return True if the n-gram sets of two strings are at least `similarity` alike (Jaccard similarity)."""
+    a, b = ngrams(first), ngrams(second)
+    return bool(a and b) and len(a & b) >= similarity * len(a | b)
+
+def near_duplicates(first: dict, second: dict) -> bool:
+    """
+    Return True if two entries with similar names are also close on phone or email.
+
+    A similar name alone is not enough (two people can share one), but a similar name together with a phone number or
+    email that differs only by a typo is treated as the same contact.
+    """
+    return alike(normalise_name(first['name']), normalise_name(second['name']), NAME_SIMILARITY) and (
+        alike(normalise_phone(first['phone']), normalise_phone(second['phone']), TYPO_SIMILARITY) or
+        alike(normalise_email(first['email']), normalise_email(second['email']), TYPO_SIMILARITY))
+
+def linked(first: dict, second: dict) -> bool:
+    """Return True if two entries share a normalised phone number or email, or near_duplicates() finds them close."""
+    phone = normalise_phone(first['phone'])
+    if phone and phone == normalise_phone(second['phone']):
+        return True
+    if first['email'] and second['email'] and normalise_email(first['email']) == normalise_email(second['email']):
+        return True
+    return near_duplicates(first, second)
+
+def stable_hash(text: str) -> int:
+    """Return a signed 64-bit hash of a string that, unlike hash(), is the same in every run."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+def split_chains(cluster: list) -> list:
+    """
+    Split a cluster of entry IDs into groups whose members are each linked directly to the group's first member.
+
+    Union-find joins entries transitively, so A~B and B~C put A and C together even when A and C share nothing. The
+    earliest entry not yet placed anchors a group of every remaining entry linked to it, until none are left. Groups
+    of one are dropped, as nothing left in the cluster is linked to them directly.
+    """
+    remaining = [(entry_id, address_book.get_id(entry_id)) for entry_id in cluster]
+    groups = []
+    while remaining:
+        (anchor_id, anchor), *rest = remaining
+        group, remaining = [anchor_id], []
+        for entry_id, entry in rest:
+            if linked(anchor, entry):
+                group.append(entry_id)
+            else:
+                remaining.append((entry_id, entry))
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+def group_runs(keys, same, union):
+    """
+    Union the positions whose keys are equal and that `same(anchor, position)` confirms.
+
+    Sorting the positions by key puts every block of equal keys next to each other, so each block is compared with
+    its first member only. The work is O(n log n) however large a block gets.
+    """
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    anchor = None
+    for position in order:
+        if anchor is not None and keys[position] == keys[anchor]:
+            if same(anchor, position):
+                union(anchor, position)
+        else:
+            anchor = position
+
+def find_duplicates(page_size: int = 10000) -> list:
+    """
+    Return clusters of entry IDs that look like the same contact, largest cluster first.
+
+    Two entries are linked when their normalised phone numbers or emails are equal, or when near_duplicates() finds
+    them close on name and on phone or email. Rather than compare every pair, entries are blocked: one pass over the
+    book records a hash of each normalised key, plus MINHASH_BANDS locality-sensitive hashes of the name built from
+    MinHash signatures of its n-grams. Sorting each array of hashes brings the candidates together, and only they are
+    compared. Linked entries are merged into clusters with a union-find, and clusters of CLUSTER_VERIFY_MIN or more are
+    put through split_chains() so a long chain of pairwise matches is not reported as one contact.
+
+    Keys are hashed with stable_hash() rather than hash(), which is salted per run for strings, so the same book gives
+    the same clusters every time.
+    """
+    rng = random.Random(0)
+    masks = [[rng.getrandbits(63) for _ in range(MINHASH_ROWS)] for _ in range(MINHASH_BANDS)]
+
+    ids = array('Q')
+    phone_keys, email_keys = array('q'), array('q')
+    band_keys = [array('q') for _ in range(MINHASH_BANDS)]
+    gram_hashes = {}  # The same n-grams recur across many names, so each is hashed once
+    after = 0
+    while True:
+        page = address_book.page(after, page_size)
+        if not page:
+            break
+        for after, entry in page:
+            position = len(ids)
+            ids.append(after)
+            # Blank keys get a hash of their own so they never match anything (hashes of int tuples are not salted)
+            phone = normalise_phone(entry['phone'])
+            phone_keys.append(stable_hash(phone) if phone else hash((1, position)))
+            email_keys.append(stable_hash(normalise_email(entry['email'])) if entry['email'] else hash((2, position)))
+            grams = []
+            for gram in ngrams(normalise_name(entry['name'])):
+                if gram not in gram_hashes:
+                    gram_hashes[gram] = stable_hash(gram)
+                grams.append(gram_hashes[gram])
+            for band, band_masks in zip(band_keys, masks):
+                if grams:
+                    # One MinHash value per mask: the smallest n-gram hash once XORed with that mask
+                    band.append(hash(tuple(min(map(mask.__xor__, grams)) for mask in band_masks)))
+                else:
+                    band.append(hash((3, position)))
+
+    parents = array('Q', range(len(ids)))
+
+    def find(position):
+        while parents[position] != position:
+            parents[position] = parents[parents[position]]  # Path halving
+            position = parents[position]
+        return position
+
+    def union(first, second):
+        first, second = find(first), find(second)
+        if first != second:
+            parents[max(first, second)] = min(first, second)
+
+    def field_matches(field, normalise):
+        def same(first, second):
+            return normalise(address_book.get_id(ids[first])[field]) == \
+                normalise(address_book.get_id(ids[second])[field])
+        return same
+
+    def same_contact(first, second):
+        return near_duplicates(address_book.get_id(ids[first]), address_book.get_id(ids[second]))
+
+    group_runs(phone_keys, field_matches('phone', normalise_phone), union)
+    group_runs(email_keys, field_matches('email', normalise_email), union)
+    for band in band_keys:
+        group_runs(band, same_contact, union)
+
+    clusters = {}
+    for position, entry_id in enumerate(ids):
+        clusters.setdefault(find(position), []).append(entry_id)
+    verified = []
+    for cluster in clusters.values():
+        if len(cluster) >= CLUSTER_VERIFY_MIN:
+            verified.extend(split_chains(cluster))
+        elif len(cluster) > 1:
+            verified.append(cluster)
+    return sorted(verified, key=len, reverse=True)
+
+def report_duplicates(report: str = DUPLICATES_FILE, shown: int = 10) -> list:
+    """Find duplicate clusters, print the first few and write all of them to a CSV report."""
+    start = time.perf_counter()
+    clusters = find_duplicates()
+    elapsed = time.perf_counter() - start
+    if not clusters:
+        print(f"No duplicate entries found ({elapsed:.1f}s).")
+        return clusters
+
+    with open(report, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['cluster', 'id', *FIELDNAMES])
+        for number, cluster in enumerate(clusters, start=1):
+            for entry_id in cluster:
+                entry = address_book.get_id(entry_id)
+                writer.writerow([number, entry_id, *(entry[field] for field in FIELDNAMES)])
+
+    print(f"Found {len(clusters)} clusters of likely duplicates in {elapsed:.1f}s.")
+    for number, cluster in enumerate(clusters[:shown], start=1):
+        print(f"Cluster {number}:")
+        for entry_id in cluster:
+            entry = address_book.get_id(entry_id)
+            print(f"  #{entry_id} - {entry['name']} - {entry['phone']} - {entry['email']}")
+    print(f"All clusters written to {report}.")
+    return clusters
+
+def parse_entry_reference(text: str):
+    """Turn '3' into (3, None) and '#3' into (None, 3), as entry_input() does for the menu."""
+    text = text.strip()
+    if text.startswith("#"):
+        return None, int(text[1:])
+    return int(text), None
+
+def batch_handlers(module=None) -> dict:
+    """
+    Map batch operation names to functions taking the operation's arguments as strings.
+
+    The handlers call the address book functions of `module`, which defaults to this script. Passing another address
+    book module (such as the Week 5 one) lets the same batches be run against it; operations that module does not
+    have are left out.
+    """
+    this = sys.modules[__name__]
+    module = module or this
+
+    def by_reference(function):
+        def handler(reference):
+            number, entry_id = parse_entry_reference(reference)
+            if entry_id is None:
+                function(number)
+            else:
+                function(number, entry_id)
+        return handler
+
+    handlers = {
+        'add': module.add_entry,
+        'remove': by_reference(module.remove_entry),
+        'show': by_reference(module.show_entry),
+        'list': functools.partial(module.list_entries, pause=False) if module is this else module.list_entries,
+        'clear': module.clear_entries,
+    }
+    if hasattr(module, 'save_to_csv'):
+        handlers['save'] = lambda filename=ADDRESS_BOOK_FILE: module.save_to_csv(filename)
+    if hasattr(module, 'search_entries'):
+        handlers['search'] = module.search_entries
+    return handlers
+
+def run_batch(lines, handlers: dict = None, quiet: bool = False) -> dict:
+    """
+    Run address book operations, one per line, and return the latency in seconds of each, grouped by operation.
+
+    Each line is CSV: the operation name followed by its arguments, for example 'add,Jane Doe,0212345678,jd@x.com',
+    'remove,#42', 'show,3', 'list', 'search,jane', 'save,backup.csv' or 'clear'. Blank lines and lines starting with
+    '#' are skipped. A line that cannot be run is reported on standard error and the batch carries on. With `quiet`,
+    what the operations print is discarded so only their own cost is measured.
+    """
+    handlers = handlers or batch_handlers()
+    latencies = {}
+    output = open(os.devnull, 'w') if quiet else contextlib.nullcontext(sys.stdout)
+    with output as target, contextlib.redirect_stdout(target):
+        for line_number, fields in enumerate(csv.reader(lines), start=1):
+            if not fields or not fields[0].strip() or fields[0].startswith("#"):
+                continue
+            op = fields[0].strip().lower()
+            handler = handlers.get(op)
+            if handler is None:
+                print(f"Line {line_number}: unknown operation '{op}'.", file=sys.stderr)
+                continue
+            start = time.perf_counter()
+            try:
+                handler(*fields[1:])
+            except (TypeError, ValueError) as error:
+                print(f"Line {line_number}: cannot run '{op}': {error}", file=sys.stderr)
+                continue
+            latencies.setdefault(op, []).append(time.perf_counter() - start)
+            address_book.flush()
+    return latencies
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Return the value below which `fraction` of an already sorted list falls (nearest rank)."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def print_batch_report(latencies: dict) -> None:
+    """Print the count, throughput and p50/p99 latency of each operation in a batch."""
+    print(f"{'operation':>10} {'count':>9} {'ops/s':>12} {'p50':>10} {'p99':>10}")
+    total_count = total_time = 0
+    for op, times in sorted(latencies.items()):
+        times = sorted(times)
+        elapsed = sum(times)
+        total_count += len(times)
+        total_time += elapsed
+        rate = len(times) / elapsed if elapsed else float('inf')
+        print(f"{op:>10} {len(times):>9} {rate:>12,.0f} {percentile(times, 0.5) * 1e6:>7.1f} us "
+              f"{percentile(times, 0.99) * 1e6:>7.1f} us")
+    if total_count:
+        rate = total_count / total_time if total_time else float('inf')
+        print(f"{'total':>10} {total_count:>9} {rate:>12,.0f}")
 
 def show_menu() -> int:
     """Display the main menu options to the user and get their choice."""
@@ -109,12 +1523,83 @@ def show_menu() -> int:
     print(f"3 - List entries")
     print(f"4 - Show entry")
     print(f"5 - Clear entries")
-    print(f"6 - Exit\n")
+    print(f"6 - Search entries")
+    print(f"7 - Import entries")
+    print(f"8 - Find duplicates")
+    print(f"9 - Exit\n")
     return num_input("Enter your choice: ")
 
+def save_address_book():
+    """Persist the address book on exit in whichever way the storage mode needs."""
+    if isinstance(address_book, SQLiteAddressBook):
+        address_book.close()  # Changes are already in the database
+    elif journal is not None:
+        journal.close()  # Every change is already in the journal
+    elif isinstance(address_book, LazyAddressBook) and not address_book.changed:
+        return  # The file already holds every entry, and leaving it alone keeps its row index valid
+    else:
+        save_to_csv(ADDRESS_BOOK_FILE)
+
 def main():
     """Main function to run the extended address book program."""
-    load_from_csv("address_book.csv")  # Load entries from CSV file at the start
+    global address_book, journal
+
+    parser = argparse.ArgumentParser(description="Extended address book.")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument("--journal", action="store_true",
+                         help="append each change to a journal instead of rewriting the CSV on exit")
+    storage.add_argument("--lazy", action="store_true",
+                         help="memory-map the CSV and read entries on demand instead of loading them all")
+    storage.add_argument("--sqlite", metavar="DATABASE",
+                         help="store entries in a SQLite database, importing the CSV file if the database is empty")
+    parser.add_argument("--export", metavar="FILE", help="write the SQLite database to a CSV file and exit")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="import entries from FILE, save the address book and exit")
+    parser.add_argument("--workers", type=int, help="worker processes used to validate imports")
+    parser.add_argument("--dedupe", action="store_true", help="report clusters of duplicate entries and exit")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the operations in FILE ('-' for standard input), report their timings, save and exit")
+    parser.add_argument("--quiet", action="store_true", help="with --batch, discard the output of the operations")
+    args = parser.parse_args()
+
+    if args.export and not args.sqlite:
+        parser.error("--export needs --sqlite")
+
+    if args.sqlite:
+        address_book = SQLiteAddressBook(args.sqlite)
+        if not address_book and os.path.exists(ADDRESS_BOOK_FILE):
+            load_from_csv(ADDRESS_BOOK_FILE)  # Migrate the CSV address book into the new database
+            print(f"Imported {len(address_book)} entries from {ADDRESS_BOOK_FILE}.")
+    else:
+        replayed = load_from_csv(ADDRESS_BOOK_FILE, lazy=args.lazy)  # Load entries from CSV file at the start
+        if args.journal:
+            journal = Journal(ADDRESS_BOOK_FILE)
+            journal.open(replayed)
+
+    if args.export:
+        save_to_csv(args.export)
+        address_book.close()
+        print(f"Exported {len(address_book)} entries to {args.export}.")
+        return
+
+    if args.import_file:
+        bulk_import(args.import_file, workers=args.workers)
+        save_address_book()
+        return
+
+    if args.dedupe:
+        report_duplicates()
+        return
+
+    if args.batch:
+        if args.batch == "-":
+            latencies = run_batch(sys.stdin, quiet=args.quiet)
+        else:
+            with open(args.batch, 'r', newline='') as file:
+                latencies = run_batch(file, quiet=args.quiet)
+        print_batch_report(latencies)
+        save_address_book()  # As on EXIT, so a batch without a 'save' line does not lose its changes
+        return
 
     while True:
         choice = show_menu()  # Get user's choice
@@ -129,8 +1614,8 @@ def main():
             if not address_book:
                 print("No entries to remove.\n")
                 continue
-            number = num_input("Enter entry number to remove: ")
-            remove_entry(number)
+            number, entry_id = entry_input("Enter entry number (or #ID) to remove: ")
+            remove_entry(number, entry_id)
 
         elif choice == LIST_ENTRIES:
             if not address_book:
@@ -142,19 +1627,38 @@ def main():
             if not address_book:
                 print("No entries to show.\n")
                 continue
-            number = num_input("Enter entry number to show: ")
-            show_entry(number)
+            number, entry_id = entry_input("Enter entry number (or #ID) to show: ")
+            show_entry(number, entry_id)
 
         elif choice == CLEAR_ENTRIES:
             clear_entries()
 
+        elif choice == SEARCH_ENTRIES:
+            if not address_book:
+                print("No entries to search.\n")
+                continue
+            query = input("Enter a name, email or phone number to search for: ")
+            search_entries(query)
+
+        elif choice == IMPORT_ENTRIES:
+            filename = input("Enter the CSV file to import: ").strip()
+            bulk_import(filename, workers=args.workers)
+
+        elif choice == FIND_DUPLICATES:
+            if not address_book:
+                print("No entries to check.\n")
+                continue
+            report_duplicates()
+
         elif choice == EXIT:
-            save_to_csv("address_book.csv")
+            save_address_book()
             print("Address book saved. Exiting program.")
             break
 
         else:
-            print("Invalid choice. Please enter a number between 1 and 6.")
+            print("Invalid choice. Please enter a number between 1 and 9.")
+
+        address_book.flush()  # Commit the change just made when a database is in use
 
 if __name__ == '__main__':
     sys.exit(main())
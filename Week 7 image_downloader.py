@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Web Image Downloader
+
+This script is a worked solution to the two Week 7 skeletons. It fetches a webpage, extracts the URLs of its images,
+and downloads them into a local directory. The images can be found with BeautifulSoup, as in
+'image_downloader_bs_skeleton.py' (--parser bs4), with a regular expression, as in
+'image_downloader_regex_skeleton.py' (--parser regex), or with the streaming parser described below (the default).
+
+Enhancements over the skeletons:
+- Streaming Extraction: The default parser is built on html.parser.HTMLParser and is fed the page a chunk at a
+  time as it arrives, handing over each image URL as soon as its tag has been read, so images start downloading
+  before the page has finished loading. As well as <img src>, it finds every image in srcset, lazy-loading
+  attributes such as data-src, and <picture><source> elements.
+- Concurrent Downloads: Images are downloaded by a bounded pool of worker threads rather than one after another, so
+  a page with hundreds of images takes about as long as its slowest few fetches instead of the sum of them all.
+- Connection Pooling: Every request goes through one shared requests.Session whose keep-alive connections are reused
+  between downloads. At most --per-host connections are open to any one host; further downloads wait for one.
+- Retries: Connection errors, timeouts and 429/5xx responses are retried with exponential backoff and jitter.
+- Timeouts: Every request gives up if the server takes too long to accept the connection or to send more data.
+- Streaming: Images are written to disk a chunk at a time instead of being held in memory whole, so memory use does
+  not grow with image size. Each image goes to a temporary file that is renamed into place once it is complete and
+  matches its Content-Length, and downloads larger than --max-size are abandoned.
+- Caching: Downloaded images are kept in a cache folder ('image_cache'), along with each URL's ETag and Last-Modified
+  date. The next run asks the server for each image only if it has changed (If-None-Match / If-Modified-Since) and
+  reuses the cached copy if not. Images are stored in the cache once per distinct content, named by their SHA-256,
+  and the output folder holds hard links to them, so an image served under several URLs takes up space once. Each
+  run ends with the cache hit rate and the bytes saved. Use --no-cache to download everything afresh.
+- Crawling: With --crawl, the downloader follows the links on the page to other pages of the same site (or the
+  --domain sites), up to --max-depth links away, and downloads the images on all of them. Pages are fetched several
+  at a time, obeying robots.txt and at most --rate pages a second from each host. The pages and images found are
+  recorded in a frontier file ('crawl_frontier.db'), and running the same crawl again resumes it.
+- Resuming: Each image's progress is recorded in a manifest in the output folder ('.image_manifest.db'). A download
+  that stops partway keeps what it received, and carries on from there with an HTTP Range request, on its next
+  retry or the next run; If-Range makes the server send the whole image instead if it has changed meanwhile. Once a
+  run has found every image on the page, running the same command again goes straight to the images not yet
+  downloaded, without fetching the page or checking the folder. Use --rescan to read the page again.
+- Instrumentation: With INSTRUMENT=1 in the environment, each page's downloads and each image download are timed
+  into latency histograms, with the bytes received, and summarised on exit (see instrumentation.py).
+
+Usage:
+    python "Week 7 image_downloader.py" <URL> [--folder images] [--parser stream|bs4|regex] [--workers 32]
+        [--per-host 16] [--retries 3] [--max-size 100] [--cache image_cache | --no-cache] [--rescan]
+        [--crawl [--max-depth 3] [--max-pages N] [--domain example.com] [--rate 5] [--page-workers 8]
+         [--frontier crawl_frontier.db]]
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import math
+import os
+import posixpath
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+BeautifulSoup = None  # Imported by load_bs4() when --parser bs4 is chosen
+
+FOLDER_NAME = "images"
+MANIFEST_FILE = ".image_manifest.db"  # In the output folder
+CACHE_FOLDER = "image_cache"
+CACHE_INDEX = "index.json"
+WORKERS = 32                # Downloads in progress at once
+CONNECTIONS_PER_HOST = 16   # Keep-alive connections the session keeps open to each host
+HOST_POOLS = 32             # Hosts whose connection pools the session keeps
+TIMEOUT = (5.0, 30.0)       # Seconds to wait for a connection, and for each read from the server
+RETRIES = 3                 # Further attempts after a retryable failure
+BACKOFF = 0.5               # Seconds before the first retry, doubled for each one after
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024      # Bytes read from the network and written to disk at a time
+MAX_IMAGE_SIZE = 100 * 2**20  # Largest image downloaded, in bytes
+USER_AGENT = "Week7ImageDownloader/1.0"
+FRONTIER_FILE = "crawl_frontier.db"
+MAX_DEPTH = 3               # Links followed away from the start page when crawling
+PAGE_WORKERS = 8            # Pages fetched at once when crawling
+PAGES_PER_SECOND = 5.0      # Pages fetched from each host a second when crawling (0 for no limit)
+IMAGE_BACKLOG = 4           # Images queued per download worker before the crawl waits for them
+BLOOM_CAPACITY = 1_000_000  # URLs each seen-set's Bloom filter is sized for
+BLOOM_ERROR_RATE = 0.001    # Its false-positive rate at that size
+FRONTIER_COMMIT_EVERY = 1000  # Frontier changes between SQLite commits
+
+IMG_PATTERN = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+URL_ATTRIBUTES = {'src', 'data-src', 'data-lazy-src', 'data-original'}  # Attributes holding one image URL
+SRCSET_ATTRIBUTES = {'srcset', 'data-srcset'}  # Attributes holding a list of image URLs with sizes
+
+class DownloadError(requests.RequestException):
+    """Raised when a download is refused or does not arrive whole."""
+
+class ImageTooLargeError(DownloadError):
+    """Raised when an image is larger than the maximum size."""
+
+class IncompleteDownloadError(DownloadError):
+    """Raised when fewer bytes arrive than the server's Content-Length promised. The download is retried."""
+
+def load_bs4():
+    """Import BeautifulSoup into the module the first time it is needed, and return it."""
+    global BeautifulSoup
+    if BeautifulSoup is None:
+        from bs4 import BeautifulSoup
+    return BeautifulSoup
+
+def extract_bs4(html: str) -> list:
+    """Return the src of every <img> tag, found with BeautifulSoup."""
+    soup = load_bs4()(html, 'html.parser')
+    return [image['src'] for image in soup.find_all('img') if image.get('src')]
+
+def extract_regex(html: str) -> list:
+    """Return the src of every <img> tag, found with a regular expression."""
+    return IMG_PATTERN.findall(html)
+
+class ImageLinkParser(HTMLParser):
+    """
+    Incremental HTML parser that collects image URLs from the tags fed to it so far.
+
+    URLs are taken from <img> tags and from the <source> tags of a <picture>, in the order they appear, from the
+    attributes in URL_ATTRIBUTES and from every candidate in the SRCSET_ATTRIBUTES. Comments and scripts are
+    skipped by HTMLParser, so image tags inside them are not found.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = []    # URLs found and not yet taken by the caller
+        self._pictures = 0  # <picture> elements currently open
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'picture':
+            self._pictures += 1
+        elif tag == 'img' or (tag == 'source' and self._pictures):
+            for name, value in attrs:
+                if not value:
+                    continue
+                if name in URL_ATTRIBUTES:
+                    self.found.append(value.strip())
+                elif name in SRCSET_ATTRIBUTES:
+                    self.found.extend(srcset_urls(value))
+
+    def handle_endtag(self, tag):
+        if tag == 'picture' and self._pictures:
+            self._pictures -= 1
+
+def srcset_urls(srcset: str) -> list:
+    """Return the URLs in a srcset such as 'small.jpg 480w, large.jpg 1080w'."""
+    return [candidate.split()[0] for candidate in srcset.split(",") if candidate.strip()]
+
+def extract_stream(chunks):
+    """Feed pieces of a page to an ImageLinkParser, yielding each image URL as soon as its tag has been read."""
+    parser = ImageLinkParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.found
+        parser.found.clear()
+    parser.close()
+    yield from parser.found
+
+EXTRACTORS = {'stream': lambda html: list(extract_stream([html])), 'bs4': extract_bs4, 'regex': extract_regex}
+
+class ImageCache:
+    """
+    On-disk HTTP cache of images, storing each distinct image once.
+
+    The images are kept in 'blobs/' under their SHA-256, and 'index.json' maps each URL to the ETag, Last-Modified
+    date, SHA-256 and size it was last downloaded with. Saved images are hard links to the blobs (or copies, where
+    the output folder is on another file system). The cache is shared by the download threads, so its counters and
+    index are only changed while holding its lock. The index is written by save(), at the end of a run.
+    """
+
+    def __init__(self, folder: str = CACHE_FOLDER):
+        self.folder = folder
+        self.blobs = os.path.join(folder, "blobs")
+        os.makedirs(self.blobs, exist_ok=True)
+        try:
+            with open(os.path.join(folder, CACHE_INDEX), 'r', encoding='utf-8') as file:
+                self._entries = json.load(file)
+        except FileNotFoundError:
+            self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0                # Downloads answered 304 Not Modified
+        self.misses = 0              # Downloads that fetched the image
+        self.bytes_not_downloaded = 0
+        self.duplicates = 0          # Fetched images whose content was already stored
+        self.bytes_deduplicated = 0
+
+    def blob_path(self, digest: str) -> str:
+        """Return where the image with this SHA-256 is stored."""
+        return os.path.join(self.blobs, digest[:2], digest)
+
+    def conditional_headers(self, url: str) -> dict:
+        """Return the headers that ask the server for the image only if it differs from the cached copy."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None or not os.path.exists(self.blob_path(entry['sha256'])):
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def download(self, session, url: str, path: str, max_size: int = MAX_IMAGE_SIZE, retries: int = RETRIES,
+                 manifest: 'DownloadManifest' = None) -> tuple:
+        """
+        Save the image at `url` to `path`, downloading it only if the server's copy differs from the cached one.
+
+        Returns the image's SHA-256 and size. With a `manifest`, an interrupted download resumes where it stopped.
+        """
+        headers = self.conditional_headers(url)
+        # A resumable download needs the same incoming file on every attempt; otherwise any unique name will do
+        incoming_name = hashlib.sha256(url.encode()).hexdigest() if manifest is not None else uuid.uuid4().hex
+        incoming = os.path.join(self.blobs, f"{incoming_name}.incoming")
+        response, digest, size = with_retries(
+            lambda: stream_to_file(session, url, incoming, max_size, headers=headers, manifest=manifest), retries)
+        with self._lock:
+            if digest is None:  # 304 Not Modified
+                entry = self._entries[url]
+                digest, size = entry['sha256'], entry['size']
+                self.hits += 1
+                self.bytes_not_downloaded += entry['size']
+            else:
+                self.misses += 1
+                blob = self.blob_path(digest)
+                if os.path.exists(blob):
+                    os.remove(incoming)
+                    self.duplicates += 1
+                    self.bytes_deduplicated += size
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.replace(incoming, blob)
+                self._entries[url] = {'etag': response.headers.get('ETag'),
+                                      'last_modified': response.headers.get('Last-Modified'),
+                                      'sha256': digest, 'size': size}
+        link_or_copy(self.blob_path(digest), path)
+        return digest, size
+
+    def save(self) -> None:
+        """Write the index, replacing the old one only once the new one is complete."""
+        path = os.path.join(self.folder, CACHE_INDEX)
+        with self._lock:
+            with open(path + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(self._entries, file)
+            os.replace(path + ".tmp", path)
+
+    def report(self) -> str:
+        """Return a summary of how much the cache saved on this run."""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (f"Cache: {self.hits} of {lookups} images not modified ({hit_rate:.0%} hit rate), "
+                f"{self.bytes_not_downloaded / 2**20:.1f} MB not downloaded; {self.duplicates} duplicate images, "
+                f"{self.bytes_deduplicated / 2**20:.1f} MB not stored again")
+
+def link_or_copy(source: str, path: str) -> None:
+    """Make `path` a hard link to `source`, or a copy of it where hard links are not possible, replacing any file."""
+    if os.path.exists(path) and os.path.samefile(source, path):
+        return
+    folder, name = os.path.split(path)
+    partial = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.part")
+    try:
+        os.link(source, partial)
+    except OSError:
+        shutil.copyfile(source, partial)
+    os.replace(partial, path)
+
+class DownloadManifest:
+    """
+    Record of the images downloaded into a folder, kept in an SQLite file there so that a run can be resumed.
+
+    For each image URL it holds the file name given to it, its state, the bytes received, its size and SHA-256 once
+    complete, and the validator (strong ETag or Last-Modified date) of the response its partial file came from. A
+    page whose images have all been recorded is marked scanned, so running the same command again neither fetches
+    the page nor looks at the folder: it asks the manifest for the images not yet done, through an index on their
+    state. An interrupted image continues from the end of its partial file with a Range request, and If-Range makes
+    the server send it whole instead if it has changed since. The download threads share the manifest, so it is
+    only used while holding its lock. Every change is committed at once, to a write-ahead log that is not synced
+    to disk, so the manifest survives the process being killed but not necessarily the machine losing power.
+    """
+
+    PENDING, DONE, FAILED = 0, 1, 2
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, scanned INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY, filename TEXT NOT NULL, state INTEGER NOT NULL, received INTEGER NOT NULL,
+                size INTEGER, sha256 TEXT, validator TEXT);
+            CREATE INDEX IF NOT EXISTS images_by_state ON images (state);
+        """)
+        self._lock = threading.Lock()
+
+    def scanned(self, page: str) -> bool:
+        """Return True if every image on the page has been recorded."""
+        with self._lock:
+            return self.db.execute("SELECT scanned FROM pages WHERE url = ?", (page,)).fetchone() is not None
+
+    def mark_scanned(self, page: str) -> None:
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO pages (url, scanned) VALUES (?, 1)", (page,))
+
+    def add(self, url: str, filename: str) -> tuple:
+        """
+        Record an image to download under `filename`, unless it is recorded already.
+
+        Returns the file name it is recorded under and whether it has been downloaded.
+        """
+        with self._lock:
+            self.db.execute("INSERT OR IGNORE INTO images (url, filename, state, received) VALUES (?, ?, ?, 0)",
+                            (url, filename, self.PENDING))
+            filename, state = self.db.execute("SELECT filename, state FROM images WHERE url = ?", (url,)).fetchone()
+        return filename, state == self.DONE
+
+    def pending(self) -> list:
+        """Return the (URL, file name) of every image recorded but not yet downloaded."""
+        with self._lock:
+            return self.db.execute("SELECT url, filename FROM images WHERE state IN (?, ?)",
+                                   (self.PENDING, self.FAILED)).fetchall()
+
+    def filenames(self) -> set:
+        """Return the file names given to the images so far."""
+        with self._lock:
+            return {filename for (filename,) in self.db.execute("SELECT filename FROM images")}
+
+    def counts(self) -> dict:
+        """Return how many images are in each state."""
+        with self._lock:
+            return dict(self.db.execute("SELECT state, COUNT(*) FROM images GROUP BY state"))
+
+    def resume_point(self, url: str, partial: str) -> tuple:
+        """Return how many bytes of the image are in its partial file and the validator they came with, or (0, None)."""
+        with self._lock:
+            row = self.db.execute("SELECT validator FROM images WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] is None or not os.path.exists(partial):
+            return 0, None
+        return os.path.getsize(partial), row[0]
+
+    def started(self, url: str, validator: str, size: int) -> None:
+        """Record that the image is being downloaded from the start, from a response with this validator and size."""
+        with self._lock:
+            self.db.execute("UPDATE images SET validator = ?, size = ?, received = 0 WHERE url = ?",
+                            (validator, size, url))
+
+    def finished(self, url: str, sha256: str, size: int) -> None:
+        with self._lock:
+            self.db.execute("UPDATE images SET state = ?, received = ?, size = ?, sha256 = ? WHERE url = ?",
+                            (self.DONE, size, size, sha256, url))
+
+    def failed(self, url: str, received: int) -> None:
+        with self._lock:
+            self.db.execute("UPDATE images SET state = ?, received = ? WHERE url = ?", (self.FAILED, received, url))
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+class BloomFilter:
+    """
+    Set of strings that can only answer "maybe seen" or "definitely not seen", in a fixed number of bits.
+
+    It is sized to hold `capacity` strings with a false-positive rate of `error_rate`. Beyond that the rate of false
+    positives rises, but a string that was added is never reported missing.
+    """
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Two 64-bit halves of one hash combine into as many bit positions as needed (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class CrawlFrontier:
+    """
+    The state of a crawl, kept in an SQLite file so that an interrupted crawl can be resumed.
+
+    The pages table holds every page found, with its depth and state, and pages are crawled in the order they were
+    found (breadth first). The images table holds every image found and whether it has been downloaded; images are
+    handed out for download a batch at a time by next_images(), which marks them QUEUED until they finish. Together
+    they are the exact record of the URLs seen. A Bloom filter in front of each answers "seen before?" for most new
+    URLs without a database lookup, and only its "maybe" answers are confirmed against the table. Changes are
+    committed every FRONTIER_COMMIT_EVERY, so a crash repeats at most that much work.
+    """
+
+    PENDING, DONE, FAILED, BLOCKED, QUEUED = 0, 1, 2, 3, 4
+
+    def __init__(self, path: str = FRONTIER_FILE, capacity: int = BLOOM_CAPACITY):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, depth INTEGER NOT NULL, state INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS pages_by_state ON pages (state, id);
+            CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, state INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS images_by_state ON images (state);
+        """)
+        self.release_images()  # Images queued by a crawl that was interrupted are pending again
+        self.seen_pages = BloomFilter(capacity)
+        self.seen_images = BloomFilter(capacity)
+        for (url,) in self.db.execute("SELECT url FROM pages"):
+            self.seen_pages.add(url)
+        for (url,) in self.db.execute("SELECT url FROM images"):
+            self.seen_images.add(url)
+        self.lookups = 0          # URLs checked against the seen-sets
+        self.confirmations = 0    # ...that the Bloom filter could not rule out, so were looked up
+        self.false_positives = 0  # ...and turned out to be new after all
+        self._handed_out = 0      # Pages with lower ids have been returned by next_pages()
+        self._changes = 0
+
+    def add_page(self, url: str, depth: int) -> bool:
+        """Record a page to crawl. Returns False if it has been seen before."""
+        if self._seen(url, self.seen_pages, "SELECT 1 FROM pages WHERE url = ?"):
+            return False
+        self.db.execute("INSERT INTO pages (url, depth, state) VALUES (?, ?, ?)", (url, depth, self.PENDING))
+        self._changed()
+        return True
+
+    def add_image(self, url: str) -> bool:
+        """Record an image to download. Returns False if it has been seen before."""
+        if self._seen(url, self.seen_images, "SELECT 1 FROM images WHERE url = ?"):
+            return False
+        self.db.execute("INSERT INTO images (url, state) VALUES (?, ?)", (url, self.PENDING))
+        self._changed()
+        return True
+
+    def next_pages(self, limit: int) -> list:
+        """Return up to `limit` (id, url, depth) of pages to crawl that have not been handed out yet."""
+        rows = self.db.execute("SELECT id, url, depth FROM pages WHERE state = ? AND id > ? ORDER BY id LIMIT ?",
+                               (self.PENDING, self._handed_out, limit)).fetchall()
+        if rows:
+            self._handed_out = rows[-1][0]
+        return rows
+
+    def next_images(self, limit: int) -> list:
+        """Return up to `limit` images found but not yet downloaded or queued, and mark them QUEUED."""
+        urls = [url for (url,) in self.db.execute("SELECT url FROM images WHERE state = ? LIMIT ?",
+                                                  (self.PENDING, limit))]
+        self.db.executemany("UPDATE images SET state = ? WHERE url = ?", ((self.QUEUED, url) for url in urls))
+        return urls
+
+    def release_images(self) -> None:
+        """Return images that were queued but never finished to PENDING, so they are downloaded next time."""
+        self.db.execute("UPDATE images SET state = ? WHERE state = ?", (self.PENDING, self.QUEUED))
+        self.db.commit()
+
+    def finish_page(self, page_id: int, state: int) -> None:
+        self.db.execute("UPDATE pages SET state = ? WHERE id = ?", (state, page_id))
+        self._changed()
+
+    def finish_image(self, url: str, state: int) -> None:
+        self.db.execute("UPDATE images SET state = ? WHERE url = ?", (state, url))
+        self._changed()
+
+    def counts(self, table: str) -> dict:
+        """Return how many pages or images are in each state."""
+        return dict(self.db.execute(f"SELECT state, COUNT(*) FROM {table} GROUP BY state"))
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+    def _seen(self, url, bloom, query):
+        self.lookups += 1
+        if url not in bloom:
+            bloom.add(url)
+            return False
+        self.confirmations += 1
+        if self.db.execute(query, (url,)).fetchone():
+            return True
+        self.false_positives += 1
+        return False
+
+    def _changed(self):
+        self._changes += 1
+        if self._changes >= FRONTIER_COMMIT_EVERY:
+            self.db.commit()
+            self._changes = 0
+
+class RobotsRules:
+    """The robots.txt rules of each host, fetched the first time one of its pages is crawled."""
+
+    def __init__(self, session, user_agent: str = USER_AGENT):
+        self.session = session
+        self.user_agent = user_agent
+        self._rules = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, url: str) -> bool:
+        """Return True if robots.txt lets this crawler fetch the URL."""
+        return self._for(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> float:
+        """Return the seconds robots.txt asks this crawler to leave between requests to the URL's host, or 0."""
+        return float(self._for(url).crawl_delay(self.user_agent) or 0)
+
+    def _for(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            lock = self._locks.setdefault(origin, threading.Lock())
+        with lock:  # Fetch each host's robots.txt once, even when several threads ask at the same time
+            if origin not in self._rules:
+                self._rules[origin] = self._fetch(origin)
+        return self._rules[origin]
+
+    def _fetch(self, origin):
+        rules = RobotFileParser(origin + "/robots.txt")
+        try:
+            response = self.session.get(origin + "/robots.txt", timeout=TIMEOUT)
+        except requests.RequestException:
+            rules.allow_all = True
+            return rules
+        if response.status_code in (401, 403):
+            rules.disallow_all = True
+        elif not response.ok:
+            rules.allow_all = True  # No robots.txt means no rules
+        else:
+            rules.parse(response.text.splitlines())
+        return rules
+
+class HostRateLimiter:
+    """Spaces out requests to each host by at least `interval` seconds, whichever threads make them."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = {}  # Host -> earliest time of its next request
+        self._lock = threading.Lock()
+
+    def wait(self, url: str, interval: float = 0) -> None:
+        """Wait for the URL's host's next turn, at least max(`interval`, self.interval) after its last one."""
+        interval = max(interval, self.interval)
+        if interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            turn = max(now, self._next.get(host, 0))
+            self._next[host] = turn + interval
+        if turn > now:
+            time.sleep(turn - now)
+
+class PageParser(ImageLinkParser):
+    """ImageLinkParser that also collects the links to other pages, from <a href> and <area href>."""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('a', 'area'):
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href.strip())
+        else:
+            super().handle_starttag(tag, attrs)
+
+def make_session(per_host: int = CONNECTIONS_PER_HOST) -> requests.Session:
+    """
+    Return a session whose connection pool keeps up to `per_host` keep-alive connections to each host.
+
+    The pool blocks when all of a host's connections are busy, so this is also the most requests in flight to any
+    one host. The session is shared by the download threads; only its connection pool, which is thread-safe, is
+    changed while downloading.
+    """
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    adapter = HTTPAdapter(pool_connections=HOST_POOLS, pool_maxsize=per_host, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def retryable(error: requests.RequestException) -> bool:
+    """Return True if a request that failed with this error is worth trying again."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                              IncompleteDownloadError))
+
+def with_retries(operation, retries: int = RETRIES, backoff: float = BACKOFF):
+    """Call operation() and return its result, retrying it after retryable errors. Raises the last error."""
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except requests.RequestException as error:
+            if attempt == retries or not retryable(error):
+                raise
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.0))  # Jitter stops retries arriving together
+
+def fetch(session, url: str, timeout=TIMEOUT, retries: int = RETRIES, stream: bool = False):
+    """GET a URL, retrying connection errors, timeouts and retryable statuses. With `stream`, the body is not read."""
+    def get():
+        response = session.get(url, timeout=timeout, stream=stream)
+        if not response.ok:
+            response.content  # Read the error page, so that the connection can be reused
+            response.raise_for_status()
+        return response
+    return with_retries(get, retries)
+
+def page_image_urls(session, url: str, parser: str = 'stream', retries: int = RETRIES):
+    """
+    Yield the absolute URL of each image on a webpage, once each.
+
+    The 'stream' parser yields them while the page is still arriving; the others only once all of it has been read.
+    Only http and https URLs are yielded, which leaves out images embedded in the page as data: URLs.
+    """
+    with fetch(session, url, retries=retries, stream=True) as response:
+        if parser == 'stream':
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            sources = extract_stream(response.iter_content(CHUNK_SIZE, decode_unicode=True))
+        else:
+            sources = EXTRACTORS[parser](response.text)
+        seen = set()
+        for src in sources:
+            img_url = urljoin(response.url, src)
+            if img_url not in seen and urlsplit(img_url).scheme in ('http', 'https'):
+                seen.add(img_url)
+                yield img_url
+
+def resume_validator(response) -> str:
+    """Return the validator If-Range can resume this response's body with (a strong ETag or Last-Modified), or None."""
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None  # A Range would count bytes of the encoded body, not of the file
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def stream_to_file(session, url: str, path: str, max_size: int = MAX_IMAGE_SIZE, timeout=TIMEOUT,
+                   headers: dict = None, manifest: DownloadManifest = None) -> tuple:
+    """
+    Download a URL to a file a chunk at a time. Returns the response, the SHA-256 of the file and its size in bytes.
+
+    The body goes to a temporary file beside `path`, which replaces `path` only once every byte has arrived, so
+    `path` never holds part of an image. Raises ImageTooLargeError once more than `max_size` bytes are announced or
+    received, and IncompleteDownloadError if the connection delivers fewer bytes than its Content-Length. If the
+    `headers` make the request conditional and the server answers 304 Not Modified, `path` is left alone and the
+    SHA-256 returned is None. With a `manifest`, the temporary file is a partial file ('.NAME.part') that is kept if
+    the download fails partway, and the next attempt asks the server for just the rest of it.
+    """
+    folder, name = os.path.split(path)
+    offset = 0
+    validator = None
+    if manifest is not None:
+        partial = os.path.join(folder, f".{name}.part")
+        offset, validator = manifest.resume_point(url, partial)
+        if offset:
+            headers = {**(headers or {}), 'Range': f"bytes={offset}-", 'If-Range': validator,
+                       'Accept-Encoding': 'identity'}
+    with session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+        if offset and response.status_code in (206, 416) and not response.headers.get(
+                'Content-Range', '').startswith(f"bytes {offset}-"):
+            response.content
+            os.remove(partial)  # It does not fit the image as it is now, so start again on the next attempt
+            raise IncompleteDownloadError(f"{url} could not be resumed from byte {offset:,}")
+        if response.status_code == 304 or not response.ok:
+            response.content  # Read the (empty or error) body, so that the connection can be reused
+            response.raise_for_status()
+            return response, None, 0
+        if response.status_code != 206:
+            offset = 0  # The server sent the whole image: it has changed, or does not support Range
+        length = response.headers.get('Content-Length', '')
+        expected = int(length) if length.isdigit() else None
+        if max_size is not None and expected is not None and offset + expected > max_size:
+            raise ImageTooLargeError(f"{url} is {offset + expected:,} bytes, more than the {max_size:,} allowed")
+
+        if manifest is None:
+            descriptor, partial = tempfile.mkstemp(dir=folder or ".", prefix=f".{name}.", suffix=".part")
+            file = os.fdopen(descriptor, 'wb')
+        else:
+            if not offset:
+                validator = resume_validator(response)
+                manifest.started(url, validator, expected)
+            file = open(partial, 'ab' if offset else 'wb')
+        size = offset
+        try:
+            digest = hashlib.sha256()
+            with file:
+                if offset:
+                    with open(partial, 'rb') as kept:
+                        for chunk in iter(lambda: kept.read(CHUNK_SIZE), b""):
+                            digest.update(chunk)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise ImageTooLargeError(f"{url} is more than the {max_size:,} bytes allowed")
+                    digest.update(chunk)
+                    file.write(chunk)
+            # Content-Length counts the bytes on the wire, which differ from `size` if the body was compressed
+            received = response.raw.tell()
+            if expected is not None and received != expected:
+                raise IncompleteDownloadError(f"{url} sent {received:,} of {expected:,} bytes")
+            os.replace(partial, path)
+        except BaseException as error:
+            if manifest is None or validator is None or isinstance(error, ImageTooLargeError):
+                os.remove(partial)
+                size = 0
+            if manifest is not None:
+                manifest.failed(url, size)
+            raise
+    return response, digest.hexdigest(), size
+
+def unique_filename(img_url: str, taken: set) -> str:
+    """Give an image URL a file name from its path that is not in `taken`, adding a number if need be, and take it."""
+    base = os.path.basename(urlsplit(img_url).path) or "image"
+    stem, extension = os.path.splitext(base)
+    name, number = base, 1
+    while name in taken:
+        number += 1
+        name = f"{stem}-{number}{extension}"
+    taken.add(name)
+    return name
+
+def downloaded_bytes(results: dict, *args, **kwargs) -> int:
+    """Return the bytes of the images download_images() saved, for its instrumentation."""
+    return sum(os.path.getsize(path) for path in results.values() if isinstance(path, str) and os.path.exists(path))
+
+@instrumentation.timed(name="downloader.download_images", bytes_of=downloaded_bytes)
+def download_images(url, folder_name, parser: str = 'stream', workers: int = WORKERS, session=None,
+                    retries: int = RETRIES, max_size: int = MAX_IMAGE_SIZE, cache: ImageCache = None,
+                    manifest: DownloadManifest = None, rescan: bool = False) -> dict:
+    """
+    Download all images from a webpage into a folder, several at a time.
+
+    Each image is queued for download as soon as the parser finds it. With a `manifest`, images downloaded by an
+    earlier run are skipped, and if an earlier run found every image on the page, the page is not fetched again
+    (unless `rescan`): only the images the manifest has not marked done are downloaded. Returns a dictionary mapping
+    each image URL downloaded on this run to the path it was saved to, or to the exception that stopped it.
+    """
+    session = session or make_session()
+    os.makedirs(folder_name, exist_ok=True)
+    results = {}
+    futures = {}
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(img_url, filename):
+            futures[executor.submit(download_image, img_url, folder_name, session, filename, retries, max_size,
+                                    cache, manifest)] = img_url
+
+        if manifest is not None and not rescan and manifest.scanned(url):
+            pending = manifest.pending()
+            print(f"Resuming: {len(pending)} images left to download into {folder_name} "
+                  f"(use --rescan to read the page again)")
+            for img_url, filename in pending:
+                submit(img_url, filename)
+        else:
+            taken = manifest.filenames() if manifest is not None else set()
+            skipped = 0
+            for img_url in page_image_urls(session, url, parser, retries):
+                filename = unique_filename(img_url, taken)
+                if manifest is not None:
+                    filename, done = manifest.add(img_url, filename)
+                    if done:
+                        skipped += 1
+                        continue
+                submit(img_url, filename)
+            if manifest is not None:
+                manifest.mark_scanned(url)
+            if skipped:
+                print(f"Skipping {skipped} images downloaded by an earlier run")
+        if not futures:
+            print("No images found on the page." if manifest is None else "No images left to download.")
+            return {}
+        for future in concurrent.futures.as_completed(futures):
+            img_url = futures[future]
+            try:
+                results[img_url] = future.result()
+            except (requests.RequestException, OSError) as error:
+                results[img_url] = error
+                print(f"Failed to download {img_url}: {error}")
+    downloaded = sum(isinstance(result, str) for result in results.values())
+    print(f"Downloaded {downloaded} of {len(futures)} images in {time.perf_counter() - start:.2f} s")
+    if cache is not None:
+        cache.save()
+        print(cache.report())
+    return results
+
+@instrumentation.timed(name="downloader.download_image", bytes_of=instrumentation.result_size)
+def download_image(img_url, folder_name, session=None, filename: str = None, retries: int = RETRIES,
+                   max_size: int = MAX_IMAGE_SIZE, cache: ImageCache = None, manifest: DownloadManifest = None) -> str:
+    """
+    Download a single image into a folder, streaming it to disk, and return the path it was saved to.
+
+    With a `manifest`, a download interrupted partway resumes where it stopped, and the image is recorded as done.
+    """
+    path = os.path.join(folder_name, filename or os.path.basename(urlsplit(img_url).path) or "image")
+    if cache is not None:
+        digest, size = cache.download(session or requests, img_url, path, max_size, retries, manifest)
+    else:
+        _, digest, size = with_retries(
+            lambda: stream_to_file(session or requests, img_url, path, max_size, manifest=manifest), retries)
+    if manifest is not None:
+        manifest.finished(img_url, digest, size)
+    return path
+
+def crawl_page(session, url: str, robots: RobotsRules, limiter: HostRateLimiter, retries: int = RETRIES):
+    """
+    Fetch one page of a crawl. Returns the absolute URLs of the pages it links to and of the images on it.
+
+    Returns None if robots.txt does not allow the page. A page that is not HTML has no links or images.
+    """
+    if not robots.allowed(url):
+        return None
+    limiter.wait(url, robots.crawl_delay(url))
+    parser = PageParser()
+    with fetch(session, url, retries=retries, stream=True) as response:
+        if 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return [], []
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        for chunk in response.iter_content(CHUNK_SIZE, decode_unicode=True):
+            parser.feed(chunk)
+        parser.close()
+        base = response.url
+    links = [urldefrag(urljoin(base, href))[0] for href in parser.links]
+    images = [urljoin(base, src) for src in parser.found]
+    return ([link for link in links if urlsplit(link).scheme in ('http', 'https')],
+            [image for image in images if urlsplit(image).scheme in ('http', 'https')])
+
+def in_domains(url: str, domains) -> bool:
+    """Return True if the URL's host is one of the domains or a subdomain of one."""
+    host = urlsplit(url).hostname or ""
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+def crawl_path(folder_name: str, img_url: str) -> tuple:
+    """
+    Return the folder and file name a crawled image is saved under: its host and path, mirrored below `folder_name`.
+
+    Images whose URLs differ only in their query string get the query's hash added to their name.
+    """
+    parts = urlsplit(img_url)
+    directory, name = posixpath.split(parts.path)
+    name = name or "image"
+    if parts.query:
+        stem, extension = os.path.splitext(name)
+        name = f"{stem}-{hashlib.sha1(parts.query.encode()).hexdigest()[:8]}{extension}"
+    segments = [segment for segment in directory.split("/") if segment not in ("", ".", "..")]
+    return os.path.join(folder_name, parts.netloc.replace(":", "_"), *segments), name
+
+def crawl(start_url, folder_name, frontier_path: str = FRONTIER_FILE, max_depth: int = MAX_DEPTH,
+          max_pages: int = None, domains=None, page_workers: int = PAGE_WORKERS, workers: int = WORKERS,
+          rate: float = PAGES_PER_SECOND, session=None, retries: int = RETRIES, max_size: int = MAX_IMAGE_SIZE,
+          cache: ImageCache = None) -> dict:
+    """
+    Crawl a site from `start_url`, downloading the images on every page reached into `folder_name`.
+
+    Pages are fetched by `page_workers` threads, and the images found on them are handed to download_image(), run
+    by `workers` more threads. Only pages on `domains` (by default the start URL's host) and at most `max_depth`
+    links from the start are crawled, and at most `rate` pages a second are fetched from any one host. The crawl is
+    recorded in the frontier file as it goes, and running it again with the same file carries on where it stopped.
+    A single thread (the caller's) hands out the work and updates the frontier, so the frontier needs no lock.
+    Returns the number of pages and images in each state.
+    """
+    session = session or make_session()
+    domains = domains or [urlsplit(start_url).hostname]
+    robots = RobotsRules(session)
+    limiter = HostRateLimiter(1 / rate if rate else 0)
+    frontier = CrawlFrontier(frontier_path)
+    if not frontier.add_page(start_url, 0):
+        pages = frontier.counts("pages")
+        print(f"Resuming the crawl in {frontier_path}: {sum(pages.values()) - pages.get(frontier.PENDING, 0)} "
+              f"pages crawled, {pages.get(frontier.PENDING, 0)} to go")
+    crawled = sum(count for state, count in frontier.counts("pages").items() if state != frontier.PENDING)
+
+    page_pool = concurrent.futures.ThreadPoolExecutor(page_workers)
+    image_pool = concurrent.futures.ThreadPoolExecutor(workers)
+    page_futures = {}
+    image_futures = {}
+
+    def queue_image(img_url):
+        directory, name = crawl_path(folder_name, img_url)
+        os.makedirs(directory, exist_ok=True)
+        future = image_pool.submit(download_image, img_url, directory, session, name, retries, max_size, cache)
+        image_futures[future] = img_url
+
+    start = time.perf_counter()
+    try:
+        while True:
+            # Images wait in the frontier (including any left by an interrupted crawl) until there is room for them
+            backlog = workers * IMAGE_BACKLOG - len(image_futures)
+            if backlog > 0:
+                for img_url in frontier.next_images(backlog):
+                    queue_image(img_url)
+            # Fetch no more pages while the image downloads are far behind, so their queue stays bounded
+            wanted = page_workers - len(page_futures)
+            if max_pages is not None:
+                wanted = min(wanted, max_pages - crawled)
+            if wanted > 0 and len(image_futures) < workers * IMAGE_BACKLOG:
+                for page_id, url, depth in frontier.next_pages(wanted):
+                    page_futures[page_pool.submit(crawl_page, session, url, robots, limiter, retries)] = \
+                        (page_id, url, depth)
+                    crawled += 1
+            if not page_futures and not image_futures:
+                break  # Nothing in flight, and next_images() found nothing pending
+            done, _ = concurrent.futures.wait([*page_futures, *image_futures],
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future in image_futures:
+                    failed = future.exception() is not None
+                    frontier.finish_image(image_futures.pop(future), frontier.FAILED if failed else frontier.DONE)
+                    continue
+                page_id, url, depth = page_futures.pop(future)
+                try:
+                    result = future.result()
+                except (requests.RequestException, OSError) as error:
+                    print(f"Failed to crawl {url}: {error}")
+                    frontier.finish_page(page_id, frontier.FAILED)
+                    continue
+                if result is None:
+                    frontier.finish_page(page_id, frontier.BLOCKED)
+                    continue
+                links, images = result
+                if depth < max_depth:
+                    for link in links:
+                        if in_domains(link, domains):
+                            frontier.add_page(link, depth + 1)
+                for img_url in images:
+                    frontier.add_image(img_url)  # Queued for download by next_images()
+                frontier.finish_page(page_id, frontier.DONE)
+    finally:
+        # Images still queued stay pending in the frontier, to be downloaded when the crawl is resumed
+        page_pool.shutdown(cancel_futures=True)
+        image_pool.shutdown(cancel_futures=True)
+        frontier.release_images()
+        pages, images = frontier.counts("pages"), frontier.counts("images")
+        print(f"Crawled {pages.get(frontier.DONE, 0)} pages ({pages.get(frontier.FAILED, 0)} failed, "
+              f"{pages.get(frontier.BLOCKED, 0)} blocked by robots.txt, {pages.get(frontier.PENDING, 0)} to go) and "
+              f"downloaded {images.get(frontier.DONE, 0)} images ({images.get(frontier.FAILED, 0)} failed) in "
+              f"{time.perf_counter() - start:.2f} s")
+        print(f"Seen-set: {frontier.lookups} lookups, {frontier.confirmations} checked in the frontier file, "
+              f"{frontier.false_positives} Bloom filter false positives")
+        frontier.close()
+        if cache is not None:
+            cache.save()
+            print(cache.report())
+    return {'pages': pages, 'images': images}
+
+def main() -> int:
+    """Main function to run the image downloader script. Returns 1 if the page could not be fetched."""
+    parser = argparse.ArgumentParser(description="Download every image on a webpage.")
+    parser.add_argument("url", help="webpage to download the images from")
+    parser.add_argument("--folder", default=FOLDER_NAME, help=f"folder to save them in (default: {FOLDER_NAME})")
+    parser.add_argument("--parser", choices=sorted(EXTRACTORS), default='stream', help="how to find the images")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="downloads in progress at once")
+    parser.add_argument("--per-host", type=int, default=CONNECTIONS_PER_HOST, help="connections to each host")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="retries after a failed request")
+    parser.add_argument("--max-size", type=float, default=MAX_IMAGE_SIZE / 2**20,
+                        help="largest image to download, in MB")
+    parser.add_argument("--cache", default=CACHE_FOLDER, help=f"folder to cache images in (default: {CACHE_FOLDER})")
+    parser.add_argument("--no-cache", action="store_true", help="download every image afresh, without a cache")
+    parser.add_argument("--rescan", action="store_true",
+                        help="read the page again, even if an earlier run found all its images")
+    parser.add_argument("--crawl", action="store_true", help="also download the images on the pages linked to")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="links to follow away from the URL")
+    parser.add_argument("--max-pages", type=int, help="pages to crawl in total")
+    parser.add_argument("--domain", action="append", help="domain to crawl (default: the URL's host); repeatable")
+    parser.add_argument("--rate", type=float, default=PAGES_PER_SECOND, help="pages a second from each host")
+    parser.add_argument("--page-workers", type=int, default=PAGE_WORKERS, help="pages fetched at once")
+    parser.add_argument("--frontier", default=FRONTIER_FILE,
+                        help=f"file recording the crawl so it can be resumed (default: {FRONTIER_FILE})")
+    args = parser.parse_args()
+    if args.parser == 'bs4':
+        try:
+            load_bs4()
+        except ImportError:
+            parser.error("--parser bs4 needs BeautifulSoup (pip install beautifulsoup4)")
+
+    cache = None if args.no_cache else ImageCache(args.cache)
+    session = make_session(args.per_host)
+    try:
+        if args.crawl:
+            crawl(args.url, args.folder, args.frontier, args.max_depth, args.max_pages, args.domain,
+                  args.page_workers, args.workers, args.rate, session, args.retries, int(args.max_size * 2**20),
+                  cache)
+        else:
+            os.makedirs(args.folder, exist_ok=True)
+            manifest = DownloadManifest(os.path.join(args.folder, MANIFEST_FILE))
+            try:
+                download_images(args.url, args.folder, args.parser, args.workers, session, args.retries,
+                                int(args.max_size * 2**20), cache, manifest, args.rescan)
+            finally:
+                manifest.close()
+    except requests.RequestException as error:
+        print(f"Failed to fetch {args.url}: {error}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
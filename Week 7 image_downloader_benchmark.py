@@ -0,0 +1,720 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Image Downloader Benchmark
+
+This script measures 'Week 7 image_downloader.py' against a local site served by http.server on a free port, so no
+real website is contacted. Everything is downloaded into temporary folders.
+
+Benchmarks:
+- concurrency: The site has one page with many images (500 by default). Each image is answered after a delay: most
+  are quick, but a few take up to a second. A few images fail with 503 the first time they are asked for, to
+  exercise the retries, and one image is missing altogether. Each run downloads the page, checks every saved image
+  against what the server sent, and reports the time taken next to the slowest single fetch (the least any run can
+  take). It also reports how many connections the server accepted, which shows keep-alive connections being reused.
+  The first run downloads one image at a time, as the skeletons do.
+- memory: Several very large images (300 MB each by default) are downloaded at once in a fresh process, and the
+  process's peak resident memory (RSS) is reported. This compares holding each response in memory, as the skeletons'
+  response.content does, with streaming it to disk. It also checks that a download cut short of its Content-Length
+  and one over the maximum size are both rejected without leaving a file behind.
+- cache: A gallery page shows the images plus copies of some of them under other URLs. It is downloaded three times
+  with one cache: into a new folder, into the same folder again, and into another folder. Each run reports the
+  bytes the server sent, the cache hit rate, the duplicates found, and the disk space taken by the cache and output
+  folders together, counting hard links once.
+- resume: A page of the large images is downloaded by the script in a child process, which is killed once half the
+  bytes have arrived, then run again. This reports the bytes the second run asked the server for (the rest, if the
+  partial files were resumed with Range requests) and checks every image against its SHA-256. A partial file left
+  from an image that has since changed is then resumed, to check that If-Range makes the server send it whole.
+  Finally the page of small images is downloaded without retries, so a few fail, and downloaded again several
+  times. Each re-run reports its time and the requests it made: with the manifest, only the images still missing
+  are asked for, and the page itself only with --rescan.
+- parsers: Large HTML files (4 MB each by default) are saved in three styles: plain <img src> tags; responsive
+  images using srcset, <picture><source> and lazy-loading data-src; and messy markup with upper-case tags, unquoted
+  and single-quoted attributes, and image tags inside comments and scripts that are not real images. Each file is
+  parsed by all three extractors, and their throughput, peak Python memory (from tracemalloc, including the page
+  text the BeautifulSoup and regex extractors need whole) and recall and precision against the images really in
+  the file are reported. The streaming extractor is fed the file a chunk at a time, as it would be from the network.
+- crawl: A site of many linked pages (100,000 by default) is crawled in a fresh process, in two runs: the first stops
+  halfway, and the second resumes from the frontier file. Every page links to several others, including ones
+  already seen, a page robots.txt disallows and a page on another site, and all pages share a few images. Each run
+  reports its pages per second and peak resident memory. The site's request counts then show whether every page
+  was fetched exactly once, every image downloaded once, and no disallowed or external page fetched. Finally a short
+  crawl with a rate limit checks that pages are fetched no faster than the limit.
+
+Usage:
+    python "Week 7 image_downloader_benchmark.py" [concurrency] [memory] [cache] [resume] [parsers] [crawl]
+        [--images 500] [--size 20000] [--workers 1 32 64] [--big-files 3] [--big-size 300] [--copies 100]
+        [--html-size 4] [--pages 100000]
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import importlib.util
+import io
+import os
+import multiprocessing
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DOWNLOADER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Week 7 image_downloader.py")
+SLOW_FRACTION = 0.05     # Images that take 0.5-1 s; the rest take 5-25 ms
+FLAKY_FRACTION = 0.02    # Images answered with 503 the first time
+BLOCK_SIZE = 2**20       # Bytes the site sends of a large image at a time
+LAST_MODIFIED = "Mon, 05 May 2025 10:00:00 GMT"
+FANOUT = 4               # Pages each page of the crawl site links down to
+POLITE_RATE = 20.0       # Pages a second the politeness check allows
+CRAWL_IMAGES = 200       # Images the crawl site's pages share
+BIG_ETAG = '"big"'        # ETag of the large images, which all have the same content
+BENCHMARKS = ["concurrency", "memory", "cache", "resume", "parsers", "crawl"]
+HTML_STYLES = ["plain", "responsive", "messy"]
+
+def load_downloader():
+    """Import the downloader script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("image_downloader", DOWNLOADER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["image_downloader"] = module
+    spec.loader.exec_module(module)
+    return module
+
+class ImageSite:
+    """
+    A local website served from a background thread.
+
+    '/page.html' shows `images` images of `size` bytes. '/big/N.bin' is a large image of `big_size` bytes, sent a
+    block at a time so the server never holds it whole, and '/short/N.bin' promises as many bytes but sends only half.
+    Large images answer Range requests whose If-Range matches their ETag, and '/bigpage.html' shows `big_files` of
+    them.
+    '/gallery.html' shows the same images followed by `copies` of them under other URLs ('/copy/N.png'). Images are
+    sent with an ETag and Last-Modified date, and answered 304 Not Modified when the ETag is sent back.
+    """
+
+    def __init__(self, images: int, size: int, big_size: int = 0, copies: int = 0, big_files: int = 0,
+                 seed: int = 0):
+        rng = random.Random(seed)
+        self.images = images
+        self.size = size
+        self.big_size = big_size
+        self.big_files = big_files
+        self.copies = copies
+        self.delays = [rng.uniform(0.5, 1.0) if rng.random() < SLOW_FRACTION else rng.uniform(0.005, 0.025)
+                       for _ in range(images)]
+        self.flaky = set(rng.sample(range(images), int(images * FLAKY_FRACTION)))
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._failed = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/page.html"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def image(self, number: int) -> bytes:
+        """Return the content of an image."""
+        return (b"image %d " % number * self.size)[:self.size]
+
+    def big_block(self) -> bytes:
+        """Return the block that large images repeat."""
+        return bytes(range(256)) * (BLOCK_SIZE // 256)
+
+    def big_url(self, number: int, short: bool = False) -> str:
+        """Return the URL of a large image, or of one that is cut off halfway."""
+        return self.url.replace("/page.html", f"/{'short' if short else 'big'}/{number}.bin")
+
+    def big_page(self) -> bytes:
+        """Return a page showing the large images."""
+        tags = "".join(f'<img src="big/{number}.bin">\n' for number in range(self.big_files))
+        return f'<html><body>\n{tags}</body></html>\n'.encode()
+
+    def page(self, copies: int = 0) -> bytes:
+        """Return a page with every image, then `copies` of them under other URLs, then one that does not exist."""
+        tags = "".join(f'<p><img src="img/{i}.png" alt="Image {i}"></p>\n' for i in range(self.images))
+        tags += "".join(f'<p><img src="copy/{i % self.images}.png"></p>\n' for i in range(copies))
+        return f'<html><body>\n{tags}<img src="img/missing.png">\n</body></html>\n'.encode()
+
+    def reset(self, failures: bool = True) -> None:
+        """Forget the counts of the previous run and, unless told not to, which flaky images have failed."""
+        with self._lock:
+            self.connections = self.requests = self.bytes_sent = 0
+            if failures:
+                self._failed.clear()
+
+    def handler(self):
+        """Return a request handler class that serves this site."""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep connections alive between requests
+            disable_nagle_algorithm = True  # Headers and body are written separately; send both at once
+
+            def setup(self):
+                super().setup()
+                with site._lock:
+                    site.connections += 1
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                if self.path == "/page.html":
+                    return self.send(200, site.page())
+                if self.path == "/gallery.html":
+                    return self.send(200, site.page(site.copies))
+                if self.path == "/bigpage.html":
+                    return self.send(200, site.big_page())
+                if self.path.startswith(("/big/", "/short/")):
+                    return self.send_big(self.path.startswith("/short/"))
+                name = self.path.rpartition("/")[2]
+                number = name.partition(".")[0]
+                if not number.isdigit() or int(number) >= site.images:
+                    return self.send(404, b"Not found")
+                number = int(number)
+                etag = f'"{number}"'  # Copies share their original's content, so they share its ETag too
+                if self.headers.get("If-None-Match") == etag:
+                    return self.send(304, b"", etag)
+                if self.path.startswith("/copy/"):
+                    return self.send(200, site.image(number), etag)
+                time.sleep(site.delays[number])
+                with site._lock:
+                    fail = number in site.flaky and number not in site._failed
+                    site._failed.add(number)
+                if fail:
+                    return self.send(503, b"Try again")
+                self.send(200, site.image(number), etag)
+
+            def send(self, status, body, etag=None):
+                self.send_response(status)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", LAST_MODIFIED)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with site._lock:
+                    site.bytes_sent += len(body)
+
+            def send_big(self, short):
+                start = 0
+                requested = self.headers.get("Range", "")
+                if (not short and requested.startswith("bytes=") and requested.endswith("-")
+                        and self.headers.get("If-Range", BIG_ETAG) == BIG_ETAG):
+                    start = int(requested[len("bytes="):-1])
+                    if start >= site.big_size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{site.big_size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                self.send_response(206 if start else 200)
+                self.send_header("ETag", BIG_ETAG)
+                self.send_header("Accept-Ranges", "bytes")
+                if start:
+                    self.send_header("Content-Range", f"bytes {start}-{site.big_size - 1}/{site.big_size}")
+                self.send_header("Content-Length", str(site.big_size - start))
+                self.end_headers()
+                block = site.big_block()
+                block = block[start % len(block):] + block[:start % len(block)]  # Large images repeat the block
+                remaining = site.big_size // 2 if short else site.big_size - start
+                try:
+                    while remaining > 0:
+                        self.wfile.write(block[:remaining])
+                        with site._lock:
+                            site.bytes_sent += min(remaining, len(block))
+                        remaining -= len(block)
+                except ConnectionError:  # The downloader gave up on the image
+                    self.close_connection = True
+                    return
+                if short:
+                    self.close_connection = True  # Hang up early, as a failing server would
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+def bench_download(downloader, site: ImageSite, workers: int, per_host: int) -> None:
+    """Download the site's page once and report the time, connections and whether every image is intact."""
+    site.reset()
+    with tempfile.TemporaryDirectory() as folder:
+        session = downloader.make_session(per_host)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Hide the downloader's own messages
+            results = downloader.download_images(site.url, folder, workers=workers, session=session)
+        elapsed = time.perf_counter() - start
+        session.close()
+
+        saved = 0
+        intact = True
+        for img_url, result in results.items():
+            number = img_url.rpartition("/")[2].partition(".")[0]
+            if isinstance(result, str):
+                saved += 1
+                with open(result, 'rb') as file:
+                    intact = intact and number.isdigit() and file.read() == site.image(int(number))
+            elif number.isdigit():
+                intact = False  # Only the missing image should have failed
+
+    label = "sequential" if workers == 1 else f"{workers} workers"
+    print(f"{label:>12} {per_host:>9} {elapsed:>9.2f} s {max(site.delays):>9.2f} s {saved:>7} "
+          f"{site.connections:>12} {site.requests:>9}  {'OK' if intact else 'MISMATCH'}")
+
+def download_buffered(url: str, folder: str, session) -> str:
+    """Download a URL the way the skeletons do, holding the whole response in memory before writing it."""
+    response = session.get(url)
+    response.raise_for_status()
+    path = os.path.join(folder, os.path.basename(url))
+    with open(path, 'wb') as file:
+        file.write(response.content)
+    return path
+
+def peak_rss(urls: list, folder: str, streaming: bool, max_size: int) -> tuple:
+    """
+    Download URLs at once in this process and return its resident memory before and at peak, in MB.
+
+    Run in a fresh process, so the peak belongs to these downloads alone. ru_maxrss is in KB on Linux.
+    """
+    import resource
+    downloader = load_downloader()
+    session = downloader.make_session(len(urls))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        if streaming:
+            paths = list(executor.map(lambda url: downloader.download_image(url, folder, session, max_size=max_size),
+                                      urls))
+        else:
+            paths = list(executor.map(lambda url: download_buffered(url, folder, session), urls))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return before, peak, [os.path.getsize(path) for path in paths]
+
+def bench_memory(downloader, site: ImageSite, files: int) -> None:
+    """Report the peak memory of downloading large images buffered and streamed, and check rejected downloads."""
+    urls = [site.big_url(number) for number in range(files)]
+    total = files * site.big_size
+    print(f"Memory: {files} images of {site.big_size / 2**20:,.0f} MB downloaded at once ({total / 2**20:,.0f} MB)")
+    print(f"{'download':>12} {'time':>11} {'RSS before':>13} {'peak RSS':>12}")
+    context = multiprocessing.get_context("spawn")  # A fresh interpreter, not a copy of this one
+    for label, streaming in (("buffered", False), ("streaming", True)):
+        with tempfile.TemporaryDirectory() as folder:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                start = time.perf_counter()
+                before, peak, sizes = executor.submit(peak_rss, urls, folder, streaming, total).result()
+                elapsed = time.perf_counter() - start
+        intact = sizes == [site.big_size] * files
+        print(f"{label:>12} {elapsed:>9.2f} s {before:>10.1f} MB {peak:>9.1f} MB  {'OK' if intact else 'MISMATCH'}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        session = downloader.make_session()
+        for label, url, max_size in (("Cut short", site.big_url(0, short=True), site.big_size),
+                                     ("Too large", site.big_url(0), site.big_size // 2)):
+            try:
+                downloader.download_image(url, folder, session, retries=0, max_size=max_size)
+                outcome = "accepted (WRONG)"
+            except downloader.requests.RequestException as error:
+                outcome = f"rejected with {type(error).__name__}"
+            print(f"{label}: {outcome}; files left behind: {len(os.listdir(folder))}")
+        session.close()
+    print()
+
+def disk_usage(*folders) -> int:
+    """Return the bytes taken by the files in some folders, counting hard-linked files once."""
+    seen = set()
+    total = 0
+    for folder in folders:
+        for root, _, names in os.walk(folder):
+            for name in names:
+                status = os.stat(os.path.join(root, name))
+                if (status.st_dev, status.st_ino) not in seen:
+                    seen.add((status.st_dev, status.st_ino))
+                    total += status.st_size
+    return total
+
+def bench_cache(downloader, site: ImageSite, workers: int) -> None:
+    """Download the gallery three times with one cache and report what the cache saved each time."""
+    gallery = site.url.replace("/page.html", "/gallery.html")
+    print(f"Cache: {site.images} images of {site.size:,} bytes plus {site.copies} copies under other URLs")
+    print(f"{'run':>22} {'time':>9} {'sent':>11} {'hit rate':>9} {'duplicates':>11} {'on disk':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        cache_folder = os.path.join(folder, "image_cache")
+        for label, output in (("first run", "images"), ("same folder again", "images"), ("new folder", "again")):
+            site.reset()
+            cache = downloader.ImageCache(cache_folder)
+            session = downloader.make_session(workers)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloader.download_images(gallery, os.path.join(folder, output), workers=workers, session=session,
+                                           cache=cache)
+            elapsed = time.perf_counter() - start
+            session.close()
+            lookups = cache.hits + cache.misses
+            used = disk_usage(cache_folder, os.path.join(folder, "images"), os.path.join(folder, "again"))
+            print(f"{label:>22} {elapsed:>7.2f} s {site.bytes_sent / 2**20:>8.1f} MB "
+                  f"{cache.hits / max(lookups, 1):>9.0%} {cache.duplicates:>11} {used / 2**20:>8.1f} MB")
+    print()
+
+def partial_bytes(folder: str) -> int:
+    """Return the bytes in the partial files of interrupted downloads in a folder."""
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.name.endswith(".part"))
+
+def big_digest(site: ImageSite) -> str:
+    """Return the SHA-256 of the site's large images."""
+    digest = hashlib.sha256()
+    block = site.big_block()
+    for start in range(0, site.big_size, len(block)):
+        digest.update(block[:site.big_size - start])
+    return digest.hexdigest()
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(2**20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def bench_resume(downloader, site: ImageSite, workers: int) -> None:
+    """Kill a download of large images halfway and resume it, then time re-runs of a page downloaded before."""
+    total = site.big_files * site.big_size
+    print(f"Resume: {site.big_files} images of {site.big_size / 2**20:,.0f} MB ({total / 2**20:,.0f} MB), "
+          f"the download killed halfway and run again")
+    expected = big_digest(site)
+    with tempfile.TemporaryDirectory() as folder:
+        command = [sys.executable, DOWNLOADER_SCRIPT, site.url.replace("/page.html", "/bigpage.html"),
+                   "--folder", folder, "--no-cache", "--max-size", str(total)]
+        site.reset()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        while process.poll() is None and partial_bytes(folder) < total // 2:
+            time.sleep(0.005)
+        process.kill()
+        process.wait()
+        kept, first_sent = partial_bytes(folder), site.bytes_sent
+        site.reset()
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        intact = all(file_digest(os.path.join(folder, f"{number}.bin")) == expected
+                     for number in range(site.big_files))
+        print(f"Killed after {first_sent / 2**20:,.0f} MB sent, {kept / 2**20:,.0f} MB kept in partial files")
+        print(f"Resumed in {elapsed:.2f} s with {site.bytes_sent / 2**20:,.0f} MB sent "
+              f"({site.bytes_sent / total:.0%} of the whole)  {'OK' if intact else 'MISMATCH'}")
+
+    # A partial file from before the image changed must be thrown away, not completed with the new image's bytes
+    with tempfile.TemporaryDirectory() as folder:
+        url = site.big_url(0)
+        manifest = downloader.DownloadManifest(os.path.join(folder, downloader.MANIFEST_FILE))
+        manifest.add(url, "0.bin")
+        manifest.started(url, '"an older version"', site.big_size)
+        with open(os.path.join(folder, ".0.bin.part"), 'wb') as file:
+            file.write(b"old" * 2**18)
+        site.reset()
+        downloader.download_image(url, folder, downloader.make_session(), "0.bin", max_size=site.big_size,
+                                  manifest=manifest)
+        manifest.close()
+        intact = file_digest(os.path.join(folder, "0.bin")) == expected
+        print(f"Changed since interrupted: {site.bytes_sent / 2**20:,.0f} MB sent again  "
+              f"{'OK' if intact else 'MISMATCH'}")
+    print()
+
+    print(f"Re-runs: {site.images} images, {len(site.flaky)} fail once and 1 is missing, first run without retries")
+    print(f"{'run':>22} {'time':>9} {'requests':>9} {'downloaded':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        site.reset()
+        for label, manifest_used, rescan in (("first run", True, False), ("re-run", True, False),
+                                             ("re-run again", True, False), ("re-run --rescan", True, True),
+                                             ("without a manifest", False, False)):
+            site.reset(failures=False)
+            manifest = downloader.DownloadManifest(os.path.join(folder, downloader.MANIFEST_FILE)) \
+                if manifest_used else None
+            session = downloader.make_session(workers)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = downloader.download_images(site.url, folder, workers=workers, session=session, retries=0,
+                                                     manifest=manifest, rescan=rescan)
+            elapsed = time.perf_counter() - start
+            session.close()
+            if manifest is not None:
+                manifest.close()
+            downloaded = sum(isinstance(result, str) for result in results.values())
+            print(f"{label:>22} {elapsed:>7.3f} s {site.requests:>9} {downloaded:>11}")
+    print()
+
+def html_blocks(style: str, number: int) -> tuple:
+    """Return a piece of HTML in the given style and the image URLs really in it."""
+    text = f"<p>Paragraph {number} of the page, with a little text to read between the images.</p>\n"
+    if style == "plain":
+        return f'<div class="card"><img src="/images/{number}.jpg" alt="Photo {number}">{text}</div>\n', \
+            [f"/images/{number}.jpg"]
+    if style == "responsive":
+        kind = number % 3
+        if kind == 0:
+            return (f'<img src="/img/{number}-480.jpg" srcset="/img/{number}-480.jpg 480w, /img/{number}-1080.jpg '
+                    f'1080w" sizes="(max-width: 600px) 480px, 1080px" alt="">{text}',
+                    [f"/img/{number}-480.jpg", f"/img/{number}-1080.jpg"])
+        if kind == 1:
+            return (f'<img class="lazy" src="/img/placeholder.gif" data-src="/img/{number}.jpg" alt="">{text}',
+                    ["/img/placeholder.gif", f"/img/{number}.jpg"])
+        return (f'<picture><source type="image/avif" srcset="/img/{number}.avif 1x, /img/{number}@2x.avif 2x">'
+                f'<source type="image/webp" srcset="/img/{number}.webp"><img src="/img/{number}.jpg" alt="">'
+                f'</picture>{text}',
+                [f"/img/{number}.avif", f"/img/{number}@2x.avif", f"/img/{number}.webp", f"/img/{number}.jpg"])
+    kind = number % 4
+    if kind == 0:
+        return f"<DIV><IMG SRC='/m/{number}.png' ALT='Shouting'></DIV>{text}", [f"/m/{number}.png"]
+    if kind == 1:
+        return f'<img alt="unquoted" width=64 src=/m/{number}.gif>{text}', [f"/m/{number}.gif"]
+    if kind == 2:
+        return f'<img\n    class="wrapped"\n    src="/m/{number}.jpg"\n>{text}', [f"/m/{number}.jpg"]
+    return (f'<!-- <img src="/old/{number}.png"> --><script>var tag = "<img src=\\"/js/{number}.png\\">";</script>'
+            f'{text}', [])
+
+def save_html_fixture(path: str, style: str, size: int) -> set:
+    """Write an HTML file of about `size` bytes in the given style and return the image URLs really in it."""
+    expected = set()
+    written = 0
+    number = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("<!DOCTYPE html>\n<html><head><title>Fixture</title></head><body>\n")
+        while written < size:
+            html, urls = html_blocks(style, number)
+            file.write(html)
+            written += len(html)
+            expected.update(urls)
+            number += 1
+        file.write("</body></html>\n")
+    return expected
+
+def parse_fixture(downloader, path: str, parser: str) -> list:
+    """Extract the image URLs from a saved page the way the downloader would."""
+    if parser == "stream":
+        with open(path, 'r', encoding='utf-8') as file:
+            chunks = iter(lambda: file.read(downloader.CHUNK_SIZE), "")
+            return list(downloader.extract_stream(chunks))
+    with open(path, 'r', encoding='utf-8') as file:
+        return downloader.EXTRACTORS[parser](file.read())
+
+def bench_parsers(downloader, size: int) -> None:
+    """Report the throughput, peak memory, recall and precision of each extractor on each style of saved page."""
+    print(f"Parsers: {size / 2**20:,.0f} MB HTML files")
+    print(f"{'style':>12} {'parser':>8} {'MB/s':>8} {'peak memory':>13} {'recall':>8} {'precision':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for style in HTML_STYLES:
+            path = os.path.join(folder, f"{style}.html")
+            expected = save_html_fixture(path, style, size)
+            for parser in ("stream", "bs4", "regex"):
+                start = time.perf_counter()
+                found = set(parse_fixture(downloader, path, parser))
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()  # Measured on a second pass, as tracing slows Python down several times
+                parse_fixture(downloader, path, parser)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                recall = len(found & expected) / len(expected)
+                precision = len(found & expected) / len(found) if found else 0.0
+                print(f"{style:>12} {parser:>8} {size / 2**20 / elapsed:>8.1f} {peak / 2**20:>10.1f} MB "
+                      f"{recall:>8.1%} {precision:>10.1%}")
+    print()
+
+class CrawlSite:
+    """
+    A local website of `pages` linked pages, served from a background thread, for the crawler.
+
+    '/page/N.html' links to the pages N*FANOUT+1 to N*FANOUT+FANOUT (so every page can be reached from '/page/0.html'),
+    back to page 0 and to its parent, to itself with a fragment, to a page under '/private/' that robots.txt
+    disallows, and to a page on another site. It shows two of `images` images that every page shares. The server
+    counts how often each path is asked for.
+    """
+
+    def __init__(self, pages: int, images: int):
+        self.pages = pages
+        self.images = images
+        self.fetches = collections.Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/page/0.html"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def page(self, number: int) -> bytes:
+        """Return page `number`."""
+        children = range(number * FANOUT + 1, min(number * FANOUT + FANOUT + 1, self.pages))
+        links = [f"/page/{child}.html" for child in children]
+        links += ["/page/0.html", f"../page/{max(number - 1, 0) // FANOUT}.html", f"{number}.html#top",
+                  f"/private/{number}.html", f"http://external.invalid/page/{number}.html"]
+        images = [f"/img/{number % self.images}.png", f"/img/{number * 7 % self.images}.png"]
+        body = "".join(f'<a href="{link}">Link</a>\n' for link in links)
+        body += "".join(f'<img src="{image}">\n' for image in images)
+        return f"<html><body>\n<h1>Page {number}</h1>\n{body}</body></html>\n".encode()
+
+    def reset(self) -> None:
+        """Forget the fetches of the previous runs."""
+        with self._lock:
+            self.fetches.clear()
+
+    def handler(self):
+        """Return a request handler class that serves this site."""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with site._lock:
+                    site.fetches[self.path] += 1
+                if self.path == "/robots.txt":
+                    return self.send(200, b"User-agent: *\nDisallow: /private/\n", "text/plain")
+                kind, _, name = self.path[1:].partition("/")
+                number = name.partition(".")[0]
+                if kind == "page" and number.isdigit() and int(number) < site.pages:
+                    return self.send(200, site.page(int(number)), "text/html; charset=utf-8")
+                if kind == "img" and number.isdigit() and int(number) < site.images:
+                    return self.send(200, b"image %s " % number.encode() * 100, "image/png")
+                self.send(404, b"Not found", "text/plain")
+
+            def send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+def run_crawl(url: str, folder: str, frontier: str, max_pages, rate: float) -> tuple:
+    """
+    Crawl the site in this process and return the frontier's counts, the seen-set statistics, the crawl's output
+    and this process's peak resident memory in MB.
+
+    Run in a fresh process, so the peak belongs to the crawl alone.
+    """
+    import resource
+    downloader = load_downloader()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        counts = downloader.crawl(url, folder, frontier, max_depth=10**6, max_pages=max_pages, rate=rate)
+    return counts, output.getvalue(), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def bench_crawl(downloader, pages: int, images: int) -> None:
+    """Crawl a large site in two halves, resuming from the frontier file, then check what the site was asked for."""
+    site = CrawlSite(pages, images)
+    print(f"Crawl: {pages:,} linked pages sharing {images} images, with links to disallowed and external pages")
+    print(f"{'run':>18} {'time':>10} {'pages/s':>9} {'pages':>9} {'images':>7} {'peak RSS':>11}")
+    context = multiprocessing.get_context("spawn")
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            frontier = os.path.join(folder, "crawl_frontier.db")
+            for label, max_pages in (("first half", pages // 2), ("resumed", None)):
+                fetched = sum(count for path, count in site.fetches.items() if path.startswith("/page/"))
+                with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    start = time.perf_counter()
+                    counts, output, peak = executor.submit(
+                        run_crawl, site.url, os.path.join(folder, "images"), frontier, max_pages, 0).result()
+                    elapsed = time.perf_counter() - start
+                fetched = sum(count for path, count in site.fetches.items() if path.startswith("/page/")) - fetched
+                done = downloader.CrawlFrontier.DONE
+                print(f"{label:>18} {elapsed:>8.2f} s {fetched / elapsed:>9,.0f} {counts['pages'].get(done, 0):>9,} "
+                      f"{counts['images'].get(done, 0):>7} {peak:>8.1f} MB")
+            print(output.strip().splitlines()[-1])
+
+            saved, _ = downloader.crawl_path(os.path.join(folder, "images"), site.url.replace("page", "img"))
+            with contextlib.closing(sqlite3.connect(frontier)) as db:
+                external, = db.execute("SELECT COUNT(*) FROM pages WHERE url LIKE ?",
+                                       ("http://external.invalid/%",)).fetchone()
+            page_fetches = [count for path, count in site.fetches.items() if path.startswith("/page/")]
+            checks = [
+                ("every page crawled", len(page_fetches) == pages),
+                ("no page fetched twice", max(page_fetches) == 1),
+                ("every image downloaded once", [site.fetches[f"/img/{n}.png"] for n in range(images)] == [1] * images),
+                ("disallowed pages never fetched", not any(path.startswith("/private/") for path in site.fetches)),
+                ("external pages never queued", external == 0),
+                ("robots.txt fetched once per run", site.fetches["/robots.txt"] == 2),
+                ("every image saved", len(os.listdir(saved)) == images),
+            ]
+            for label, ok in checks:
+                print(f"{label}: {'OK' if ok else 'MISMATCH'}")
+
+        site.reset()
+        with tempfile.TemporaryDirectory() as folder:
+            polite = min(pages, 50)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloader.crawl(site.url, folder, os.path.join(folder, "frontier.db"), max_pages=polite,
+                                        rate=POLITE_RATE)
+            elapsed = time.perf_counter() - start
+            fetched = sum(count for path, count in site.fetches.items() if path.startswith("/page/"))
+            print(f"Politeness: {fetched} pages at --rate {POLITE_RATE:g} took {elapsed:.2f} s "
+                  f"({fetched / elapsed:.1f} pages/s)")
+    finally:
+        site.close()
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks against the local site."""
+    parser = argparse.ArgumentParser(description="Benchmark the Week 7 image downloader against a local site.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: concurrency, memory, cache, resume, parsers or crawl "
+                             "(default: all)")
+    parser.add_argument("--images", type=int, default=500, help="images on the page")
+    parser.add_argument("--size", type=int, default=20_000, help="bytes per image")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 32, 64], help="worker counts to try")
+    parser.add_argument("--per-host", type=int, help="connections per host (default: the number of workers)")
+    parser.add_argument("--big-files", type=int, default=3, help="large images downloaded at once")
+    parser.add_argument("--big-size", type=int, default=300, help="MB per large image")
+    parser.add_argument("--copies", type=int, default=100, help="images repeated under other URLs in the gallery")
+    parser.add_argument("--html-size", type=float, default=4, help="MB per saved HTML file")
+    parser.add_argument("--pages", type=int, default=100_000, help="pages on the crawled site")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    downloader = load_downloader()
+    site = ImageSite(args.images, args.size, args.big_size * 2**20, args.copies, args.big_files)
+    try:
+        if "concurrency" in args.benchmarks:
+            print(f"Concurrency: {args.images} images of {args.size:,} bytes, {len(site.flaky)} fail once, "
+                  f"1 missing")
+            print(f"{'download':>12} {'per host':>9} {'time':>11} {'slowest':>11} {'saved':>7} {'connections':>12} "
+                  f"{'requests':>9}")
+            for workers in args.workers:
+                bench_download(downloader, site, workers, args.per_host or workers)
+            print()
+        if "memory" in args.benchmarks:
+            bench_memory(downloader, site, args.big_files)
+        if "cache" in args.benchmarks:
+            bench_cache(downloader, site, max(args.workers))
+        if "resume" in args.benchmarks:
+            bench_resume(downloader, site, max(args.workers))
+        if "parsers" in args.benchmarks:
+            bench_parsers(downloader, int(args.html_size * 2**20))
+        if "crawl" in args.benchmarks:
+            bench_crawl(downloader, args.pages, CRAWL_IMAGES)
+    finally:
+        site.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Hot-Path Instrumentation
+
+This module is shared by the weekly programs to record where their time goes. Functions are wrapped with the
+timed() decorator, or blocks with the timer() context manager, and each named operation then keeps a count of its
+calls and failures, the bytes it processed, and a histogram of its latencies. The histogram is HDR-style
+(log-linear): values are bucketed by their power of two and the top SUB_BUCKET_BITS bits below it, so every latency
+from a nanosecond to years is recorded to within about 3% in a fixed array of counts, at the cost of an integer
+bit_length() and one increment.
+
+Instrumentation is off unless the INSTRUMENT environment variable turns it on. It is read when this module is first
+imported, and when it is off, timed() returns the function it is given unchanged and timer() a shared do-nothing
+context, so the programs run exactly as they would without it.
+
+Environment:
+    INSTRUMENT=1 (or summary)           print a summary of every operation to standard error on exit
+    INSTRUMENT=json[:PATH]              write the summary as JSON on exit (default: instrumentation.json)
+    INSTRUMENT_PROFILE=cprofile[:PATH]  profile the whole run with cProfile and save the stats on exit
+                                        (default: instrumentation.prof), printing the costliest functions
+    INSTRUMENT_PROFILE=tracemalloc[:N]  trace memory allocations and print the peak and the N lines (default 10)
+                                        that allocated most on exit
+
+Usage:
+    INSTRUMENT=1 python "Week 4 simulated_atm.py"
+    INSTRUMENT=json:atm.json INSTRUMENT_PROFILE=cprofile python "Week 4 simulated_atm.py"
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+SUB_BUCKET_BITS = 5         # Bits of each value kept below its leading one: 32 buckets per power of two, 3% wide
+HISTOGRAM_SIZE = (65 - SUB_BUCKET_BITS) << SUB_BUCKET_BITS  # Buckets covering every value below 2**64 ns
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+JSON_FILE = "instrumentation.json"
+PROFILE_FILE = "instrumentation.prof"
+PROFILE_LINES = 20          # Costliest functions printed from a cProfile capture
+TRACEMALLOC_LINES = 10      # Allocating lines printed from a tracemalloc capture
+
+class InstrumentationError(Exception):
+    """Raised when INSTRUMENT or INSTRUMENT_PROFILE holds a setting that is not understood."""
+
+def bucket_index(value: int) -> int:
+    """Return the histogram bucket of a non-negative integer value."""
+    exponent = value.bit_length() - SUB_BUCKET_BITS - 1
+    if exponent <= 0:
+        return value  # Small values have a bucket each
+    return (exponent << SUB_BUCKET_BITS) + (value >> exponent)
+
+def bucket_bounds(index: int) -> tuple:
+    """Return the lowest and highest values that fall in a histogram bucket."""
+    if index < 2 << SUB_BUCKET_BITS:
+        return index, index
+    exponent = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (exponent << SUB_BUCKET_BITS)
+    return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+class Operation:
+    """The calls, failures, bytes and latency histogram (in nanoseconds) recorded for one named operation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.failures = 0
+        self.bytes = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.counts = [0] * HISTOGRAM_SIZE
+        self._lock = threading.Lock()  # Operations are recorded from worker threads too
+
+    def record(self, elapsed_ns: int, nbytes: int = 0, failed: bool = False) -> None:
+        exponent = elapsed_ns.bit_length() - SUB_BUCKET_BITS - 1  # bucket_index(), without the cost of a call
+        index = elapsed_ns if exponent <= 0 else (exponent << SUB_BUCKET_BITS) + (elapsed_ns >> exponent)
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.bytes += nbytes
+            self.total_ns += elapsed_ns
+            if elapsed_ns > self.max_ns:
+                self.max_ns = elapsed_ns
+            self.counts[index] += 1
+
+    def percentile(self, fraction: float) -> int:
+        """Return the latency in nanoseconds below which `fraction` of the calls fell (to within a bucket)."""
+        rank = max(1, round(fraction * self.calls))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> dict:
+        """Return the operation's totals, percentiles and non-empty histogram buckets as a JSON-ready dict."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'bytes': self.bytes,
+                'total_seconds': self.total_ns / 1e9,
+                'mean_us': self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+                'max_us': self.max_ns / 1e3,
+                'percentiles_us': {f"p{fraction * 100:g}": self.percentile(fraction) / 1e3
+                                   for fraction in PERCENTILES},
+                'histogram_ns': [[*bucket_bounds(index), count] for index, count in enumerate(self.counts) if count],
+            }
+
+class Timer:
+    """Context manager recording the time taken by the block it wraps, and the bytes it reports, as one call."""
+
+    __slots__ = ('operation', 'bytes', 'start')
+
+    def __init__(self, operation: Operation):
+        self.operation = operation
+        self.bytes = 0
+
+    def add_bytes(self, nbytes: int) -> None:
+        self.bytes += nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.operation.record(time.perf_counter_ns() - self.start, self.bytes, error_type is not None)
+
+class NullTimer:
+    """Stand-in for Timer while instrumentation is off, recording nothing."""
+
+    __slots__ = ()
+
+    def add_bytes(self, nbytes: int) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        pass
+
+NULL_TIMER = NullTimer()
+_operations = {}            # Operation name -> Operation
+_operations_lock = threading.Lock()
+_enabled = False
+_profiler = None            # cProfile.Profile while a cProfile capture is running
+
+def enabled() -> bool:
+    """Return whether operations are being recorded."""
+    return _enabled
+
+def operation(name: str) -> Operation:
+    """Return the Operation recorded under a name, creating it the first time."""
+    with _operations_lock:
+        if name not in _operations:
+            _operations[name] = Operation(name)
+        return _operations[name]
+
+def timed(function=None, *, name: str = None, bytes_of=None):
+    """
+    Decorator recording each call of a function as an operation, named after the function unless `name` is given.
+
+    `bytes_of(result, *args, **kwargs)`, if given, is called after each successful call with its result and
+    arguments and returns the bytes the call processed. Calls that raise are counted as failures. While
+    instrumentation is off the function is returned unchanged, so decorating it costs nothing.
+    """
+    def decorate(function):
+        if not _enabled:
+            return function
+        recorded = operation(name or function.__qualname__)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                recorded.record(time.perf_counter_ns() - start, failed=True)
+                raise
+            elapsed = time.perf_counter_ns() - start
+            recorded.record(elapsed, bytes_of(result, *args, **kwargs) if bytes_of is not None else 0)
+            return result
+        return wrapper
+
+    return decorate(function) if function is not None else decorate
+
+def timer(name: str):
+    """Return a context manager recording the block it wraps as a call of the named operation."""
+    return Timer(operation(name)) if _enabled else NULL_TIMER
+
+def path_size(result, path, *args, **kwargs) -> int:
+    """Return the size of the file named by a function's first argument, for timed(bytes_of=path_size)."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def result_size(path, *args, **kwargs) -> int:
+    """Return the size of the file whose path a function returned, for timed(bytes_of=result_size)."""
+    return path_size(None, path)
+
+def summaries() -> dict:
+    """Return the summary of every operation recorded, by name."""
+    with _operations_lock:
+        recorded = list(_operations.values())
+    return {item.name: item.summary() for item in sorted(recorded, key=lambda item: item.name)}
+
+def reset() -> None:
+    """Forget every operation recorded so far."""
+    with _operations_lock:
+        for item in _operations.values():
+            item.__init__(item.name)
+
+def print_summary(file=None) -> None:
+    """Print a table of every operation called: calls, failures, latency percentiles and throughput."""
+    file = file or sys.stderr
+    operations = {name: summary for name, summary in summaries().items() if summary['calls']}
+    if not operations:
+        print("Instrumentation: no operations recorded.", file=file)
+        return
+    width = max(9, *map(len, operations))
+    columns = "".join(f"{f'p{fraction * 100:g}':>11}" for fraction in PERCENTILES)
+    print(f"{'operation':<{width}} {'calls':>9} {'failed':>7} {'mean':>11}{columns} {'max':>11} {'MB':>9} "
+          f"{'MB/s':>9}", file=file)
+    for name, summary in operations.items():
+        latencies = "".join(f"{value:>8.1f} us" for value in summary['percentiles_us'].values())
+        seconds = summary['total_seconds']
+        rate = f"{summary['bytes'] / 2**20 / seconds:>9.1f}" if summary['bytes'] and seconds else f"{'':>9}"
+        print(f"{name:<{width}} {summary['calls']:>9,} {summary['failures']:>7,} {summary['mean_us']:>8.1f} us"
+              f"{latencies} {summary['max_us']:>8.1f} us {summary['bytes'] / 2**20:>9.1f} {rate}", file=file)
+
+def write_json(path: str = JSON_FILE) -> None:
+    """Write the summary of every operation recorded to a JSON file."""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'pid': os.getpid(), 'argv': sys.argv, 'operations': summaries()}, file, indent=2)
+
+def start_profile(setting: str) -> None:
+    """Start a cProfile or tracemalloc capture, reported on exit: 'cprofile[:PATH]' or 'tracemalloc[:LINES]'."""
+    global _profiler
+    kind, _, argument = setting.partition(":")
+    if kind == "cprofile":
+        import cProfile
+        path = argument or PROFILE_FILE
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        atexit.register(_report_profile, path)
+    elif kind == "tracemalloc":
+        import tracemalloc
+        if argument and not argument.isdigit():
+            raise InstrumentationError(f"INSTRUMENT_PROFILE=tracemalloc:{argument} is not a number of lines")
+        tracemalloc.start()
+        atexit.register(_report_allocations, int(argument or TRACEMALLOC_LINES))
+    else:
+        raise InstrumentationError(f"INSTRUMENT_PROFILE={setting!r} is not 'cprofile[:PATH]' or 'tracemalloc[:N]'")
+
+def _report_profile(path: str) -> None:
+    import pstats
+    _profiler.disable()
+    _profiler.dump_stats(path)
+    print(f"\ncProfile: stats saved to {path}; the costliest functions by cumulative time:", file=sys.stderr)
+    pstats.Stats(_profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_LINES)
+
+def _report_allocations(lines: int) -> None:
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics('lineno')
+    tracemalloc.stop()
+    print(f"\ntracemalloc: {current / 2**20:.1f} MB still allocated, peak {peak / 2**20:.1f} MB; "
+          f"the lines holding most:", file=sys.stderr)
+    for statistic in statistics[:lines]:
+        print(f"  {statistic}", file=sys.stderr)
+
+def enable(report: str = "summary") -> None:
+    """
+    Start recording operations, and report them on exit: 'summary' prints a table to standard error, 'json[:PATH]'
+    writes them to a JSON file, and None reports nothing.
+
+    Only functions decorated after this call are recorded, so it must come before the programs are imported.
+    """
+    global _enabled
+    if report is not None:
+        kind, _, path = report.partition(":")
+        if kind == "summary":
+            atexit.register(print_summary)
+        elif kind == "json":
+            atexit.register(write_json, path or JSON_FILE)
+        else:
+            raise InstrumentationError(f"INSTRUMENT={report!r} is not '1', 'summary' or 'json[:PATH]'")
+    _enabled = True
+
+def disable() -> None:
+    """Stop recording operations. Functions decorated while instrumentation was on keep recording."""
+    global _enabled
+    _enabled = False
+
+def configure(environ=os.environ) -> None:
+    """Turn instrumentation and profiling on as the INSTRUMENT and INSTRUMENT_PROFILE variables say."""
+    setting = environ.get("INSTRUMENT", "").strip()
+    if setting and setting != "0":
+        enable("summary" if setting == "1" else setting)
+    profile = environ.get("INSTRUMENT_PROFILE", "").strip()
+    if profile:
+        start_profile(profile)
+
+configure()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""
+Instrumentation Benchmark
+
+This script measures and checks the shared instrumentation in 'instrumentation.py'.
+
+Benchmarks:
+- overhead: Time per call of the instrumented hot paths, the ATM's make_deposit() and make_withdrawal() (in memory),
+  its PIN check (timed for login()) and the address book's add_entry(), run bare, with instrumentation off and with
+  it on. The programs are loaded once with instrumentation off and once with it on. Off must cost under 1%: with it
+  off, every decorated function must be the bare function itself, and the bare and off runs, timed in turn as the
+  best of several repeats, show what is left as the noise of the timing.
+- accuracy: Latencies drawn from a long-tailed distribution are recorded in a histogram, whose percentiles must be
+  within a bucket's width (about 3%) of the exact ones.
+- export: The address book is run in batch mode in a separate process with INSTRUMENT=json and
+  INSTRUMENT_PROFILE=cprofile, and the JSON file must count every add, load and save, with the bytes of the CSV
+  file, and the profile must have been saved.
+
+Usage:
+    python instrumentation_benchmark.py [overhead] [accuracy] [export] [--calls 20000] [--repeats 15]
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+ATM_SCRIPT = os.path.join(SCRIPT_FOLDER, "Week 4 simulated_atm.py")
+ADDRESS_BOOK_SCRIPT = os.path.join(SCRIPT_FOLDER, "Week 6 extending_address_book.py")
+BENCHMARKS = ["overhead", "accuracy", "export"]
+OFF_LIMIT = 0.01            # Largest overhead allowed with instrumentation off
+
+sys.path.insert(0, SCRIPT_FOLDER)
+import instrumentation  # noqa: E402  (found next to this script)
+
+def load_script(path: str, name: str):
+    """Import a weekly script as a module (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def load_programs(enabled: bool) -> tuple:
+    """Load the ATM and the address book with instrumentation on or off, and return them."""
+    if enabled:
+        instrumentation.enable(report=None)
+    else:
+        instrumentation.disable()
+    suffix = "on" if enabled else "off"
+    return (load_script(ATM_SCRIPT, f"simulated_atm_{suffix}"),
+            load_script(ADDRESS_BOOK_SCRIPT, f"address_book_{suffix}"))
+
+def best_times(runs: list, calls: int, repeats: int) -> list:
+    """Return the fewest seconds per call that each run(calls) took, running them in turn `repeats` times."""
+    best = [float('inf')] * len(runs)
+    for _ in range(repeats):
+        for index, run in enumerate(runs):
+            start = time.perf_counter()
+            run(calls)
+            best[index] = min(best[index], (time.perf_counter() - start) / calls)
+    return best
+
+def deposit_runs(atm, function) -> callable:
+    """Return a run of `calls` deposits of a cent."""
+    def run(calls):
+        amount = atm.Decimal("0.01")
+        for _ in range(calls):
+            function(amount, out=len)
+    return run
+
+def withdrawal_runs(atm, function) -> callable:
+    """Return a run of `calls` withdrawals of a cent, after a deposit to cover them."""
+    def run(calls):
+        atm.make_deposit(atm.Decimal(calls), out=len)
+        amount = atm.Decimal("0.01")
+        for _ in range(calls):
+            function(amount, out=len)
+    return run
+
+def login_runs(atm, function) -> callable:
+    """Return a run of `calls` PIN checks of the ATM's account, as login() makes them."""
+    def run(calls):
+        for _ in range(calls):
+            function(atm.ledger, atm.DEFAULT_ACCOUNT, atm.pin)
+    return run
+
+def add_entry_runs(book, function) -> callable:
+    """Return a run of `calls` add_entry() calls of new contacts into an empty address book."""
+    def run(calls):
+        book.address_book = book.AddressBook()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for number in range(calls):
+                function(f"Contact {number}", f"02{number:08d}", f"contact{number}@example.com")
+    return run
+
+def bench_overhead(calls: int, repeats: int) -> None:
+    """
+    Report the time per call of each hot path with instrumentation off and on, and check that off costs nothing.
+
+    With instrumentation off, timed() returns each function unchanged, which is checked directly. The off functions
+    are also timed against copies of the same functions taken from the programs loaded with instrumentation on
+    (the functions the decorators wrapped there), in turn, so the measured difference shows the noise of the timing.
+    """
+    atm_off, book_off = load_programs(enabled=False)
+    atm_on, book_on = load_programs(enabled=True)
+    instrumentation.disable()
+    print(f"Overhead: best of {repeats} runs of {calls:,} calls each")
+    print(f"{'operation':>24} {'unchanged':>10} {'bare':>11} {'off':>11} {'off cost':>9} {'on':>11} {'on cost':>9}")
+    cases = [
+        ("atm.make_deposit", deposit_runs, atm_off, atm_off.make_deposit, atm_on, atm_on.make_deposit),
+        ("atm.make_withdrawal", withdrawal_runs, atm_off, atm_off.make_withdrawal, atm_on, atm_on.make_withdrawal),
+        ("atm.login (PIN check)", login_runs, atm_off, atm_off.Ledger.authenticate,
+         atm_on, atm_on.Ledger.authenticate),
+        ("address_book.add_entry", add_entry_runs, book_off, book_off.add_entry, book_on, book_on.add_entry),
+    ]
+    unchanged_all = all(not hasattr(function, "__wrapped__") for function in (
+        book_off.load_from_csv, book_off.save_to_csv)) and hasattr(book_on.save_to_csv, "__wrapped__")
+    for label, runs, off_module, off_function, on_module, on_function in cases:
+        unchanged = not hasattr(off_function, "__wrapped__") and hasattr(on_function, "__wrapped__")
+        unchanged_all = unchanged_all and unchanged
+        bare, off, on = best_times([runs(on_module, on_function.__wrapped__), runs(off_module, off_function),
+                                    runs(on_module, on_function)], calls, repeats)
+        print(f"{label:>24} {'yes' if unchanged else 'NO':>10} {bare * 1e6:>8.2f} us {off * 1e6:>8.2f} us "
+              f"{off / bare - 1:>+9.1%} {on * 1e6:>8.2f} us {on / bare - 1:>+9.1%}  "
+              f"{'OK' if unchanged else 'MISMATCH'}")
+    print(f"every instrumented function is unchanged with instrumentation off, so off costs 0%, under "
+          f"{OFF_LIMIT:.0%}: {'OK' if unchanged_all else 'MISMATCH'}")
+    null_block, empty = best_times([lambda calls: [instrumentation.timer("x") for _ in range(calls)],
+                                    lambda calls: [None for _ in range(calls)]], calls, repeats)
+    print(f"a timer() block, where used, costs {(null_block - empty) * 1e9:.0f} ns with instrumentation off")
+    print()
+
+def bench_accuracy(samples: int = 1_000_000) -> None:
+    """Check the histogram's percentiles against the exact percentiles of the same latencies."""
+    print(f"Accuracy: {samples:,} log-normal latencies (median 50 us, long tail)")
+    rng = random.Random(0)
+    values = [int(rng.lognormvariate(10.8, 1.2)) for _ in range(samples)]
+    operation = instrumentation.Operation("accuracy")
+    start = time.perf_counter()
+    for value in values:
+        operation.record(value)
+    elapsed = time.perf_counter() - start
+    values.sort()
+    print(f"{'percentile':>11} {'exact':>13} {'histogram':>13} {'error':>8}")
+    worst = 0.0
+    for fraction in (0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = values[max(1, round(fraction * samples)) - 1]
+        found = operation.percentile(fraction)
+        error = abs(found - exact) / exact
+        worst = max(worst, error)
+        print(f"{f'p{fraction * 100:g}':>11} {exact / 1e3:>10.1f} us {found / 1e3:>10.1f} us {error:>8.2%}")
+    bound = 1 / 2**instrumentation.SUB_BUCKET_BITS
+    print(f"worst error {worst:.2%}, within a bucket ({bound:.1%}): {'OK' if worst <= bound else 'MISMATCH'}; "
+          f"{elapsed / samples * 1e9:.0f} ns per record()")
+    print()
+
+def bench_export(entries: int = 2000) -> None:
+    """Run the address book's batch mode with JSON export and cProfile on, and check what they wrote."""
+    print(f"Export: address book batch of {entries:,} adds, INSTRUMENT=json, INSTRUMENT_PROFILE=cprofile")
+    with tempfile.TemporaryDirectory() as folder:
+        batch = os.path.join(folder, "batch.csv")
+        with open(batch, 'w', encoding='utf-8') as file:
+            for number in range(entries):
+                file.write(f"add,Contact {number},02{number:08d},contact{number}@example.com\n")
+            file.write("save,address_book.csv\n")
+        environment = dict(os.environ, INSTRUMENT="json:metrics.json", INSTRUMENT_PROFILE="cprofile:run.prof")
+        completed = subprocess.run([sys.executable, ADDRESS_BOOK_SCRIPT, "--batch", batch, "--quiet"], cwd=folder,
+                                   env=environment, capture_output=True, text=True)
+        with open(os.path.join(folder, "metrics.json"), encoding='utf-8') as file:
+            operations = json.load(file)['operations']
+        size = os.path.getsize(os.path.join(folder, "address_book.csv"))
+        profiled = os.path.getsize(os.path.join(folder, "run.prof")) > 0
+    for name, summary in operations.items():
+        print(f"{name:>28} {summary['calls']:>7,} calls, p50 {summary['percentiles_us']['p50']:>7.1f} us, "
+              f"p99 {summary['percentiles_us']['p99']:>7.1f} us, {summary['bytes']:>9,} bytes")
+    adds = operations.get('address_book.add_entry', {}).get('calls')
+    saves = operations.get('address_book.save_to_csv', {})
+    correct = completed.returncode == 0 and adds == entries and saves.get('calls') == 1 and \
+        saves.get('bytes', 0) >= size and operations.get('address_book.load_from_csv', {}).get('calls') == 1
+    print(f"every add, load and save counted, with the CSV's bytes: {'OK' if correct else 'MISMATCH'}")
+    print(f"cProfile stats saved: {'OK' if profiled else 'MISMATCH'}")
+    print()
+
+def main() -> None:
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the shared instrumentation.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run: overhead, accuracy or export (default: all)")
+    parser.add_argument("--calls", type=int, default=20_000, help="calls per timed run in the overhead benchmark")
+    parser.add_argument("--repeats", type=int, default=15, help="runs per measurement, of which the best is kept")
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r} (choose from {', '.join(BENCHMARKS)})")
+
+    if "overhead" in args.benchmarks:
+        bench_overhead(args.calls, args.repeats)
+    if "accuracy" in args.benchmarks:
+        bench_accuracy()
+    if "export" in args.benchmarks:
+        bench_export()
+
+if __name__ == '__main__':
+    sys.exit(main())